@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Message handling ka logic coroutines mein likha hai aur dono entry points par wahi chalta hai:
+#   - Flask (sync) mode: I/O helpers seedha blocking call karte hain, coroutine kabhi suspend
+#     nahi hota, is liye run_sync() use bina event loop ke worker thread mein chala deta hai
+#   - ASGI mode (whatsapp/asgi.py, async_io on): wahi helpers async clients (OpenAI, Graph) par
+#     await karte hain aur SQLAlchemy / SQLite / gspread ka blocking kaam ek bounded executor par
+# Mode ek contextvar hai: ASGI request aur dispatcher tasks mein on, executor threads mein off.
+
+BLOCKING_WORKERS = int(os.getenv('BLOCKING_WORKERS', '16'))
+
+_async_io = contextvars.ContextVar('async_io', default=False)
+
+
+def async_io():
+    return _async_io.get()
+
+
+def use_async_io():
+    # Current task (aur is ke baad banne wale tasks) mein async clients
+    _async_io.set(True)
+
+
+def run_sync(coro):
+    """Sync mode mein coroutine ko bina event loop chalata hai aur us ka return value deta hai."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError('Coroutine suspended outside async mode (an async client was awaited in sync mode)')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix='blocking')
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Blocking call: sync mode mein seedha, async mode mein bounded executor par (event loop nahi
+    rukta). Trace ID aur message metrics ke contextvars sath jate hain.
+    """
+    if not _async_io.get():
+        return fn(*args, **kwargs)
+    context = contextvars.copy_context()
+    context.run(_async_io.set, False)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_executor(), context.run, functools.partial(fn, *args, **kwargs))
+
+
+async def wait_future(future, timeout=None):
+    """concurrent.futures.Future ka nateeja (e.g. outbound send), timeout ke sath."""
+    if not _async_io.get():
+        return future.result(timeout=timeout)
+    # shield: timeout par asal send cancel na ho, sirf intezar khatam
+    return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
@@ -0,0 +1,211 @@
+"""
+Flask (werkzeug threaded, KeyedDispatcher thread pool) vs ASGI (uvicorn, event loop coroutines)
+serving mode ka muqabla, wahi offline fakes aur wahi scripted conversations (benchmarks.loadtest)
+par. Har mode ka server alag subprocess mein chalta hai taake us ke threads aur memory
+(/proc/<pid>/status) alag nap sakein; fakes aur load driver parent process mein.
+
+Report (har mode): throughput, reply latency p50/p95/p99, timeouts, confirmed orders,
+server ke peak threads aur peak RSS (VmHWM).
+
+Run: python -m benchmarks.bench_asgi [--conversations 200] [--concurrency 200]
+         [--openai-latency 1.0] [--graph-latency 0.1] [--sheets-latency 0.3]
+         [--ingest queue|inline] [--modes flask,asgi] [--flask-workers N] [--session-backend memory|sqlite]
+         [--json]
+
+--flask-workers (default: --concurrency) Flask mode ka INGEST_WORKERS hai: har conversation ko
+apna thread, jaisa ASGI mode mein har conversation ko apna coroutine (ASYNC_MAX_CONVERSATIONS).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fakes import FakeGraph, FakeGspreadClient, FakeOpenAI
+from benchmarks.loadtest import (CONFIRMED_MARKER, configure_environment, generate_conversations, patch_gspread,
+                                 percentile, run_conversation)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(mode, sheets_latency):
+    # Child process: environment parent ne set kiya hai; port stdout par, phir hamesha chalta hai
+    patch_gspread(FakeGspreadClient(sheets_latency))
+    if mode == 'flask':
+        from benchmarks.loadtest import start_app
+        server, url = start_app()
+        print(server.server_port, flush=True)
+        threading.Event().wait()
+    else:
+        import socket
+        import uvicorn
+        from whatsapp.asgi import app
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        print(sock.getsockname()[1], flush=True)
+        # Keep-alive ek turn (kai LLM calls) se lamba: warna idle connection band hote waqt
+        # client ka agla POST us par ja kar fail hota hai (requests POST retry nahi karta)
+        config = uvicorn.Config(app, log_level='warning', lifespan='on', timeout_keep_alive=75)
+        uvicorn.Server(config).run(sockets=[sock])
+
+
+def _proc_status(pid):
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                fields[key] = value.split()[0] if value.split() else ''
+    except OSError:
+        pass
+    return fields
+
+
+class ProcSampler:
+    """Server process ke threads aur RSS ka peak, har 50ms."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_threads = 0
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(0.05)
+
+    def sample(self):
+        status = _proc_status(self.pid)
+        self.peak_threads = max(self.peak_threads, int(status.get('Threads', 0)))
+        self.peak_rss_kb = max(self.peak_rss_kb, int(status.get('VmHWM', 0)))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def run_mode(mode, args, conversations):
+    openai_fake = FakeOpenAI(args.openai_latency).start()
+    graph_fake = FakeGraph(args.graph_latency).start()
+    workdir = tempfile.mkdtemp(prefix=f'alarab-bench-{mode}-')
+    env = dict(os.environ)
+    configure_environment(workdir, openai_fake, graph_fake, args.ingest, environ=env)
+    env.update({
+        'INGEST_WORKERS': str(args.flask_workers or args.concurrency),
+        'ASYNC_MAX_CONVERSATIONS': str(max(args.concurrency, 500)),
+        'PYTHONPATH': ROOT,
+        'SESSION_BACKEND': args.session_backend,
+        'SESSION_DB_PATH': os.path.join(workdir, 'sessions.db'),
+    })
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode, '--sheets-latency', str(args.sheets_latency)],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(server.stdout.readline())
+        url = f'http://127.0.0.1:{port}/webhook'
+        import requests
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                requests.get(f'http://127.0.0.1:{port}/ping', timeout=1).raise_for_status()
+                break
+            except requests.RequestException:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        idle = _proc_status(server.pid)
+
+        numbers = [f'92311{i:07d}' for i in range(len(conversations))]
+        settle = 0.05 if args.ingest == 'queue' else 0.0
+        local = threading.local()
+
+        def drive(index):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            return run_conversation(local.session, url, graph_fake, numbers[index],
+                                    conversations[index]['turns'], args.timeout, settle)
+
+        sampler = ProcSampler(server.pid).start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(drive, range(len(conversations))))
+        wall = time.perf_counter() - start
+        sampler.stop()
+    finally:
+        server.terminate()
+        server.wait(10)
+        openai_fake.stop()
+        graph_fake.stop()
+
+    turns = [turn for conversation in results for turn in conversation]
+    latencies = [t['latency'] for t in turns if t['latency'] is not None]
+    orders = sum(
+        1 for number in numbers
+        if any(body and CONFIRMED_MARKER in body for _, _, body in graph_fake.messages_to(number))
+    )
+    return {
+        'mode': mode,
+        'turns': len(turns),
+        'timeouts': len(turns) - len(latencies),
+        'wall_seconds': round(wall, 2),
+        'messages_per_second': round(len(turns) / wall, 2) if wall else 0.0,
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p95': round(percentile(latencies, 95), 3),
+        'latency_p99': round(percentile(latencies, 99), 3),
+        'orders_confirmed': orders,
+        'idle_threads': int(idle.get('Threads', 0)),
+        'idle_rss_mb': round(int(idle.get('VmRSS', 0)) / 1024, 1),
+        'peak_threads': sampler.peak_threads,
+        'peak_rss_mb': round(sampler.peak_rss_kb / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--menu-rate', type=float, default=0.0, help='Generated conversations asking for the menu PDF')
+    parser.add_argument('--ingest', choices=['inline', 'queue'], default='queue')
+    parser.add_argument('--modes', default='flask,asgi')
+    parser.add_argument('--flask-workers', type=int, help='INGEST_WORKERS for Flask mode (default: --concurrency)')
+    parser.add_argument('--session-backend', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--openai-latency', type=float, default=1.0)
+    parser.add_argument('--graph-latency', type=float, default=0.1)
+    parser.add_argument('--sheets-latency', type=float, default=0.3)
+    parser.add_argument('--timeout', type=float, default=120.0, help='Max seconds to wait for a reply')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.sheets_latency)
+        return
+
+    conversations = generate_conversations(args.conversations, args.menu_rate)
+    reports = [run_mode(mode, args, conversations) for mode in args.modes.split(',')]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    print(f"conversations: {args.conversations}  concurrency: {args.concurrency}  ingest: {args.ingest}  "
+          f"openai latency: {args.openai_latency}s")
+    print(f"{'mode':<6} {'msg/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'timeouts':>8} {'orders':>7} "
+          f"{'threads':>13} {'rss MB':>13}")
+    for r in reports:
+        print(f"{r['mode']:<6} {r['messages_per_second']:>7} {r['latency_p50']:>7.3f} {r['latency_p95']:>7.3f} "
+              f"{r['latency_p99']:>7.3f} {r['timeouts']:>8} {r['orders_confirmed']:>7} "
+              f"{r['idle_threads']:>5} -> {r['peak_threads']:<5} {r['idle_rss_mb']:>5} -> {r['peak_rss_mb']:<6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+collecting_details step ki field extraction ka benchmark: purana tareeqa (har
+field ke liye alag call, user text + last AI reply = 10 calls tak) vs naya
+single structured call, aur local fast-path + single call. OpenAI ko fake se replace kiya jata hai jo fixed
+latency add karta hai, is liye koi network ya API key nahi chahiye.
+
+Run: python -m benchmarks.bench_extraction [--latency 0.25] [--messages 20]
+"""
+import argparse
+import json
+import time
+import types
+import openai
+from metrics import REGISTRY
+from openai_agent import extraction, fast_extract
+
+# Fake LLM sirf items pehchanta hai, baqi fields null
+CANNED = {
+    'items': [{'name': 'Chicken Shawarma', 'quantity': 2}],
+}
+
+
+class FakeChatCompletion:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, model=None, messages=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        prompt = messages[0]['content']
+        # Prompt mein jo fields maange gaye hain sirf unhi ka jawab do
+        asked = [f for f in extraction.ORDER_FIELDS if f'"{f}"' in prompt]
+        content = json.dumps({f: CANNED.get(f) for f in asked})
+        message = {'content': content}
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def run_legacy(text, last_ai, language):
+    # Purana flow: har missing field ke liye user text par aur phir AI reply par alag call
+    session = {f: None for f in extraction.ORDER_FIELDS}
+    for source in (text, last_ai):
+        for field in extraction.ORDER_FIELDS:
+            if not session[field]:
+                session[field] = extraction.extract_field(source, field, language)
+    return session
+
+
+def run_single(text, last_ai, language):
+    return extraction.extract_fields(text, extraction.ORDER_FIELDS, language, context=last_ai)
+
+
+def run_fast_then_single(text, last_ai, language):
+    # Handler jaisa flow: pehle local rules, bacha hua kaam ek LLM call mein
+    values, consumed = fast_extract.fast_extract(text, extraction.ORDER_FIELDS)
+    missing = [f for f in extraction.ORDER_FIELDS if f not in values]
+    fast_extract.record_llm_call(avoided=consumed or not missing)
+    if missing and not consumed:
+        values.update(extraction.extract_fields(text, missing, language, context=last_ai))
+    return values
+
+
+# collecting_details mein aane wale aam messages ka mix
+CORPUS = [
+    '2 chicken shawarma',
+    '03001234567',
+    'cash',
+    'Ahmed',
+    'Block 15 Gulistan-e-Johar, Decent Towers',
+    'do zinger burger aur ek biryani half',
+    'mera number +92 321 7654321 hai',
+    'easypaisa se payment karunga',
+]
+
+
+def measure(fn, fake, messages):
+    fake.calls = 0
+    start = time.perf_counter()
+    for i in range(messages):
+        fn(CORPUS[i % len(CORPUS)], 'Aap kya order karna chahenge?', 'Roman Urdu')
+    elapsed = time.perf_counter() - start
+    return fake.calls / messages, elapsed / messages * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05, help='fake OpenAI latency per call (seconds)')
+    parser.add_argument('--messages', type=int, default=40)
+    args = parser.parse_args()
+    fake = FakeChatCompletion(args.latency)
+    original = openai.ChatCompletion
+    openai.ChatCompletion = fake
+    try:
+        legacy_calls, legacy_ms = measure(run_legacy, fake, args.messages)
+        single_calls, single_ms = measure(run_single, fake, args.messages)
+        fast_calls, fast_ms = measure(run_fast_then_single, fake, args.messages)
+    finally:
+        openai.ChatCompletion = original
+    print(f"{'mode':<12}{'LLM calls/msg':>16}{'latency/msg (ms)':>20}")
+    print(f"{'legacy':<12}{legacy_calls:>16.1f}{legacy_ms:>20.1f}")
+    print(f"{'single':<12}{single_calls:>16.1f}{single_ms:>20.1f}")
+    print(f"{'fast+single':<12}{fast_calls:>16.1f}{fast_ms:>20.1f}")
+    print('fast-path fields resolved:', REGISTRY.values('fast_extract_fields_total', 'field'),
+          '| extraction LLM calls:', REGISTRY.values('extraction_llm_calls_total', 'outcome'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Message routing ka benchmark: purane alag alag `any(word in text.lower() ...)` scans +
+detect_language vs naya ek-scan compiled classifier (openai_agent.intents.classify).
+
+Accuracy do corpora par alag alag:
+  tuning   - benchmarks/intent_corpus.json, classifier ke keywords ke sath hi likha gaya; is par
+             100% sirf yeh batata hai ke keywords apne hi examples pakarte hain
+  held-out - benchmarks/intent_heldout.json, keywords dekhe baghair asal WhatsApp jaise messages
+             (spelling variants, naye items, Urdu script); asal accuracy ka andaza yahi hai
+Timing dono corpora ke saare messages par (5 repeats mein sab se tez). lru cache sirf dobara
+aane wale bilkul same text par madad karta hai, is liye compiled ko bina cache ke bhi napte hain.
+
+Run: python -m benchmarks.bench_intents [--rounds 2000] [--show-misses]
+"""
+import argparse
+import json
+import os
+import time
+from openai_agent.intents import classify, get_vocabulary
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_corpus.json')
+HELDOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_heldout.json')
+
+# Handler ke purane keyword lists (classifier se pehle), muqabla karne ke liye
+LEGACY_MENU = ['menu', 'menu bhejein', 'menu send', 'menu chahiye', 'menu chahta hoon', 'menu please', 'menu pdf']
+LEGACY_CANCEL = ['cancel', 'galat', 'غلط', 'کینسل']
+LEGACY_RECEIPT = ['receipt', 'raseed', 'total', 'bill', 'status', 'order status', 'order ka status', 'order ki raseed']
+LEGACY_ORDER = ['order', 'menu', 'biryani', 'burger', 'shawarma', 'khaana', 'khana', 'dish', 'item', 'pizza', 'rice', 'pulao']
+LEGACY_YES = ['haan', 'yes', 'ok', 'theek', 'chalo', 'kar do', 'place', 'confirm']
+
+
+def legacy_detect_language(text):
+    text_lower = text.lower()
+    if 'english' in text_lower or any(word in text_lower for word in ['hello', 'order', 'menu', 'please', 'thanks']):
+        return 'English'
+    elif 'urdu' in text_lower or any(word in text_lower for word in ['آرڈر', 'کھانا', 'شکریہ', 'مہربانی']):
+        return 'Urdu'
+    elif 'roman' in text_lower or any(word in text_lower for word in ['kya', 'hai', 'ka', 'mein', 'order', 'biryani', 'shukriya']):
+        return 'Roman Urdu'
+    return 'Roman Urdu'
+
+
+def legacy_route(text):
+    intents = set()
+    if any(word in text.lower() for word in LEGACY_MENU):
+        intents.add('menu')
+    if text.lower() in LEGACY_CANCEL:
+        intents.add('cancel')
+    if any(word in text.lower() for word in LEGACY_RECEIPT):
+        intents.add('receipt')
+    if any(word in text.lower() for word in LEGACY_ORDER):
+        intents.add('order_interest')
+    if any(word in text.lower() for word in LEGACY_YES):
+        intents.add('affirmative')
+    return intents, legacy_detect_language(text)
+
+
+def compiled_route(text, cached=False):
+    route = classify(text) if cached else get_vocabulary().route(text)
+    # Handler cancel sirf poore-message match par karta hai
+    intents = {i for i in route.intents if i != 'cancel' or route.confidence('cancel') >= 1.0}
+    return intents, route.language
+
+
+def accuracy(route_fn, corpus):
+    intent_ok = language_ok = 0
+    misses = []
+    for case in corpus:
+        intents, language = route_fn(case['text'])
+        if intents == set(case['intents']):
+            intent_ok += 1
+        if language == case['language']:
+            language_ok += 1
+        if intents != set(case['intents']) or language != case['language']:
+            misses.append((case['text'], sorted(intents), language))
+    return intent_ok / len(corpus), language_ok / len(corpus), misses
+
+
+def timing(route_fn, corpus, rounds, repeats=5):
+    # Sab se tez repeat: doosre processes ka shor kam
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for case in corpus:
+                route_fn(case['text'])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / (rounds * len(corpus)) * 1e6
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--show-misses', action='store_true')
+    args = parser.parse_args()
+    corpora = [('tuning', _load(CORPUS_PATH)), ('held-out', _load(HELDOUT_PATH))]
+    everything = [case for _, corpus in corpora for case in corpus]
+    modes = [
+        ('legacy', legacy_route),
+        ('compiled', compiled_route),
+        ('compiled+lru', lambda text: compiled_route(text, cached=True)),
+    ]
+    print('corpora: ' + ', '.join(f'{name} {len(corpus)}' for name, corpus in corpora) + ' labelled messages')
+    header = ''.join(f"{name + ' intent':>18}{name + ' lang':>16}" for name, _ in corpora)
+    print(f"{'mode':<14}{header}{'us/msg':>10}")
+    timings = {}
+    for name, fn in modes:
+        row = ''
+        all_misses = []
+        for corpus_name, corpus in corpora:
+            intent_acc, language_acc, misses = accuracy(fn, corpus)
+            row += f"{intent_acc:>18.0%}{language_acc:>16.0%}"
+            all_misses += [(corpus_name,) + miss for miss in misses]
+        timings[name] = timing(fn, everything, args.rounds)
+        print(f"{name:<14}{row}{timings[name]:>10.1f}")
+        if args.show_misses:
+            for miss in all_misses:
+                print('   miss:', miss)
+    ratio = timings['compiled'] / timings['legacy']
+    verdict = 'slower' if ratio > 1 else 'faster'
+    print(f"compiled without cache is {ratio:.2f}x legacy per message ({verdict}); "
+          f"the lru cache only helps exact repeats of a message")
+
+
+if __name__ == '__main__':
+    main()
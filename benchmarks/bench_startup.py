@@ -0,0 +1,116 @@
+"""
+Cold start benchmark: har run ek nayi Python process mein (koi module pehle se loaded
+nahi) yeh naapta hai:
+  - import: `import whatsapp.webhook` (DB, Sheets, OpenAI, Graph clients sab is mein?)
+  - ping: import ke baad pehla GET /ping
+  - warmup: background warmup (DB tables, OpenAI, Graph, Sheets, catalog) khatam hone tak
+  - first_message: warmup ke baad pehla webhook message (inline ingest + inline outbound)
+    ka poora jawab; --no-warmup par yahi message saare clients banata hai
+  - process: process spawn se child ke khatam hone tak ka wall time
+OpenAI, Graph aur Sheets benchmarks.fakes se (latency 0 by default), DB temp directory mein;
+koi network ya API key nahi chahiye. Har run nayi DB file par, taake create_all bhi gina jaye.
+
+Run: python -m benchmarks.bench_startup [--runs 7] [--openai-latency 0] [--graph-latency 0]
+         [--sheets-latency 0] [--no-warmup] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fakes import FakeGraph, FakeGspreadClient, FakeOpenAI
+from benchmarks.loadtest import configure_environment, patch_gspread, webhook_payload
+
+STEPS = ('import', 'ping', 'warmup', 'first_message', 'process')
+
+
+def child(args):
+    # Nayi process: env parent ne set kiya hai, yahan sirf naap kar JSON print
+    patch_gspread(FakeGspreadClient(args.sheets_latency))
+    timings = {}
+    start = time.perf_counter()
+    import whatsapp.webhook as webhook
+    timings['import'] = time.perf_counter() - start
+
+    try:
+        from warmup import start_warmup, wait_for_warmup
+    except ImportError:  # warmup hook se pehle ka tree
+        start_warmup = wait_for_warmup = None
+    warmup_start = time.perf_counter()
+    if start_warmup and not args.no_warmup:
+        start_warmup()
+
+    client = webhook.app.test_client()
+    start = time.perf_counter()
+    client.get('/ping')
+    timings['ping'] = time.perf_counter() - start
+
+    # Production mein warmup bind ke foran baad chalta hai aur pehla customer aam taur par
+    # us ke baad aata hai; --no-warmup par pehla message hi saare clients banata hai
+    if wait_for_warmup and not args.no_warmup:
+        wait_for_warmup()
+        timings['warmup'] = time.perf_counter() - warmup_start
+
+    start = time.perf_counter()
+    response = client.post('/webhook', json=webhook_payload('923001234567', 'salam'))
+    timings['first_message'] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise SystemExit(f'first message failed: {response.status_code} {response.get_data(as_text=True)}')
+    print(json.dumps(timings))
+
+
+def run_once(args, openai_fake, graph_fake):
+    workdir = tempfile.mkdtemp(prefix='alarab-startup-')
+    env = dict(os.environ)
+    configure_environment(workdir, openai_fake, graph_fake, 'inline', environ=env)
+    env['WARMUP'] = '0' if args.no_warmup else '1'
+    command = [sys.executable, '-m', 'benchmarks.bench_startup', '--child',
+               '--sheets-latency', str(args.sheets_latency)]
+    if args.no_warmup:
+        command.append('--no-warmup')
+    start = time.perf_counter()
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    process = time.perf_counter() - start
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process'] = process
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--openai-latency', type=float, default=0.0)
+    parser.add_argument('--graph-latency', type=float, default=0.0)
+    parser.add_argument('--sheets-latency', type=float, default=0.0)
+    parser.add_argument('--no-warmup', action='store_true', help='Background warmup band (WARMUP=0)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    openai_fake = FakeOpenAI(args.openai_latency).start()
+    graph_fake = FakeGraph(args.graph_latency).start()
+    runs = [run_once(args, openai_fake, graph_fake) for _ in range(args.runs)]
+    report = {'runs': args.runs}
+    for step in STEPS:
+        values = [run[step] for run in runs if step in run]
+        if values:
+            report[step] = {'median': round(statistics.median(values), 4),
+                            'min': round(min(values), 4), 'max': round(max(values), 4)}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"runs: {args.runs} (fresh process each)")
+    for step in STEPS:
+        if step in report:
+            r = report[step]
+            print(f"{step:<14} median {r['median'] * 1000:8.1f} ms   min {r['min'] * 1000:8.1f} ms   max {r['max'] * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Load test ke liye local stand-ins, har ek ki apni latency aur error rate:
+  - FakeOpenAI: /v1/chat/completions (openai==0.28 ka HTTP protocol), order assistant ke
+    prompts pehchan kar reply / JSON extraction / yes-no / summary deta hai
+  - FakeGraph: WhatsApp Cloud API ke /<phone_id>/messages aur /<phone_id>/media
+  - FakeGspreadClient: gspread ka in-memory backend (open_by_key -> sheet1 worksheet)
+Dono HTTP fakes 127.0.0.1 ke random port par background thread mein chalte hain.
+"""
+import abc
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import gspread
+
+
+def _sleep(latency):
+    if latency > 0:
+        time.sleep(latency * random.uniform(0.5, 1.5))
+
+
+class _QuietServer(ThreadingHTTPServer):
+    # Sau concurrent clients ke liye bara listen backlog; client (e.g. band hota server
+    # process) ke disconnect par traceback nahi
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _FakeServer(abc.ABC):
+    """ThreadingHTTPServer + JSON POST handling; subclasses respond() likhti hain."""
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.stats = defaultdict(int)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                _sleep(fake.latency)
+                if fake.error_rate and random.random() < fake.error_rate:
+                    with fake.lock:
+                        fake.stats['errors'] += 1
+                    status, payload = fake.error()
+                else:
+                    status, payload = fake.respond(self.path, self.headers, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = _QuietServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def error(self):
+        return 500, {'error': {'message': 'fake server error', 'type': 'server_error', 'code': 1}}
+
+    @abc.abstractmethod
+    def respond(self, path, headers, body):
+        """Ek POST ka jawab: (status, JSON payload)."""
+
+
+_NAME_RE = re.compile(r'\b(?:naam|name)\s*(?:hai|is|:)?\s*([A-Z][a-z]+)')
+_ADDRESS_RE = re.compile(r'\baddress\s*(?:hai|is|:)?\s*([^,\n]+)', re.IGNORECASE)
+
+
+class FakeOpenAI(_FakeServer):
+    def respond(self, path, headers, body):
+        request = json.loads(body or b'{}')
+        prompt = request['messages'][0]['content']
+        if request.get('response_format', {}).get('type') == 'json_object':
+            kind, content = 'extract', json.dumps(self._extract(prompt))
+        elif "'yes' ya 'no'" in prompt:
+            kind, content = 'confirm', 'yes'
+        elif 'conversation memory' in prompt:
+            kind, content = 'summary', 'Customer order de raha hai.'
+        else:
+            kind, content = 'reply', 'Al Arab Restaurant mein khush aamdeed! Aap kya order karna chahenge?'
+        with self.lock:
+            self.stats['calls'] += 1
+            self.stats[kind] += 1
+        prompt_tokens = sum(len(m.get('content') or '') for m in request['messages']) // 4
+        return 200, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(content) // 4,
+                      'total_tokens': prompt_tokens + len(content) // 4},
+        }
+
+    @staticmethod
+    def _extract(prompt):
+        # Sirf customer message se naam aur address (items/phone/payment fast-path nikalta hai)
+        match = re.search(r'Customer message: (.*)', prompt)
+        message = match.group(1) if match else ''
+        name = _NAME_RE.search(message)
+        address = _ADDRESS_RE.search(message)
+        return {
+            'name': name.group(1) if name else None,
+            'address': address.group(1).strip() if address else None,
+            'phone': None,
+            'items': None,
+            'payment_type': None,
+        }
+
+
+class FakeGraph(_FakeServer):
+    """Har recipient ko gaye messages gin kar rakhta hai; wait_for_reply() load driver ke liye."""
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        super().__init__(latency, error_rate)
+        self.sent = defaultdict(list)  # recipient -> [(time, type, body)]
+        self._cond = threading.Condition(self.lock)
+
+    def respond(self, path, headers, body):
+        if path.endswith('/media'):
+            with self.lock:
+                self.stats['media_uploads'] += 1
+            return 200, {'id': f'media-{random.randrange(10 ** 9)}'}
+        message = json.loads(body or b'{}')
+        with self._cond:
+            self.stats['messages'] += 1
+            self.sent[message.get('to')].append(
+                (time.perf_counter(), message.get('type'), (message.get('text') or {}).get('body'))
+            )
+            self._cond.notify_all()
+        return 200, {'messaging_product': 'whatsapp', 'messages': [{'id': f'wamid.fake{random.randrange(10 ** 12)}'}]}
+
+    def reply_count(self, recipient):
+        with self.lock:
+            return len(self.sent[recipient])
+
+    def wait_for_reply(self, recipient, after_count, timeout):
+        """Recipient ko `after_count` ke baad pehla message aane tak ruko; uska (time, type, body) ya None."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while len(self.sent[recipient]) <= after_count:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.sent[recipient][after_count]
+
+    def messages_to(self, recipient):
+        with self.lock:
+            return list(self.sent[recipient])
+
+
+def _api_error(status=503):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({'error': {'code': status, 'message': 'fake sheets error', 'status': 'UNAVAILABLE'}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+class FakeWorksheet:
+    def __init__(self, client):
+        self.client = client
+        self.rows = []
+
+    def _call(self, name):
+        self.client.call(name)
+
+    def row_values(self, row):
+        self._call('row_values')
+        return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def col_values(self, col):
+        self._call('col_values')
+        return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+    def append_row(self, row):
+        return self.append_rows([row])
+
+    def append_rows(self, rows):
+        self._call('append_rows')
+        with self.client.lock:
+            first = len(self.rows) + 1
+            self.rows.extend(list(r) for r in rows)
+            last = len(self.rows)
+        return {'updates': {'updatedRange': f'Sheet1!A{first}:J{last}', 'updatedRows': len(rows)}}
+
+    def update(self, values, range_name='A1'):
+        self._call('update')
+        if self.rows:
+            self.rows[0] = list(values[0])
+        else:
+            self.rows.append(list(values[0]))
+
+    def update_cell(self, row, col, value):
+        self._call('update_cell')
+        with self.client.lock:
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            cells.extend([''] * (col - len(cells)))
+            cells[col - 1] = value
+
+
+class FakeGspreadClient:
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.stats = defaultdict(int)
+        self.sheet1 = FakeWorksheet(self)
+
+    def call(self, name):
+        _sleep(self.latency)
+        with self.lock:
+            self.stats[name] += 1
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                raise _api_error()
+
+    def open_by_key(self, key):
+        return self
@@ -0,0 +1,242 @@
+"""
+Offline load test: asli Flask webhook (werkzeug threaded server) ko scripted order
+conversations (greeting -> details -> confirm) se target concurrency par chalata hai.
+OpenAI, Graph API aur Google Sheets ki jagah benchmarks.fakes ke local stand-ins, har ek
+ki latency aur error rate flags se; koi network ya API key nahi chahiye. DB, dedup,
+ingest journal aur media cache ek temp directory mein.
+
+Report: per-turn latency (webhook POST se customer ko pehla reply pohanchne tak)
+p50/p95/p99, messages/sec, confirmed orders aur LLM calls per order.
+
+Run: python -m benchmarks.loadtest [--conversations 50] [--concurrency 10]
+         [--openai-latency 0.4] [--graph-latency 0.1] [--sheets-latency 0.3]
+         [--openai-error-rate 0] [--graph-error-rate 0] [--sheets-error-rate 0]
+         [--ingest inline|queue] [--corpus conversations.jsonl] [--json]
+
+Corpus (optional): JSONL, har line ek conversation: {"turns": ["salam", "order karna hai", ...]}
+Na diya jaye to --conversations jitni conversations generate hoti hain.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fakes import FakeGraph, FakeGspreadClient, FakeOpenAI
+
+NAMES = ['Ahmed', 'Bilal', 'Sana', 'Ayesha', 'Usman', 'Hina', 'Farhan', 'Zainab']
+ADDRESSES = ['House 12 Block 5 Gulshan', 'Flat 3 Johar Block 15', 'Street 7 DHA Phase 6', 'Shop 2 Saddar Market']
+ITEMS = ['2 chicken shawarma', '1 zinger burger', '3 lebanese shawarma', '1 chicken biryani full',
+         '2 zinger burger aur 1 chicken shawarma', '1 falafel platter half']
+GREETINGS = ['salam', 'assalam o alaikum', 'hello', 'hi']
+ORDER_INTENT = ['order karna hai', 'mujhe order dena hai', 'I want to order']
+AFFIRM = ['haan', 'yes', 'ji haan']
+PAYMENTS = ['cash', 'cash on delivery', 'easypaisa']
+CONFIRMS = ['confirm', 'haan theek hai', 'ok confirm']
+CONFIRMED_MARKER = 'order confirm ho gaya'
+
+
+def generate_conversations(count, menu_rate=0.2, seed=7):
+    rng = random.Random(seed)
+    conversations = []
+    for _ in range(count):
+        turns = [rng.choice(GREETINGS)]
+        if rng.random() < menu_rate:
+            turns.append('menu')
+        turns += [
+            rng.choice(ORDER_INTENT),
+            rng.choice(AFFIRM),
+            rng.choice(ITEMS),
+            f"naam {rng.choice(NAMES)}, address {rng.choice(ADDRESSES)}",
+            f"03{rng.randrange(10 ** 9):09d}, {rng.choice(PAYMENTS)}",
+            rng.choice(CONFIRMS),
+        ]
+        conversations.append({'turns': turns})
+    return conversations
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def configure_environment(workdir, openai_fake, graph_fake, ingest, environ=None):
+    # App modules import hone se pehle: sab kuch temp dir aur fakes ki taraf
+    environ = os.environ if environ is None else environ
+    environ.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'INGEST_MODE': ingest,
+        'INGEST_QUEUE_PATH': os.path.join(workdir, 'ingest_queue.db'),
+        'DEDUP_BACKEND': 'memory',
+        'SESSION_BACKEND': 'memory',
+        'MEDIA_CACHE_PATH': os.path.join(workdir, 'media_cache.db'),
+        # Inline mode mein webhook sab replies bhej kar hi lautta hai
+        'OUTBOUND_MODE': 'inline' if ingest == 'inline' else 'queue',
+        'GRAPH_API_BASE': graph_fake.url,
+        'WHATSAPP_CLOUD_TOKEN': 'fake-token',
+        'WHATSAPP_PHONE_NUMBER_ID': 'bench',
+        'OPENAI_API_KEY': 'sk-fake-bench-key',
+        'OPENAI_API_BASE': openai_fake.url + '/v1',
+        'GOOGLE_SERVICE_ACCOUNT_JSON': '{}',
+        'GOOGLE_SHEET_ID': 'bench-sheet',
+        'VERIFICATION_TOKEN': 'bench',
+        'LOG_LEVEL': environ.get('LOG_LEVEL', 'WARNING'),
+        'LOG_LEVELS': environ.get('LOG_LEVELS', 'werkzeug=WARNING'),
+    })
+
+
+def patch_gspread(sheets_fake):
+    # Sheets client pehli call par banta hai (google_sheets.get_client): credentials aur client fake se
+    import gspread
+    from google.oauth2 import service_account
+    service_account.Credentials.from_service_account_info = classmethod(lambda cls, info, **kwargs: None)
+    gspread.authorize = lambda credentials, *args, **kwargs: sheets_fake
+
+
+def start_app():
+    from werkzeug.serving import make_server
+    from whatsapp.webhook import app
+    from sheets.outbox import start_sheet_outbox
+    start_sheet_outbox()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-webhook', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/webhook'
+
+
+def webhook_payload(number, text):
+    return {'entry': [{'changes': [{'value': {'messages': [
+        {'from': number, 'id': f'wamid.{uuid.uuid4().hex}', 'type': 'text', 'text': {'body': text}}
+    ]}}]}]}
+
+
+def run_conversation(session, url, graph, number, turns, timeout, settle):
+    results = []
+    for text in turns:
+        before = graph.reply_count(number)
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=webhook_payload(number, text), timeout=timeout)
+            ack = time.perf_counter() - start
+            ok = response.status_code == 200
+        except Exception:
+            ack, ok = time.perf_counter() - start, False
+        reply = graph.wait_for_reply(number, before, timeout) if ok else None
+        if reply is None:
+            results.append({'text': text, 'ack': ack, 'latency': None})
+            continue
+        results.append({'text': text, 'ack': ack, 'latency': reply[0] - start})
+        # Queue mode: is turn ke baqi replies (summary + receipt wagherah) aane do, taake
+        # agle turn ka pehla reply ghalat na gina jaye
+        count = graph.reply_count(number)
+        while settle > 0:
+            time.sleep(settle)
+            latest = graph.reply_count(number)
+            if latest == count:
+                break
+            count = latest
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conversations', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--corpus', help='JSONL conversations ({"turns": [...]}) instead of generated ones')
+    parser.add_argument('--menu-rate', type=float, default=0.2, help='Generated conversations asking for the menu PDF')
+    parser.add_argument('--ingest', choices=['inline', 'queue'], default='inline')
+    parser.add_argument('--openai-latency', type=float, default=0.4)
+    parser.add_argument('--openai-error-rate', type=float, default=0.0)
+    parser.add_argument('--graph-latency', type=float, default=0.1)
+    parser.add_argument('--graph-error-rate', type=float, default=0.0)
+    parser.add_argument('--sheets-latency', type=float, default=0.3)
+    parser.add_argument('--sheets-error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='Max seconds to wait for a reply')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    openai_fake = FakeOpenAI(args.openai_latency, args.openai_error_rate).start()
+    graph_fake = FakeGraph(args.graph_latency, args.graph_error_rate).start()
+    sheets_fake = FakeGspreadClient(args.sheets_latency, args.sheets_error_rate)
+    workdir = tempfile.mkdtemp(prefix='alarab-loadtest-')
+    configure_environment(workdir, openai_fake, graph_fake, args.ingest)
+    patch_gspread(sheets_fake)
+    server, url = start_app()
+
+    conversations = load_corpus(args.corpus) if args.corpus else generate_conversations(args.conversations, args.menu_rate)
+    numbers = [f'92300{i:07d}' for i in range(len(conversations))]
+    settle = 0.05 if args.ingest == 'queue' else 0.0
+
+    import requests
+    local = threading.local()
+
+    def drive(index):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return run_conversation(local.session, url, graph_fake, numbers[index],
+                                conversations[index]['turns'], args.timeout, settle)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(drive, range(len(conversations))))
+    wall = time.perf_counter() - start
+    server.shutdown()
+
+    turns = [turn for conversation in results for turn in conversation]
+    latencies = [t['latency'] for t in turns if t['latency'] is not None]
+    acks = [t['ack'] for t in turns]
+    orders = sum(
+        1 for number in numbers
+        if any(body and CONFIRMED_MARKER in body for _, _, body in graph_fake.messages_to(number))
+    )
+    llm_calls = openai_fake.stats['calls']
+    report = {
+        'conversations': len(conversations),
+        'concurrency': args.concurrency,
+        'ingest': args.ingest,
+        'turns': len(turns),
+        'timeouts': len(turns) - len(latencies),
+        'wall_seconds': round(wall, 2),
+        'messages_per_second': round(len(turns) / wall, 2) if wall else 0.0,
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p95': round(percentile(latencies, 95), 3),
+        'latency_p99': round(percentile(latencies, 99), 3),
+        'latency_max': round(max(latencies), 3) if latencies else 0.0,
+        'ack_p50': round(percentile(acks, 50), 3),
+        'ack_p99': round(percentile(acks, 99), 3),
+        'orders_confirmed': orders,
+        'llm_calls': llm_calls,
+        'llm_calls_per_order': round(llm_calls / orders, 2) if orders else None,
+        'llm_calls_by_kind': {k: openai_fake.stats[k] for k in ('reply', 'extract', 'confirm', 'summary')},
+        'graph_messages': graph_fake.stats['messages'],
+        'graph_media_uploads': graph_fake.stats['media_uploads'],
+        'injected_errors': {'openai': openai_fake.stats['errors'], 'graph': graph_fake.stats['errors'],
+                            'sheets': sheets_fake.stats['errors']},
+        'sheet_rows': max(0, len(sheets_fake.sheet1.rows) - 1),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"conversations: {report['conversations']}  concurrency: {report['concurrency']}  "
+          f"ingest: {report['ingest']}  turns: {report['turns']}  timeouts: {report['timeouts']}")
+    print(f"wall: {report['wall_seconds']}s  throughput: {report['messages_per_second']} msg/s")
+    print(f"reply latency  p50 {report['latency_p50']:.3f}s  p95 {report['latency_p95']:.3f}s  "
+          f"p99 {report['latency_p99']:.3f}s  max {report['latency_max']:.3f}s")
+    print(f"webhook ack    p50 {report['ack_p50']:.3f}s  p99 {report['ack_p99']:.3f}s")
+    print(f"orders confirmed: {orders}/{len(conversations)}  LLM calls: {llm_calls} "
+          f"({report['llm_calls_per_order']} per order, {report['llm_calls_by_kind']})")
+    print(f"graph messages: {report['graph_messages']}  media uploads: {report['graph_media_uploads']}  "
+          f"sheet rows: {report['sheet_rows']}  injected errors: {report['injected_errors']}")
+
+
+if __name__ == '__main__':
+    main()
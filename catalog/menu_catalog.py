@@ -0,0 +1,245 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+
+# Menu ka ek hi source: catalog/menu.json. Startup par ek dafa load ho kar alias index
+# banta hai; handler, prompts, text menu aur receipts sab yahin se parhte hain.
+
+MENU_PATH = os.getenv('MENU_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'menu.json'))
+LOOKUP_CACHE_SIZE = 4096  # lookup() ke yaad rakhe nateeje, har catalog object ke apne
+
+_NON_WORD_RE = re.compile(r'[^\w\s]+', re.UNICODE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+class MenuItem:
+    __slots__ = ('name', 'category', 'prices', 'aliases')
+
+    def __init__(self, name, category, prices, aliases):
+        self.name = name
+        self.category = category
+        self.prices = prices  # {size: price}, JSON order preserve hota hai
+        self.aliases = aliases
+
+    @property
+    def sizes(self):
+        return list(self.prices)
+
+    def price(self, size=None):
+        if size and size in self.prices:
+            return self.prices[size]
+        if len(self.prices) == 1:
+            return next(iter(self.prices.values()))
+        return None  # Half/Full wala item, size nahi bataya
+
+    def price_text(self, currency='Rs.'):
+        return f"{currency} " + '/'.join(f"{p:,}" for p in self.prices.values())
+
+
+class MenuCatalog:
+    def __init__(self, data):
+        self.data = data
+        # Menu/timings badlein to version badalta hai (answer cache isi se invalidate hota hai)
+        self.version = hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self.currency = data.get('currency', 'Rs.')
+        self.items = [MenuItem(i['name'], i.get('category', ''), i['prices'], i.get('aliases', [])) for i in data['items']]
+        self.deals = data.get('deals', [])
+        self.specials = data.get('specials', [])
+        self.info = data.get('info', {})
+        self.size_words = data.get('size_words', {})
+        self.spelling_variants = data.get('spelling_variants', {})
+        # Har ghalat spelling -> canonical token
+        self._canonical_token = {}
+        for canonical, variants in self.spelling_variants.items():
+            for variant in variants:
+                self._canonical_token[variant] = canonical
+        # normalized alias -> item (lambe alias pehle match hon is liye list bhi sorted)
+        self._alias_index = {}
+        for item in self.items:
+            for alias in [item.name] + item.aliases:
+                self._alias_index.setdefault(self.normalize(alias), item)
+        self._alias_keys = sorted(self._alias_index, key=len, reverse=True)
+        self._by_name = {item.name.lower(): item for item in self.items}
+        # (text, cutoff) -> (item, size); instance ke sath hi khatam, reload par naya catalog naya cache
+        self._lookup_cache = {}
+
+    def normalize(self, text):
+        text = _SPACE_RE.sub(' ', _NON_WORD_RE.sub(' ', str(text).lower())).strip()
+        return ' '.join(self._canonical_token.get(token, token) for token in text.split(' '))
+
+    def get(self, name):
+        return self._by_name.get(str(name).lower())
+
+    def split_size(self, text):
+        # "biryani half" -> ("biryani", "Half")
+        size = None
+        tokens = []
+        for token in self.normalize(text).split(' '):
+            if token in self.size_words:
+                size = self.size_words[token]
+            else:
+                tokens.append(token)
+        return ' '.join(tokens), size
+
+    def lookup(self, text, cutoff=0.8):
+        """
+        Free text ("shwarma chicken", "biryani half") -> (MenuItem, size) ya (None, None).
+        Pehle exact normalized alias, phir fuzzy match.
+        """
+        key = (str(text), cutoff)
+        result = self._lookup_cache.get(key)
+        if result is None:
+            if len(self._lookup_cache) >= LOOKUP_CACHE_SIZE:
+                self._lookup_cache.clear()
+            result = self._lookup_cache[key] = self._lookup(*key)
+        return result
+
+    def _lookup(self, text, cutoff):
+        key, size = self.split_size(text)
+        item = self._alias_index.get(key)
+        if item is None and key:
+            # Word order ulta ho ("shawarma chicken") to sorted tokens se try karo
+            sorted_key = ' '.join(sorted(key.split(' ')))
+            for alias in self._alias_keys:
+                if ' '.join(sorted(alias.split(' '))) == sorted_key:
+                    item = self._alias_index[alias]
+                    break
+        if item is None and key:
+            match = difflib.get_close_matches(key, self._alias_keys, n=1, cutoff=cutoff)
+            if match:
+                item = self._alias_index[match[0]]
+        if item is None:
+            return None, None
+        if size not in item.prices:
+            size = item.sizes[0] if len(item.prices) == 1 else None
+        return item, size
+
+    def normalize_items(self, items):
+        """
+        Extracted items (list of {name, quantity, size}) ko catalog ke canonical naam aur size
+        se milata hai. Catalog mein na mile to item waisa hi rehta hai.
+        """
+        if not isinstance(items, list):
+            return items
+        normalized = []
+        for entry in items:
+            if not isinstance(entry, dict) or not entry.get('name'):
+                continue
+            text = f"{entry['name']} {entry.get('size') or ''}"
+            item, size = self.lookup(text)
+            entry = dict(entry)
+            if item is not None:
+                entry['name'] = item.name
+                if size:
+                    entry['size'] = size
+            normalized.append(entry)
+        return normalized
+
+    def resolve_line(self, entry):
+        """
+        Ek order line ({name, quantity, size}) -> catalog naam, size, qty, unit_price, line_total, label.
+        Catalog mein na mile ya size na pata ho to unit_price/line_total None.
+        """
+        if not isinstance(entry, dict):
+            entry = {'name': str(entry)}
+        try:
+            qty = int(entry.get('quantity', 1) or 1)
+        except (TypeError, ValueError):
+            qty = 1
+        item = self.get(entry.get('name', ''))
+        if item is None:
+            item, size = self.lookup(f"{entry.get('name', '')} {entry.get('size') or ''}")
+        else:
+            size = entry.get('size')
+            size = self.size_words.get(str(size).lower(), size)
+            if size not in item.prices:
+                size = item.sizes[0] if len(item.prices) == 1 else None
+        unit = item.price(size) if item else None
+        label = item.name if item else entry.get('name', 'Item')
+        if item and len(item.prices) > 1 and size in item.prices:
+            label += f" ({size})"
+        return {
+            'name': item.name if item else entry.get('name', 'Item'),
+            'size': size if item else entry.get('size'),
+            'quantity': qty,
+            'unit_price': unit,
+            'line_total': unit * qty if unit is not None else None,
+            'label': label,
+        }
+
+    def price_lines(self, items):
+        """
+        Receipt ke liye: ([(qty, label, unit_price, line_total)], grand_total, complete).
+        Jis item ki qeemat pata na ho us ki unit_price None aur grand_total mein shamil nahi.
+        """
+        if isinstance(items, (str, dict)):
+            items = [items]  # ek free-text/dict line; string ko character-wise iterate na karo
+        lines = []
+        total = 0
+        complete = True
+        for entry in items or []:
+            line = self.resolve_line(entry)
+            if line['line_total'] is None:
+                complete = False
+            else:
+                total += line['line_total']
+            lines.append((line['quantity'], line['label'], line['unit_price'], line['line_total']))
+        return lines, total, complete
+
+    def menu_highlights(self):
+        parts = [f"{item.name} ({item.price_text(self.currency)})" for item in self.items]
+        return "Menu highlights: " + ', '.join(parts + self.specials) + "."
+
+    def deals_text(self):
+        parts = [f"{d['name']} {self.currency} {d['price']:,}" if d.get('price') else d['name'] for d in self.deals]
+        return "Deals: " + ', '.join(parts) + "."
+
+    def prompt_context(self):
+        # LLM context ki menu lines (prompt_builder ke static prefix mein jati hain)
+        return (
+            self.menu_highlights() + "\n" +
+            self.deals_text() + "\n" +
+            f"Timings: {self.info.get('timings', '')}\n"
+            f"Address: {self.info.get('address', '')}\n"
+            f"{self.info.get('services', '')}\n"
+        )
+
+    def render_menu_text(self):
+        # PDF na ja sake to customer ko bhejne wala text menu
+        return (
+            self.menu_highlights() + "\n" +
+            self.deals_text() + "\n" +
+            f"Timings: {self.info.get('timings', '')}\n"
+            f"Address: {self.info.get('address', '')}\n"
+            f"{self.info.get('services', '')}\n"
+            f"Contact: {', '.join(self.info.get('contacts', []))}."
+        )
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def load_catalog(path=MENU_PATH):
+    with open(path, encoding='utf-8') as f:
+        return MenuCatalog(json.load(f))
+
+
+def reload_catalog(path=MENU_PATH):
+    # menu.json edit hone ke baad naya catalog; purana object jo pehle le chuke hain woh waisa hi rehta hai
+    global _catalog
+    catalog = load_catalog(path)
+    with _catalog_lock:
+        _catalog = catalog
+    return catalog
+
+
+def get_catalog():
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = load_catalog()
+    return _catalog
@@ -1,9 +1,14 @@
 import os
 from dotenv import load_dotenv
 import json
+import pathlib
 
-load_dotenv()
-print("DEBUG: WHATSAPP_CLOUD_TOKEN (config.py) =", os.getenv("WHATSAPP_CLOUD_TOKEN"))
+# .env sirf yahan, project root se load hota hai; baqi modules config import karte hain
+def load_env():
+    # Dobara call karna safe hai: pehle se set env variables override nahi hote
+    load_dotenv(dotenv_path=pathlib.Path(__file__).parent.resolve() / '.env')
+
+load_env()
 
 class Config:
     # WHATSAPP_TOKEN = os.getenv('WHATSAPP_TOKEN')
@@ -13,6 +18,32 @@ class Config:
     WHATSAPP_CLOUD_TOKEN = os.getenv('WHATSAPP_CLOUD_TOKEN')
     WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
     VERIFICATION_TOKEN = os.getenv('VERIFICATION_TOKEN')
+    # 'queue' = webhook turant 200 deta hai aur background workers process karte hain, 'inline' = purana tareeqa
+    INGEST_MODE = os.getenv('INGEST_MODE', 'queue')
+    INGEST_QUEUE_PATH = os.getenv('INGEST_QUEUE_PATH', 'ingest_queue.db')
+    # Worker threads zyada tar network (LLM / Graph) ka intezar karte hain, is liye cores se zyada
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', str(min(32, (os.cpu_count() or 1) * 4))))
+    # Journal se ek waqt mein zyada se zyada itni jobs memory mein (workers x 4 tak); baqi journal mein
+    INGEST_MAX_INFLIGHT = int(os.getenv('INGEST_MAX_INFLIGHT', '512'))
+    # Claim ki hui job ka lease (worker zinda ho to har lease/3 par renew); expire ho to doosra worker le le
+    INGEST_LEASE_SECONDS = float(os.getenv('INGEST_LEASE_SECONDS', '60'))
+    # Fail hui job ka pehla retry itni der baad, har agla 4 guna der se
+    INGEST_RETRY_DELAY = float(os.getenv('INGEST_RETRY_DELAY', '5'))
+    # ASGI mode: ek event loop par itni conversations ek sath (threads nahi, coroutines)
+    ASYNC_MAX_CONVERSATIONS = int(os.getenv('ASYNC_MAX_CONVERSATIONS', '500'))
+    # Ek customer ke itne seconds ke andar aaye text messages ek turn mein jor diye jate hain (0 = off)
+    COALESCE_WINDOW = float(os.getenv('COALESCE_WINDOW', '0'))
+    # Customer session/history store: 'memory', 'sqlite' (kai processes) ya 'redis'
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+    SESSION_TTL = int(os.getenv('SESSION_TTL', str(24 * 3600)))
+    SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # Duplicate webhook (same message id) detection: 'memory', 'sqlite' ya 'redis'
+    DEDUP_BACKEND = os.getenv('DEDUP_BACKEND', 'sqlite')
+    DEDUP_DB_PATH = os.getenv('DEDUP_DB_PATH', 'seen_messages.db')
+    DEDUP_TTL = int(os.getenv('DEDUP_TTL', str(3 * 24 * 3600)))
+    DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '50000'))
     
     @staticmethod
     def get_google_service_account():
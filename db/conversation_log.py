@@ -0,0 +1,177 @@
+import atexit
+import datetime
+import os
+import queue
+import random
+import threading
+import time
+from db.models import Conversation, SessionLocal
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Conversation transcript ka write-behind logger: user aur bot ke messages memory queue mein
+# jate hain aur ek background thread unhe batch bana kar ek bulk insert mein conversations
+# table mein likhta hai (batch size ya interval, jo pehle ho). Message ka hot path DB ka
+# kabhi intezar nahi karta; queue bhar jaye to naye messages drop (aur gine) jate hain.
+
+LOG_BATCH_SIZE = int(os.getenv('CONVERSATION_LOG_BATCH_SIZE', '200'))
+LOG_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_LOG_FLUSH_INTERVAL', '2'))
+LOG_MAX_QUEUE = int(os.getenv('CONVERSATION_LOG_MAX_QUEUE', '10000'))
+MAX_BACKOFF = 60
+MESSAGE_MAX_LENGTH = 1000  # Conversation.message String(1000)
+
+
+class ConversationLogger:
+    def __init__(self, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, max_queue=LOG_MAX_QUEUE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = []  # writer ka jama kiya ya fail hua batch, agli flush tak
+        self._flush_lock = threading.Lock()
+        self._started = False
+        self._start_lock = threading.Lock()
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0}
+
+    def log(self, whatsapp_number, sender, message):
+        if not whatsapp_number or not message:
+            return False
+        self.start()
+        row = {
+            'whatsapp_number': str(whatsapp_number),
+            'sender': sender,
+            'message': str(message)[:MESSAGE_MAX_LENGTH],
+            'timestamp': datetime.datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['queued'] += 1
+        return True
+
+    def _drain(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self):
+        """
+        Queue mein pare messages ek/zyada bulk inserts mein likhta hai. Return: likhe gaye rows.
+        Error par rows agli flush ke liye rakh li jati hain aur exception upar jati hai.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._pending[:self.batch_size] or self._drain(self.batch_size)
+                self._pending = self._pending[len(batch):] if self._pending else []
+                if not batch:
+                    return written
+                db = SessionLocal()
+                try:
+                    db.bulk_insert_mappings(Conversation, batch)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    self._pending = batch + self._pending
+                    self.stats['errors'] += 1
+                    raise
+                finally:
+                    db.close()
+                written += len(batch)
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+
+    def _writer(self):
+        failures = 0
+        while True:
+            # Pehla message aane tak ruko, phir batch bharne ya interval guzarne tak jama karo.
+            # Jama kiye rows foran _pending mein, taake flush() (e.g. exit par) unhe bhi likhe
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            collected = 0
+            deadline = time.time() + self.flush_interval
+            while item is not None:
+                with self._flush_lock:
+                    self._pending.append(item)
+                collected += 1
+                if collected >= self.batch_size or time.time() >= deadline:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    item = None
+            with self._flush_lock:
+                if not self._pending:
+                    continue
+            try:
+                self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(MAX_BACKOFF, 2 ** failures) * random.uniform(0.5, 1.5)
+                logger.warning('Conversation log flush error (retry in %.0fs): %s', delay, e)
+                time.sleep(delay)
+
+    def start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._writer, name='conversation-log-writer', daemon=True).start()
+        atexit.register(self._flush_on_exit)
+
+    def _flush_on_exit(self):
+        # Process band hote waqt queue mein bache messages likh do
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error('Conversation log final flush error: %s', e)
+
+    def get_stats(self):
+        return dict(self.stats, backlog=self._queue.qsize() + len(self._pending))
+
+
+def load_history(whatsapp_number, limit=20):
+    """
+    Returning customer ke aakhri `limit` messages, purane se naye, memory turns ki shakal mein.
+    """
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Conversation.sender, Conversation.message)
+            .filter(Conversation.whatsapp_number == str(whatsapp_number))
+            .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+            .limit(limit)
+            .all()
+        )
+    finally:
+        db.close()
+    return [
+        {'role': 'user' if sender == 'user' else 'assistant', 'content': message}
+        for sender, message in reversed(rows)
+    ]
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_conversation_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = ConversationLogger()
+    return _logger
+
+
+def log_message(whatsapp_number, sender, message):
+    # Hot path: sirf queue mein daalta hai, DB ka intezar nahi
+    return get_conversation_logger().log(whatsapp_number, sender, message)
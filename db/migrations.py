@@ -0,0 +1,79 @@
+"""
+Halki migrations (Alembic ke baghair). Har step idempotent hai, dobara chalane se kuch nahi bigarta:
+  - naye indexes aur nullable columns purani tables par bhi (create_all sirf nayi tables banata hai)
+  - orders.items ko TEXT karna (Postgres/MySQL; SQLite length enforce nahi karta)
+  - purane orders ke items JSON se order_items rows backfill
+
+Run: python -m db.migrations
+"""
+from sqlalchemy import inspect, text
+from db.models import Base, Order, OrderItem, SessionLocal, ensure_columns, ensure_indexes, get_engine
+from db.orders import order_item_rows
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def widen_order_items_column(engine=None):
+    # Purani tables mein items VARCHAR(1000) tha; bare orders overflow hote the
+    engine = engine or get_engine()
+    columns = {c['name']: c for c in inspect(engine).get_columns('orders')}
+    column = columns.get('items')
+    if column is None or getattr(column['type'], 'length', None) is None:
+        return False
+    if engine.dialect.name == 'postgresql':
+        statement = 'ALTER TABLE orders ALTER COLUMN items TYPE TEXT'
+    elif engine.dialect.name in ('mysql', 'mariadb'):
+        statement = 'ALTER TABLE orders MODIFY items TEXT'
+    else:
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(statement))
+    return True
+
+
+def backfill_order_items(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Jin orders ki order_items rows nahi hain unki items JSON se rows banata hai. Return: orders backfilled.
+    Khali/kharab items wale orders ki koi row nahi banti (woh har run mein skip hote hain).
+    """
+    done = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            orders = (
+                db.query(Order.id, Order.items)
+                .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+                .filter(Order.id > last_id, OrderItem.id.is_(None))
+                .order_by(Order.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not orders:
+                return done
+            rows = []
+            for order_id, items in orders:
+                order_rows = order_item_rows(order_id, items)
+                rows.extend(order_rows)
+                done += bool(order_rows)
+            if rows:
+                db.bulk_insert_mappings(OrderItem, rows)
+            db.commit()
+            last_id = orders[-1][0]
+    finally:
+        db.close()
+
+
+def migrate(engine=None):
+    engine = engine or get_engine()
+    Base.metadata.create_all(bind=engine)
+    columns = ensure_columns(engine)
+    indexes = ensure_indexes(engine)
+    widened = widen_order_items_column(engine)
+    backfilled = backfill_order_items()
+    return {'columns_added': columns, 'indexes_created': indexes, 'items_column_widened': widened,
+            'orders_backfilled': backfilled}
+
+
+if __name__ == '__main__':
+    print('Migration result:', migrate())
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, create_engine
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
+import threading
 from config import Config
+from logging_config import get_logger
+from metrics import instrument_engine
+
+logger = get_logger(__name__)
 
 Base = declarative_base()
 
@@ -14,32 +19,135 @@ class Order(Base):
     phone = Column(String(20))
     payment_type = Column(String(20))
     whatsapp_number = Column(String(50))
-    items = Column(String(1000))  # JSON string for items
+    items = Column(Text)  # JSON string for items (order_items mein normalized copy)
     notes = Column(String(255))
     status = Column(String(20), default='pending')
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Cancel/receipt ka "customer ka latest order" lookup index seek ban jata hai
+    __table_args__ = (Index('ix_orders_whatsapp_number_created_at', 'whatsapp_number', 'created_at'),)
+
+class OrderItem(Base):
+    # Order ki har line alag row: per-item sales SQL mein aggregate ho sakti hai
+    __tablename__ = 'order_items'
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    size = Column(String(20))
+    quantity = Column(Integer, nullable=False, default=1)
+    unit_price = Column(Integer)  # catalog mein na mile to NULL
+    line_total = Column(Integer)
+
+class SheetOutbox(Base):
+    # Google Sheets ke liye write-behind queue: order ke sath hi commit hota hai, flusher baad mein batch mein bhejta hai
+    __tablename__ = 'sheet_outbox'
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=True)
+    row = Column(Text, nullable=False)  # JSON list: sheet row exactly as it will be appended
+    status = Column(String(20), default='pending', index=True)  # pending / sending / sent / failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(String(255))
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime)
+    # 'sending' rows ka lease: kis flusher (process) ne kab claim kiya; purana lease dobara claim hota hai
+    claimed_by = Column(String(64))
+    claimed_at = Column(DateTime)
+
+class SheetRowIndex(Base):
+    # Order.id -> Google Sheet row number, taake status update bina poori sheet parhe ho sake
+    __tablename__ = 'sheet_row_index'
+    order_id = Column(Integer, primary_key=True)
+    row = Column(Integer, nullable=False)
 
 class Conversation(Base):
     __tablename__ = 'conversations'
     id = Column(Integer, primary_key=True)
-    whatsapp_number = Column(String(50))
+    whatsapp_number = Column(String(50), index=True)
     sender = Column(String(10))  # 'user' ya 'bot'
     message = Column(String(1000))
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
-# DB setup
-engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# DB setup: engine pehli zarurat par banta hai aur tables/indexes pehli session (ya startup
+# warmup) se pehle ek dafa; module import par koi connection nahi
+_engine = None
+_session_factory = None
+_db_ready = False
+_db_lock = threading.RLock()
+
+def get_engine():
+    global _engine, _session_factory
+    with _db_lock:
+        if _engine is None:
+            engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+            instrument_engine(engine)
+            _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            _engine = engine
+    return _engine
+
+def __getattr__(name):
+    # Purana `from db.models import engine` bhi chalta rahe
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def ensure_db():
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_lock:
+        if not _db_ready:
+            get_engine()
+            try_init_db()
+            _db_ready = True
+
+def SessionLocal():
+    ensure_db()
+    return _session_factory()
 
 def init_db():
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    ensure_columns(engine)
+    ensure_indexes(engine)
+
+def ensure_columns(engine=None):
+    # create_all purani tables mein naye (nullable) columns bhi nahi daalta
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}'
+                ))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+def ensure_indexes(engine=None):
+    # create_all purani (pehle se bani) tables par naye indexes nahi banata
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
 
 def try_init_db():
     try:
         init_db()
-        print('Database tables initialized successfully.')
+        logger.info('Database tables initialized successfully.')
     except Exception as e:
-        print('Database initialization error:', e)
-
-try_init_db() 
-    
+        logger.exception('Database initialization error: %s', e)
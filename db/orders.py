@@ -0,0 +1,76 @@
+import json
+from sqlalchemy import func
+from catalog.menu_catalog import get_catalog
+from db.models import Order, OrderItem
+
+# Orders ke aam queries ek jagah: latest order (composite index se), order_items rows
+# banana, aur per-item sales SQL mein aggregate karna.
+
+
+def parse_items(raw):
+    # Order.items JSON string (ya pehle se list) -> list
+    if isinstance(raw, list):
+        return raw
+    try:
+        items = json.loads(raw or '[]')
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def order_item_rows(order_id, items):
+    """Order ki items list -> order_items table ke rows (catalog se naam, size aur qeemat)."""
+    catalog = get_catalog()
+    rows = []
+    for entry in parse_items(items):
+        line = catalog.resolve_line(entry)
+        rows.append({
+            'order_id': order_id,
+            'name': str(line['name'])[:100],
+            'size': line['size'],
+            'quantity': line['quantity'],
+            'unit_price': line['unit_price'],
+            'line_total': line['line_total'],
+        })
+    return rows
+
+
+def add_order_items(db, order_id, items):
+    rows = order_item_rows(order_id, items)
+    if rows:
+        db.bulk_insert_mappings(OrderItem, rows)
+    return len(rows)
+
+
+def latest_order(db, whatsapp_number):
+    # (whatsapp_number, created_at) index par seek
+    return (
+        db.query(Order)
+        .filter(Order.whatsapp_number == whatsapp_number)
+        .order_by(Order.created_at.desc())
+        .first()
+    )
+
+
+def item_sales(db, since=None, include_cancelled=False):
+    """
+    Per item (aur size) kitne bike aur kitni raqam: [(name, size, quantity, revenue), ...]
+    """
+    query = (
+        db.query(
+            OrderItem.name,
+            OrderItem.size,
+            func.sum(OrderItem.quantity).label('quantity'),
+            func.sum(OrderItem.line_total).label('revenue'),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+    )
+    if since is not None:
+        query = query.filter(Order.created_at >= since)
+    if not include_cancelled:
+        query = query.filter(Order.status != 'cancelled')
+    return (
+        query.group_by(OrderItem.name, OrderItem.size)
+        .order_by(func.sum(OrderItem.quantity).desc())
+        .all()
+    )
@@ -0,0 +1,168 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from config import load_env
+
+# App-wide logging: log calls sirf ek memory queue mein record daalte hain (hot path par koi
+# stdout I/O nahi), ek background listener thread unhe format, redact aur stdout par likhta hai.
+# Levels env se: LOG_LEVEL (default) aur LOG_LEVELS per module, e.g.
+#   LOG_LEVELS="whatsapp.handler=DEBUG,openai_agent=WARNING"
+# Prompt/payload/reply jaise bare dumps sirf DEBUG par, aur LOG_DUMP_SAMPLE_RATE ke hisaab se sampled.
+
+load_env()  # LOG_* settings .env mein bhi ho sakti hain
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' ya 'json' (ek line per record)
+LOG_REDACT = os.getenv('LOG_REDACT', '1').lower() not in ('0', 'false', 'no', 'off')
+LOG_DUMP_SAMPLE_RATE = float(os.getenv('LOG_DUMP_SAMPLE_RATE', '1'))
+LOG_MAX_QUEUE = int(os.getenv('LOG_MAX_QUEUE', '10000'))
+
+# In env vars ki values kabhi log mein nahi jani chahiye
+SECRET_ENV_VARS = (
+    'WHATSAPP_CLOUD_TOKEN', 'OPENAI_API_KEY', 'VERIFICATION_TOKEN', 'GOOGLE_SERVICE_ACCOUNT_JSON',
+    'SQLALCHEMY_DATABASE_URI', 'REDIS_URL',
+)
+REDACTED = '***'
+_SECRET_PATTERNS = [
+    (re.compile(r'(Bearer\s+)[\w\-.~+/=]+', re.IGNORECASE), r'\1' + REDACTED),
+    (re.compile(r'\bsk-[\w\-]{8,}'), REDACTED),
+    (re.compile(r'-----BEGIN [A-Z ]*PRIVATE KEY-----.*?-----END [A-Z ]*PRIVATE KEY-----', re.DOTALL), REDACTED),
+    (re.compile(r'((?:access_token|api_key|token|password|secret)["\']?\s*[=:]\s*["\']?)[^\s"\'&,}]+', re.IGNORECASE),
+     r'\1' + REDACTED),
+    (re.compile(r'(://[^:/@\s]+:)[^@/\s]+@'), r'\1' + REDACTED + '@'),  # DB/Redis URL password
+]
+
+
+def _secret_values():
+    values = []
+    for name in SECRET_ENV_VARS:
+        value = os.getenv(name)
+        if value and len(value) >= 8:
+            values.append(value)
+    return sorted(values, key=len, reverse=True)
+
+
+def redact(text):
+    for value in _secret_values():
+        if value in text:
+            text = text.replace(value, REDACTED)
+    for pattern, replacement in _SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """Formatted message se tokens, keys aur passwords hatata hai (listener thread mein chalta hai)."""
+
+    def filter(self, record):
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return True
+
+
+# Har incoming message ka trace ID; us message ke saare log records par lagta hai
+_trace_id = contextvars.ContextVar('trace_id', default='-')
+
+
+def new_trace_id():
+    trace_id = uuid.uuid4().hex[:12]
+    return trace_id, _trace_id.set(trace_id)
+
+
+def reset_trace_id(token):
+    _trace_id.reset(token)
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+class TraceIdFilter(logging.Filter):
+    # Queue handler par (caller ke thread mein), taake listener thread ko sahi trace ID mile
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'trace_id': getattr(record, 'trace_id', '-'),
+            'message': record.getMessage(),
+        }, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # Queue bhar jaye to record drop (aur gina) hota hai; log ki wajah se message kabhi nahi rukta
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _NonBlockingQueueHandler.dropped += 1
+
+
+def parse_levels(spec):
+    levels = {}
+    for part in spec.split(','):
+        name, _, level = part.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, fmt=LOG_FORMAT, redact_secrets=LOG_REDACT):
+    """Root logger par queue handler lagata hai. Dobara call karne se kuch nahi hota."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        if fmt == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(trace_id)s]: %(message)s'))
+        if redact_secrets:
+            output.addFilter(RedactingFilter())
+        log_queue = queue.Queue(maxsize=LOG_MAX_QUEUE)
+        root = logging.getLogger()
+        queue_handler = _NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(TraceIdFilter())
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+        for name, module_level in parse_levels(levels).items():
+            logging.getLogger(name).setLevel(module_level)
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _listener.start()
+        atexit.register(_listener.stop)  # exit par queue mein bache records likh do
+
+
+def dropped_log_records():
+    return _NonBlockingQueueHandler.dropped
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def should_dump(logger):
+    """Bara dump (prompt, payload, poora reply) sirf DEBUG par aur sampled."""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_DUMP_SAMPLE_RATE
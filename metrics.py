@@ -0,0 +1,296 @@
+import contextlib
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from logging_config import get_logger, new_trace_id, reset_trace_id
+
+logger = get_logger(__name__)
+
+# Per-stage latency aur counters (OpenAI, Graph API, Sheets, DB), process memory mein, jo
+# webhook ka /metrics route Prometheus text format mein deta hai. Har incoming message ka
+# ek trace ID hota hai (logs mein bhi); slow message par stage-wise breakdown log hota hai
+# aur PROFILE_SAMPLE_RATE ho to sampled messages ka cProfile dump PROFILE_DIR mein.
+
+METRICS_PREFIX = 'alarab'
+SLOW_MESSAGE_SECONDS = float(os.getenv('SLOW_MESSAGE_SECONDS', '5'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # 0 = profiling off
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8)
+
+HELP = {
+    'stage_duration_seconds': 'Time spent in each external call / stage',
+    'stage_errors_total': 'Failed calls per stage',
+    'message_duration_seconds': 'End-to-end handling time of one incoming message',
+    'messages_total': 'Incoming messages handled',
+    'webhook_messages_total': 'Webhook messages by outcome (queued / ok / duplicate / error)',
+    'llm_calls_per_message': 'OpenAI calls made while handling one message',
+    'llm_calls_total': 'OpenAI calls per stage',
+    'llm_tokens_total': 'OpenAI tokens per stage and kind (prompt / completion / cached, cached is part of prompt)',
+    'prompt_estimated_tokens_total': 'Locally estimated prompt tokens of reply calls',
+    'dedup_checks_total': 'Webhook message IDs checked against the seen-message index',
+    'dedup_duplicates_total': 'Redelivered webhook messages dropped as duplicates',
+    'answer_cache_lookups_total': 'FAQ answer cache lookups by result (exact_hit / similar_hit / miss)',
+    'answer_cache_evictions_total': 'FAQ answers evicted from the cache (LRU)',
+    'answer_cache_invalidations_total': 'FAQ answer cache flushes after a catalog change',
+    'confirmation_decisions_total': 'Order confirmation decisions by decision and source (lexicon / cache / llm / llm_error)',
+    'fast_extract_messages_total': 'collecting_details messages run through the rule-based extractor',
+    'fast_extract_fields_total': 'Fields resolved by the rule-based extractor, per field',
+    'extraction_llm_calls_total': 'Detail-extraction LLM calls made or avoided by the fast path',
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.gauges = {}      # name -> callable (scrape ke waqt parhi jati hai)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def value(self, name, **labels):
+        """Counter ki maujooda value (stats aur benchmarks ke liye)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            return self.counters.get(key, 0)
+
+    def values(self, name, label):
+        """Ek label ke hisab se counter ki values: {label value: count}."""
+        with self._lock:
+            items = [(dict(labels), value) for (n, labels), value in self.counters.items() if n == name]
+        return {labels[label]: value for labels, value in items if label in labels}
+
+    def gauge(self, name, fn, help_text=''):
+        self.gauges[name] = fn
+        HELP.setdefault(name, help_text)
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                ((key, list(h.buckets), list(h.counts), h.total, h.sum) for key, h in self.histograms.items()),
+                key=lambda item: item[0],
+            )
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# HELP {METRICS_PREFIX}_{name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {METRICS_PREFIX}_{name} {kind}')
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f'{METRICS_PREFIX}_{name}{_labels(labels)} {value}')
+        for (name, labels), buckets, counts, total, total_sum in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{METRICS_PREFIX}_{name}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+            lines.append(f'{METRICS_PREFIX}_{name}_bucket{_labels(labels + (("le", "+Inf"),))} {total}')
+            lines.append(f'{METRICS_PREFIX}_{name}_sum{_labels(labels)} {total_sum}')
+            lines.append(f'{METRICS_PREFIX}_{name}_count{_labels(labels)} {total}')
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception as e:
+                logger.warning('Metrics gauge %s error: %s', name, e)
+                continue
+            declare(name, 'gauge')
+            lines.append(f'{METRICS_PREFIX}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+REGISTRY = Registry()
+
+# Is waqt handle ho rahe message ki tafseel: stage -> seconds, aur LLM calls
+_message = contextvars.ContextVar('message_trace', default=None)
+
+
+def _observe_stage(stage, elapsed):
+    REGISTRY.observe('stage_duration_seconds', elapsed, stage=stage)
+    current = _message.get()
+    if current is not None:
+        current['stages'][stage] = current['stages'].get(stage, 0.0) + elapsed
+
+
+def record_error(stage):
+    REGISTRY.inc('stage_errors_total', stage=stage)
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """`with timed('openai.reply'):` ya `@timed('sheets.append')`; exception par error gina jata hai."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_error(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _observe_stage(stage, elapsed)
+
+
+def usage_value(obj, key):
+    """OpenAI response/usage ka field: SDK object ho ya purane client ka dict, dono se."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(key)
+    return getattr(obj, key, None)
+
+
+def record_llm_usage(stage, response=None):
+    """Ek OpenAI call: stage counter, tokens (response.usage se) aur current message ka LLM count."""
+    REGISTRY.inc('llm_calls_total', stage=stage)
+    usage = usage_value(response, 'usage')
+    for kind in ('prompt', 'completion'):
+        tokens = usage_value(usage, f'{kind}_tokens')
+        if tokens:
+            REGISTRY.inc('llm_tokens_total', tokens, stage=stage, kind=kind)
+    # Prompt ka woh hissa jo provider ne prefix cache se diya (cached / prompt = cache hit ratio)
+    cached = usage_value(usage_value(usage, 'prompt_tokens_details'), 'cached_tokens')
+    if cached:
+        REGISTRY.inc('llm_tokens_total', cached, stage=stage, kind='cached')
+    current = _message.get()
+    if current is not None:
+        current['llm_calls'] += 1
+
+
+_profile_lock = threading.Lock()  # ek waqt mein sirf ek profiler chal sakta hai
+
+
+def _start_profiler():
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # koi aur profiler pehle se active
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def _finish_profiler(profiler, trace_id, elapsed):
+    try:
+        profiler.disable()
+        if elapsed >= SLOW_MESSAGE_SECONDS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f'{int(time.time())}-{trace_id}.prof')
+            profiler.dump_stats(path)
+            logger.info('Slow message profile written: %s', path)
+    except Exception as e:
+        logger.warning('Profile dump error: %s', e)
+    finally:
+        _profile_lock.release()
+
+
+@contextlib.contextmanager
+def message_trace(message_id=None):
+    """
+    Ek incoming message ka poora span: naya trace ID, total latency, LLM calls per message,
+    slow ho to stage breakdown ka warning aur (sampled) cProfile dump.
+    """
+    trace_id, token = new_trace_id()
+    current = {'stages': {}, 'llm_calls': 0}
+    message_token = _message.set(current)
+    profiler = _start_profiler()
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield trace_id
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            _finish_profiler(profiler, trace_id, elapsed)
+        REGISTRY.inc('messages_total', outcome=outcome)
+        REGISTRY.observe('message_duration_seconds', elapsed)
+        REGISTRY.observe('llm_calls_per_message', current['llm_calls'], buckets=COUNT_BUCKETS)
+        if elapsed >= SLOW_MESSAGE_SECONDS:
+            breakdown = ', '.join(f'{stage}={seconds:.2f}s' for stage, seconds in
+                                  sorted(current['stages'].items(), key=lambda item: -item[1]))
+            logger.warning('Slow message %s: %.2fs, llm_calls=%d (%s)', message_id, elapsed,
+                           current['llm_calls'], breakdown or 'no instrumented stages')
+        _message.reset(message_token)
+        reset_trace_id(token)
+
+
+def instrument_engine(engine, stage='db.query'):
+    """SQLAlchemy engine ki har query ka time aur errors (SessionLocal ki saari queries)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        _observe_stage(stage, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+        record_error(stage)
+
+
+def render_metrics():
+    return REGISTRY.render()
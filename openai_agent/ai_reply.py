@@ -1,10 +1,11 @@
 import os
-import openai
-from dotenv import load_dotenv
+from openai_agent.llm import chat_completion, chat_completion_async
+from aio import run_sync
+from logging_config import get_logger
+from metrics import record_llm_usage, timed
 
-load_dotenv()
+logger = get_logger(__name__)
 
-openai.api_key = os.getenv('OPENAI_API_KEY')
 GPT_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')  # fallback to gpt-4o, else gpt-3.5-turbo
 
 # Guardrail system prompt
@@ -21,34 +22,40 @@ def get_ai_reply(message, system_prompt=None):
         prompt += system_prompt + "\n"
     prompt += message
     try:
-        response = openai.ChatCompletion.create(
-            model=GPT_MODEL,
-            messages=[{"role": "system", "content": prompt}]
-        )
+        with timed('openai.reply'):
+            response = chat_completion(
+                model=GPT_MODEL,
+                messages=[{"role": "system", "content": prompt}]
+            )
+        record_llm_usage('openai.reply', response)
         return response.choices[0].message['content'].strip()
     except Exception as e:
-        print('OpenAI API error:', e)
+        logger.error('OpenAI API error: %s', e)
         return "Sorry, I am unable to reply right now."
 
-def is_order_confirmation(message):
+def is_order_confirmation(message, timeout=None):
     """
     LLM se poochta hai: Kya yeh message order confirmation hai? Sirf 'yes' ya 'no' mein jawab do.
+    timeout (seconds) diya ho to us se zyada intezar nahi; error/timeout par exception upar jata hai.
     """
+    return run_sync(is_order_confirmation_async(message, timeout=timeout))
+
+async def is_order_confirmation_async(message, timeout=None):
     prompt = (
         "User ne yeh message bheja hai: '" + message + "'\n"
         "Kya yeh message order confirmation hai? Sirf 'yes' ya 'no' mein jawab dein. "
         "Agar user ne order confirm kiya hai (chahe kisi bhi style mein, jaise 'haan', 'theek hai', 'ok', 'confirm', 'yes', 'g han', etc.), to 'yes' likhein. Agar nahi, to 'no' likhein."
         "Sirf 'yes' ya 'no' return karein, koi aur text nahi."
     )
-    try:
-        import openai
-        response = openai.ChatCompletion.create(
+    kwargs = {'request_timeout': timeout} if timeout else {}
+    with timed('openai.confirm'):
+        response = await chat_completion_async(
             model=GPT_MODEL,
-            messages=[{"role": "system", "content": prompt}]
+            messages=[{"role": "system", "content": prompt}],
+            max_tokens=2,
+            temperature=0,
+            **kwargs
         )
-        reply = response.choices[0].message['content'].strip().lower()
-        return reply == 'yes'
-    except Exception as e:
-        print('Order confirmation LLM error:', e)
-        # Default: not confirmed if error
-        return False 
\ No newline at end of file
+    record_llm_usage('openai.confirm', response)
+    reply = response.choices[0].message['content'].strip().lower()
+    return reply.startswith('yes')
@@ -0,0 +1,231 @@
+import difflib
+import os
+import threading
+import time
+from collections import OrderedDict
+from catalog.menu_catalog import get_catalog
+from metrics import REGISTRY
+
+# get_ai_reply ke aage FAQ answer cache. "timing kya hai", "address?", "delivery hoti hai?"
+# jaise sawalon ke jawab fixed hain, is liye unhe catalog se pehle se render kar ke bina LLM
+# ke bhej dete hain. Matching: normalized text ka seed sawalon par exact lookup, phir sirf
+# usi intent ke seed sawalon par sakht similarity, aur woh bhi tab jab message mein us intent
+# ka keyword ho. Inkaar, shikayat ya "meri/my" wale sawal hamesha LLM ko. Jawab language ke
+# hisaab se alag cache hote hain.
+
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '1000'))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', str(60 * 60)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.9'))
+# Is se lambe messages asal baat-cheet hain, FAQ nahi
+MAX_QUESTION_TOKENS = 6
+
+# intent -> aam sawal (English / Roman Urdu / Urdu); normalize ho kar similarity index banta hai
+FAQ_QUESTIONS = {
+    'timings': [
+        'timing kya hai', 'timings', 'kab khulta hai', 'kab tak khula hai', 'restaurant kab open hota hai',
+        'kab band hota hai', 'opening hours', 'what are your timings', 'what time do you open',
+        'what time do you close', 'اوقات کیا ہیں', 'کب کھلتا ہے',
+    ],
+    'address': [
+        'address kya hai', 'address', 'aap kahan hain', 'restaurant kahan hai', 'location kya hai',
+        'where are you located', 'what is your address', 'پتہ کیا ہے', 'ایڈریس کیا ہے',
+    ],
+    'deals': [
+        'deals kya hain', 'deals', 'koi deal hai', 'koi offer hai', 'offers', 'any deals',
+        'what deals do you have', 'ڈیلز کیا ہیں',
+    ],
+    'contact': [
+        'contact number', 'phone number', 'contact', 'what is your phone number',
+        'call kis number par karein', 'رابطہ نمبر',
+    ],
+    'delivery': [
+        'delivery hoti hai', 'delivery', 'kya delivery available hai', 'delivery karte hain',
+        'home delivery', 'do you deliver', 'ڈیلیوری ہوتی ہے',
+    ],
+}
+
+# Har intent ke alfaaz: message mein inmein se koi na ho to woh intent nahi ("number do" contact
+# nahi, customer apna number de raha ho sakta hai). Do intents ke keywords hon to bhi LLM
+# ("delivery address" delivery ka sawal nahi).
+INTENT_KEYWORDS = {
+    'timings': {'timing', 'timings', 'time', 'open', 'opening', 'close', 'khulta', 'khula', 'band', 'hours',
+                'اوقات', 'کھلتا', 'ٹائمنگ'},
+    'address': {'address', 'location', 'located', 'kahan', 'پتہ', 'ایڈریس', 'لوکیشن'},
+    'deals': {'deal', 'deals', 'offer', 'offers', 'ڈیلز', 'آفر'},
+    'contact': {'contact', 'phone', 'call', 'رابطہ'},
+    'delivery': {'delivery', 'deliver', 'ڈیلیوری'},
+}
+
+# Inkaar, shikayat aur apni cheez ("meri delivery", "my address") ke sawal: canned jawab ghalat
+NEGATION_WORDS = {'no', 'not', 'nahi', 'nahin', 'nai', 'mat', 'na', 'dont', 'don', 'nope', 'نہیں', 'مت'}
+COMPLAINT_WORDS = {
+    'late', 'der', 'deir', 'cold', 'thanda', 'thandi', 'kharab', 'bura', 'buri', 'complaint', 'shikayat',
+    'missing', 'wrong', 'galat', 'refund', 'problem', 'masla', 'شکایت', 'دیر', 'غلط', 'خراب',
+}
+POSSESSIVE_WORDS = {'my', 'mine', 'meri', 'mera', 'mere', 'hamara', 'hamari', 'میرا', 'میری', 'میرے'}
+_LLM_ONLY_WORDS = NEGATION_WORDS | COMPLAINT_WORDS | POSSESSIVE_WORDS
+
+# Sawal ke "maani" par asar na dalne wale alfaaz
+_STOPWORDS = {
+    'bhai', 'sir', 'ji', 'please', 'plz', 'pls', 'zara', 'yaar', 'batao', 'bataein', 'bata', 'dein', 'do',
+    'kya', 'hai', 'hain', 'ka', 'ki', 'ke', 'aap', 'ap', 'apka', 'aapka', 'apki', 'aapki', 'your', 'you',
+    'what', 'is', 'are', 'the', 'a', 'me', 'hello', 'hi', 'salam', 'assalam', 'o', 'alaikum', 'kia', 'h',
+    'کیا', 'ہے', 'ہیں', 'آپ', 'کا', 'کی',
+}
+
+
+def render_answers(catalog):
+    """intent -> {language: jawab}, catalog ki info se."""
+    info = catalog.info
+    contacts = ', '.join(info.get('contacts', []))
+    deals = catalog.deals_text()
+    return {
+        'timings': {
+            'English': f"Al Arab Restaurant is open daily: {info.get('timings', '')} 🕌⏰",
+            'Roman Urdu': f"Al Arab Restaurant ki timings: {info.get('timings', '')} 🕌⏰",
+            'Urdu': f"العرب ریسٹورنٹ کے اوقات: {info.get('timings', '')} 🕌⏰",
+        },
+        'address': {
+            'English': f"Al Arab Restaurant address: {info.get('address', '')} 📍",
+            'Roman Urdu': f"Al Arab Restaurant ka address: {info.get('address', '')} 📍",
+            'Urdu': f"العرب ریسٹورنٹ کا پتہ: {info.get('address', '')} 📍",
+        },
+        'deals': {
+            'English': f"Al Arab Restaurant {deals} 🎉",
+            'Roman Urdu': f"Al Arab Restaurant ki {deals} 🎉",
+            'Urdu': f"العرب ریسٹورنٹ {deals} 🎉",
+        },
+        'contact': {
+            'English': f"Call Al Arab Restaurant at: {contacts} 📞",
+            'Roman Urdu': f"Al Arab Restaurant ke contact numbers: {contacts} 📞",
+            'Urdu': f"العرب ریسٹورنٹ کے رابطہ نمبر: {contacts} 📞",
+        },
+        'delivery': {
+            'English': f"Yes! {info.get('services', '')} Order here on WhatsApp or call {contacts} 🛵",
+            'Roman Urdu': f"Ji haan! {info.get('services', '')} WhatsApp par order karein ya call karein: {contacts} 🛵",
+            'Urdu': f"جی ہاں! {info.get('services', '')} واٹس ایپ پر آرڈر کریں یا کال کریں: {contacts} 🛵",
+        },
+    }
+
+
+class AnswerCache:
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, threshold=ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (language, normalized question) -> (answer, intent, expires_at)
+        # Sirf seed sawal exact keys hain; similarity hits kabhi key nahi bante
+        self._questions = {}           # normalized seed question -> intent
+        self._by_intent = {}           # intent -> [normalized seed questions], similarity candidates
+        self._version = None
+        self._answers = {}
+        for intent, questions in FAQ_QUESTIONS.items():
+            for question in questions:
+                key = self.normalize(question)
+                if key and key not in self._questions:
+                    self._questions[key] = intent
+                    self._by_intent.setdefault(intent, []).append(key)
+
+    def normalize(self, text):
+        tokens = get_catalog().normalize(text).split(' ')
+        return ' '.join(t for t in tokens if t and t not in _STOPWORDS)
+
+    @staticmethod
+    def key_intent(key):
+        """
+        Normalized sawal ka intent keywords se: bilkul ek intent ke keywords hon to woh, warna
+        None. Inkaar/shikayat/possessive alfaaz hon to bhi None (LLM jawab de).
+        """
+        tokens = set(key.split(' '))
+        if tokens & _LLM_ONLY_WORDS:
+            return None
+        found = [intent for intent, keywords in INTENT_KEYWORDS.items() if tokens & keywords]
+        return found[0] if len(found) == 1 else None
+
+    def _similar(self, key, intent):
+        # Sirf usi intent ke seed sawal, aur sakht threshold: yeh canned jawab hain
+        best, best_score = None, self.threshold
+        for candidate in self._by_intent.get(intent, ()):
+            score = difflib.SequenceMatcher(None, key, candidate).ratio()
+            if score >= best_score:
+                best, best_score = candidate, score
+        return intent if best else None
+
+    def _refresh(self):
+        # Caller must hold self._lock. Catalog (menu/timings) badla ho to purane jawab hatao
+        catalog = get_catalog()
+        if catalog.version != self._version:
+            if self._version is not None:
+                REGISTRY.inc('answer_cache_invalidations_total')
+            self._entries.clear()
+            self._answers = render_answers(catalog)
+            self._version = catalog.version
+
+    def _answer(self, intent, language):
+        answers = self._answers.get(intent, {})
+        return answers.get(language) or answers.get('Roman Urdu')
+
+    def lookup(self, text, language='Roman Urdu'):
+        """
+        Cached jawab ya None (miss: LLM se poochna hoga).
+        """
+        key = self.normalize(text)
+        now = time.time()
+        with self._lock:
+            self._refresh()
+            intent = self.key_intent(key) if key and len(key.split(' ')) <= MAX_QUESTION_TOKENS else None
+            if not intent:
+                REGISTRY.inc('answer_cache_lookups_total', result='miss')
+                return None
+            cache_key = (language, key)
+            entry = self._entries.get(cache_key)
+            if entry and entry[2] > now:
+                self._entries.move_to_end(cache_key)
+                REGISTRY.inc('answer_cache_lookups_total', result='exact_hit')
+                return entry[0]
+            if self._questions.get(key) == intent:
+                REGISTRY.inc('answer_cache_lookups_total', result='exact_hit')
+            elif self._similar(key, intent):
+                REGISTRY.inc('answer_cache_lookups_total', result='similar_hit')
+            else:
+                REGISTRY.inc('answer_cache_lookups_total', result='miss')
+                return None
+            answer = self._answer(intent, language)
+            self._entries[cache_key] = (answer, intent, now + self.ttl)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                REGISTRY.inc('answer_cache_evictions_total')
+            return answer
+
+    def invalidate(self):
+        # Manually (e.g. timings badalne par) saare cached jawab hatao
+        with self._lock:
+            self._entries.clear()
+            self._answers = render_answers(get_catalog())
+            self._version = get_catalog().version
+        REGISTRY.inc('answer_cache_invalidations_total')
+
+    def size(self):
+        with self._lock:
+            return len(self._entries), len(self._questions)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+    return _cache
+
+
+# Scrape par cache banaya nahi jata; abhi tak kisi ne use nahi kiya to 0
+REGISTRY.gauge('answer_cache_entries', lambda: _cache.size()[0] if _cache is not None else 0,
+               'Cached FAQ answers (per language)')
+REGISTRY.gauge('answer_cache_questions', lambda: _cache.size()[1] if _cache is not None else 0,
+               'Seed questions in the FAQ index')
@@ -0,0 +1,118 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from openai_agent.ai_reply import is_order_confirmation_async
+from aio import run_sync
+from logging_config import get_logger
+from metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+# confirming_order step ke jawab ka tiered classifier:
+#   1. lexicon: saaf haan/nahi/cancel (English, Roman Urdu, Urdu) bina LLM ke
+#   2. pichle faislon ka memo cache (normalized text par)
+#   3. sirf waqai mubham jawab par LLM, sakht deadline ke sath
+# Nateeja: 'yes' | 'no' | 'cancel' | 'unknown' (LLM fail/timeout; customer se dobara poocho)
+
+CONFIRMATION_LLM_TIMEOUT = float(os.getenv('CONFIRMATION_LLM_TIMEOUT', '3'))
+CONFIRMATION_CACHE_SIZE = int(os.getenv('CONFIRMATION_CACHE_SIZE', '1000'))
+
+YES_WORDS = {
+    'yes', 'yeah', 'yep', 'yup', 'sure', 'ok', 'okay', 'okk', 'k', 'done', 'confirm', 'confirmed', 'correct',
+    'right', 'perfect', 'fine', 'go', 'ahead', 'proceed', 'place', 'haan', 'han', 'haa', 'ha', 'hn', 'ji', 'jee',
+    'g', 'jii', 'theek', 'thik', 'theak', 'bilkul', 'sahi', 'chalo', 'acha', 'achha', 'hmm', 'hm', 'kar', 'karo',
+    'kardo', 'kardein', 'do', 'dein', 'dijiye', 'hai', 'he', 'h', 'please', 'pls', 'plz', 'order', 'bhai', 'sir',
+    'ہاں', 'جی', 'ٹھیک', 'ہے', 'کر', 'دیں', 'کریں', 'کنفرم', 'بالکل', 'درست',
+}
+# In ke ilawa bhi koi yes word ya YES_PHRASES ka phrase hona chahiye ("do" / "hai" akela confirm nahi)
+_WEAK_YES = {'kar', 'karo', 'do', 'dein', 'dijiye', 'hai', 'he', 'h', 'please', 'pls', 'plz', 'order', 'bhai', 'sir',
+             'ہے', 'کر', 'دیں', 'کریں', 'go', 'ahead', 'hmm', 'hm'}
+# Summary ke baad "kar do" / "order kar do" saaf haan hai, halanke is ke alfaaz akele weak hain.
+# Sirf poore phrases: akela 'karo' / 'کریں' nahi ("hai karo" haan nahi)
+YES_PHRASES = ['kar do', 'kar dein', 'kar dijiye', 'kardo', 'kardein', 'کر دیں']
+YES_EMOJI = {'👍', '✅', '👌', '✔', '✔️'}
+NO_WORDS = {
+    'no', 'nope', 'not', 'nahi', 'nahin', 'nai', 'galat', 'wrong', 'change', 'ruko', 'wait', 'rukiye',
+    'badal', 'badlo', 'edit', 'نہیں', 'غلط', 'رکیں',
+}
+CANCEL_PHRASES = [
+    'cancel', 'cancel karo', 'cancel kar do', 'rehne do', 'rehnay do', 'chhor do', 'chor do', 'mat karo',
+    'nahi chahiye', 'nahin chahiye', 'dont want', "don't want", 'کینسل', 'نہیں چاہیے', 'رہنے دیں',
+]
+
+# Inkaar wala lafz kisi action ke sath ("cancel mat karo", "confirm na karein", "don't cancel"):
+# ulta matlab ho sakta hai, lexicon faisla nahi karta, LLM se poocho
+NEGATIONS = {'mat', 'na', 'nahi', 'nahin', 'nai', 'not', 'dont', "don't", 'never', 'مت', 'نہ', 'نہیں'}
+NEGATABLE_ACTIONS = {'cancel', 'confirm', 'order', 'place', 'کینسل', 'کنفرم', 'آرڈر'}
+
+_TOKEN_RE = re.compile(r"[\w']+", re.UNICODE)
+_CANCEL_RE = re.compile(
+    r'(?<!\w)(?:' + '|'.join(re.escape(p) for p in sorted(CANCEL_PHRASES, key=len, reverse=True)) + r')(?!\w)',
+    re.IGNORECASE
+)
+
+_YES_PHRASE_RE = re.compile(
+    r'(?<!\w)(?:' + '|'.join(re.escape(p) for p in sorted(YES_PHRASES, key=len, reverse=True)) + r')(?!\w)'
+)
+
+_lock = threading.Lock()
+_memo = OrderedDict()  # normalized text -> 'yes' | 'no'
+
+
+def normalize(text):
+    return ' '.join(_TOKEN_RE.findall((text or '').lower()))
+
+
+def lexicon_decision(text):
+    """Saaf jawab ka faisla, warna None (mubham)."""
+    normalized = normalize(text)
+    tokens = normalized.split()
+    if any(token in NEGATIONS for token in tokens) and any(token in NEGATABLE_ACTIONS for token in tokens):
+        return None
+    if _CANCEL_RE.search(normalized):
+        return 'cancel'
+    if any(token in NO_WORDS for token in tokens):
+        return 'no'
+    if not tokens:
+        return 'yes' if any(e in text for e in YES_EMOJI) else None
+    if all(token in YES_WORDS for token in tokens) and (
+            any(token not in _WEAK_YES for token in tokens) or _YES_PHRASE_RE.search(normalized)):
+        return 'yes'
+    return None
+
+
+def _record(decision, source):
+    # source: 'lexicon' | 'cache' | 'llm' | 'llm_error'; pehle do mein LLM call nahi hui
+    REGISTRY.inc('confirmation_decisions_total', decision=decision, source=source)
+
+
+def classify_confirmation(text, timeout=CONFIRMATION_LLM_TIMEOUT):
+    return run_sync(classify_confirmation_async(text, timeout=timeout))
+
+
+async def classify_confirmation_async(text, timeout=CONFIRMATION_LLM_TIMEOUT):
+    decision = lexicon_decision(text)
+    if decision:
+        _record(decision, 'lexicon')
+        return decision
+    key = normalize(text)
+    with _lock:
+        cached = _memo.get(key)
+        if cached:
+            _memo.move_to_end(key)
+    if cached:
+        _record(cached, 'cache')
+        return cached
+    try:
+        decision = 'yes' if await is_order_confirmation_async(text, timeout=timeout) else 'no'
+    except Exception as e:
+        logger.warning('Order confirmation LLM error: %s', e)
+        _record('unknown', 'llm_error')
+        return 'unknown'
+    with _lock:
+        _memo[key] = decision
+        while len(_memo) > CONFIRMATION_CACHE_SIZE:
+            _memo.popitem(last=False)
+    _record(decision, 'llm')
+    return decision
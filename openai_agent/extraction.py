@@ -0,0 +1,107 @@
+import json
+import re
+from openai_agent.llm import chat_completion_async
+from openai_agent.ai_reply import GPT_MODEL
+from metrics import record_llm_usage, timed
+from logging_config import get_logger
+from aio import run_sync
+
+logger = get_logger(__name__)
+
+ORDER_FIELDS = ['name', 'address', 'phone', 'items', 'payment_type']
+
+# Har field ka expected type. items ya to list of {"name", "quantity"} hoti hai ya free text.
+ORDER_FIELD_SCHEMA = {
+    'name': (str,),
+    'address': (str,),
+    'phone': (str, int),
+    'items': (list, str),
+    'payment_type': (str,),
+}
+
+
+def _clean_item(item):
+    if isinstance(item, str):
+        item = {'name': item, 'quantity': 1}
+    if not isinstance(item, dict) or not str(item.get('name') or '').strip():
+        return None
+    try:
+        qty = int(item.get('quantity') or 1)
+    except (TypeError, ValueError):
+        qty = 1
+    cleaned = {'name': str(item['name']).strip(), 'quantity': max(qty, 1)}
+    if item.get('size'):
+        cleaned['size'] = str(item['size']).strip()
+    return cleaned
+
+
+def validate_extraction(data, fields):
+    """
+    LLM ka JSON schema ke against check karta hai. Sirf maange gaye fields,
+    sahi type aur non-empty values wapas aati hain; baqi drop.
+    """
+    if not isinstance(data, dict):
+        return {}
+    result = {}
+    for field in fields:
+        value = data.get(field)
+        if value is None or not isinstance(value, ORDER_FIELD_SCHEMA[field]):
+            continue
+        if field == 'items' and isinstance(value, list):
+            value = [i for i in (_clean_item(item) for item in value) if i]
+        elif isinstance(value, (str, int)):
+            value = str(value).strip()
+            if value.lower() in ('', 'null', 'none', 'n/a'):
+                continue
+        if value:
+            result[field] = value
+    return result
+
+
+def _parse_json(raw):
+    clean = re.sub(r"^```json|^```|```$", "", raw.strip(), flags=re.MULTILINE).strip()
+    return json.loads(clean)
+
+
+def extract_fields(message, fields, language, context=None):
+    """
+    Ek hi LLM call mein saare missing fields nikalta hai. `context` (bot ka last
+    reply) sirf tab use hota hai jab user ke message mein field na ho.
+    API error par exception raise hoti hai; ghalat JSON par {} return hota hai.
+    """
+    return run_sync(extract_fields_async(message, fields, language, context=context))
+
+
+async def extract_fields_async(message, fields, language, context=None):
+    fields = [f for f in fields if f in ORDER_FIELD_SCHEMA]
+    if not fields:
+        return {}
+    schema = {f: ('list of {"name": str, "quantity": int, "size": str|null} | null' if f == 'items' else 'string | null') for f in fields}
+    prompt = f"""
+Aap Al Arab Restaurant ke WhatsApp order assistant hain. User ka message {language} mein ho sakta hai.
+Neeche diye gaye texts se sirf yeh fields nikaal kar ek valid JSON object mein do: {', '.join(fields)}.
+Jo field na mile us ki value null rakho. Pehle Customer message dekho; Assistant last reply sirf tab use karo jab field customer message mein na ho.
+JSON schema: {json.dumps(schema)}
+Customer message: {message}
+"""
+    if context:
+        prompt += f"Assistant last reply: {context}\n"
+    with timed('openai.extract'):
+        response = await chat_completion_async(
+            model=GPT_MODEL,
+            messages=[{"role": "system", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+    record_llm_usage('openai.extract', response)
+    raw = response.choices[0].message['content']
+    try:
+        return validate_extraction(_parse_json(raw), fields)
+    except Exception as e:
+        logger.warning('Field extraction error (%s): %s', ', '.join(fields), e)
+        return {}
+
+
+def extract_field(message, field, language):
+    # Purana single-field interface, ab extract_fields par based
+    return extract_fields(message, [field], language).get(field)
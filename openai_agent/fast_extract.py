@@ -0,0 +1,177 @@
+import re
+import threading
+from catalog.menu_catalog import get_catalog
+from metrics import REGISTRY
+
+# LLM se pehle chalne wala local extractor. Phone, payment type aur menu items
+# regex/lexicon (menu aliases catalog se) se nikalta hai; jo field confidently na mile woh LLM par chhod deta hai.
+
+_PHONE_RE = re.compile(r'(?<!\d)(?:\+?92|0092|0)[\s-]?(3\d{2})[\s-]?(\d{7})(?!\d)')
+
+# Akele 'cash' / 'card' / 'bank' nahi: address aur sawalon mein aate hain ("Meezan bank ke paas",
+# "cash and carry", "discount card hai?"); woh LLM samjhe
+PAYMENT_LEXICON = {
+    'Cash on Delivery': ['cash on delivery', 'cod', 'cash payment', 'naqad', 'nakad', 'نقد'],
+    'EasyPaisa': ['easypaisa', 'easy paisa', 'easypesa', 'easy pesa'],
+    'JazzCash': ['jazzcash', 'jazz cash', 'jaz cash'],
+    'Card': ['debit card', 'credit card', 'card payment'],
+    'Bank Transfer': ['bank transfer', 'online transfer', 'ibft'],
+}
+
+# Message mein aur baatein bhi hon (consumed nahi) to sirf yeh fields lagti hain: poora
+# 03xx mobile number pattern kisi aur cheez se nahi milta. Items/payment tab LLM par.
+ANCHORED_FIELDS = {'phone'}
+
+
+def _alias_pattern(alias, variants):
+    # "chicken shawarma" -> r"chicken\s+(?:shawarma|shwarma|...)"; spelling variants catalog se
+    parts = []
+    for token in alias.split(' '):
+        options = [token] + variants.get(token, [])
+        parts.append(f"(?:{'|'.join(re.escape(o) for o in options)})" if len(options) > 1 else re.escape(token))
+    return r'\s+'.join(parts)
+
+
+def build_item_lexicon(catalog):
+    # canonical item -> alias regex fragments, catalog/menu.json ke aliases se
+    lexicon = {}
+    for item in catalog.items:
+        aliases = {catalog.normalize(a) for a in [item.name] + item.aliases}
+        lexicon[item.name] = [_alias_pattern(a, catalog.spelling_variants) for a in sorted(aliases)]
+    return lexicon
+
+
+NUMBER_WORDS = {
+    'ek': 1, 'aik': 1, 'one': 1, 'a': 1, 'an': 1,
+    'do': 2, 'two': 2, 'teen': 3, 'three': 3, 'char': 4, 'chaar': 4, 'four': 4,
+    'panch': 5, 'paanch': 5, 'five': 5, 'chay': 6, 'chhe': 6, 'six': 6,
+    'saat': 7, 'seven': 7, 'aath': 8, 'eight': 8, 'nau': 9, 'nine': 9, 'das': 10, 'ten': 10,
+}
+
+# Woh alfaaz jo message ka "matlab" nahi badalte; inke ilawa kuch bacha to LLM ko bhejna parega
+_FILLER = {
+    'aur', 'and', 'or', 'my', 'mera', 'meri', 'mere', 'number', 'phone', 'no', 'num', 'contact', 'hai', 'he', 'h',
+    'payment', 'pay', 'se', 'karunga', 'karungi', 'karenge', 'karein', 'kar', 'dena', 'de', 'dein', 'please', 'pls',
+    'plz', 'chahiye', 'order', 'bhai', 'sir', 'ji', 'g', 'ok', 'mujhe', 'ka', 'ki', 'ke', 'is', 'on', 'by',
+    'through', 'via', 'with', 'x', 'me', 'mein', 'main', 'hoga', 'hogi', 'ho', 'type', 'also', 'bhi', 'the',
+}
+
+_NUM_ALT = r'\d{1,2}|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True))
+
+
+class ItemMatcher:
+    """Catalog ke aliases aur size words se bana item regex; catalog version badle to naya."""
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.size_words = catalog.size_words
+        size_alt = '|'.join(self.size_words)
+        # Lambe aliases pehle, taake "chicken cheese shawarma" ko "chicken shawarma" se pehle pakra jaye
+        aliases = sorted(
+            ((alias, name) for name, patterns in build_item_lexicon(catalog).items() for alias in patterns),
+            key=lambda pair: len(pair[0]), reverse=True
+        )
+        alias_alt = '|'.join(f'(?P<i{idx}>{alias})' for idx, (alias, _) in enumerate(aliases))
+        self.alias_names = [name for _, name in aliases]
+        self.item_re = re.compile(
+            rf'\b(?:(?P<qty>{_NUM_ALT})\s*(?:x\s*)?)?(?:(?P<size1>{size_alt})\s+)?(?:{alias_alt})(?:\s+(?P<size2>{size_alt}))?(?:\s*x\s*(?P<qty2>\d{{1,2}}))?\b',
+            re.IGNORECASE
+        )
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_item_matcher():
+    # Pehle message par banta hai (import par catalog load nahi hota); reload_catalog ke baad dobara
+    global _matcher
+    catalog = get_catalog()
+    with _matcher_lock:
+        if _matcher is None or _matcher.version != catalog.version:
+            _matcher = ItemMatcher(catalog)
+        return _matcher
+
+_PAYMENT_RE = re.compile(
+    r'\b(?:' + '|'.join(
+        f'(?P<p{idx}>{re.escape(alias)})'
+        for idx, alias in enumerate(a for aliases in PAYMENT_LEXICON.values() for a in sorted(aliases, key=len, reverse=True))
+    ) + r')\b',
+    re.IGNORECASE
+)
+_PAYMENT_NAMES = [name for name, aliases in PAYMENT_LEXICON.items() for _ in aliases]
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+def _quantity(raw):
+    if not raw:
+        return 1
+    raw = raw.lower()
+    return int(raw) if raw.isdigit() else NUMBER_WORDS.get(raw, 1)
+
+
+def extract_phone(text):
+    numbers = {f'0{m.group(1)}{m.group(2)}' for m in _PHONE_RE.finditer(text)}
+    return numbers.pop() if len(numbers) == 1 else None
+
+
+def extract_payment_type(text):
+    found = set()
+    for m in _PAYMENT_RE.finditer(text):
+        found.add(_PAYMENT_NAMES[int(m.lastgroup[1:])])
+    return found.pop() if len(found) == 1 else None
+
+
+def extract_items(text, matcher=None):
+    matcher = matcher or get_item_matcher()
+    items = []
+    for m in matcher.item_re.finditer(text):
+        alias_group = next(k for k, v in m.groupdict().items() if v and k.startswith('i') and k[1:].isdigit())
+        item = {'name': matcher.alias_names[int(alias_group[1:])], 'quantity': _quantity(m.group('qty') or m.group('qty2'))}
+        size = m.group('size1') or m.group('size2')
+        if size:
+            item['size'] = matcher.size_words[size.lower()]
+        items.append(item)
+    return items or None
+
+
+def _leftover_tokens(text, matcher):
+    # Phone, payment aur item matches hata kar jo alfaaz bachte hain
+    stripped = _PHONE_RE.sub(' ', text)
+    stripped = matcher.item_re.sub(' ', stripped)
+    stripped = _PAYMENT_RE.sub(' ', stripped)
+    return [t for t in _TOKEN_RE.findall(stripped.lower()) if t not in _FILLER]
+
+
+def fast_extract(text, fields):
+    """
+    Maange gaye fields mein se jo local rules se confidently mil jayein woh return karta hai.
+    Return: (values, consumed). consumed=True ka matlab hai message mein in fields ke
+    ilawa kuch nahi tha, is liye LLM ko bhejne ki zaroorat nahi. consumed=False ho to values
+    mein sirf ANCHORED_FIELDS; baaki fields LLM message ke poore context se nikale.
+    """
+    matcher = get_item_matcher()
+    values = {}
+    if 'phone' in fields:
+        phone = extract_phone(text)
+        if phone:
+            values['phone'] = phone
+    if 'payment_type' in fields:
+        payment = extract_payment_type(text)
+        if payment:
+            values['payment_type'] = payment
+    if 'items' in fields:
+        items = extract_items(text, matcher)
+        if items:
+            values['items'] = items
+    consumed = bool(values) and not _leftover_tokens(text, matcher)
+    if not consumed:
+        values = {field: value for field, value in values.items() if field in ANCHORED_FIELDS}
+    REGISTRY.inc('fast_extract_messages_total')
+    for field in values:
+        REGISTRY.inc('fast_extract_fields_total', field=field)
+    return values, consumed
+
+
+def record_llm_call(avoided):
+    # collecting_details ka har message: extraction LLM call hui ya fast-path ne bacha li
+    REGISTRY.inc('extraction_llm_calls_total', outcome='avoided' if avoided else 'made')
@@ -0,0 +1,224 @@
+import re
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+from catalog.menu_catalog import get_catalog
+
+# Message routing ke liye ek compiled matcher: saare intent keywords, unki inflections
+# (shawarma -> shawarmas/shawarme), menu catalog ke aliases aur language markers ek hi lookup
+# table mein (poore words par, substring nahi), message par ek dafa scan. Har message ka
+# nateeja ek Route hai: kaun se intents mile (confidence ke sath) aur kaunsi language/script.
+
+INTENT_KEYWORDS = {
+    'menu': ['menu', 'menu bhejein', 'menu send', 'menu chahiye', 'menu chahta hoon', 'menu please', 'menu pdf', 'مینو'],
+    'cancel': [
+        'cancel', 'galat', 'غلط', 'کینسل',
+        # Poora message yahi ho to cancel ("cancel mat karo" ka 'mat' inmein nahi, woh cancel nahi)
+        'cancel kar do', 'cancel kardo', 'cancel kar dein', 'cancel karein', 'cancel karo', 'cancel karna hai',
+        'cancel please', 'order cancel', 'order cancel kar do', 'order cancel kar dein', 'order cancel karna hai',
+        'کینسل کر دیں', 'آرڈر کینسل',
+    ],
+    'receipt': [
+        'receipt', 'raseed', 'total', 'bill', 'status', 'order status', 'order ka status', 'order ki raseed', 'رسید',
+        'rider', 'order kahan', 'kab aayega', 'kab ayega', 'kab tak aayega', 'kitni der', 'where is my order',
+    ],
+    'order_interest': [
+        'order', 'menu', 'biryani', 'burger', 'shawarma', 'shwarma', 'khaana', 'khana', 'dish', 'item',
+        'pizza', 'rice', 'pulao', 'آرڈر', 'کھانا', 'مینو', 'بریانی', 'برگر', 'شوارما', 'پیزا',
+    ],
+    'affirmative': [
+        'haan', 'han', 'yes', 'ok', 'okk', 'okay', 'theek', 'thik', 'chalo', 'kar do', 'place', 'confirm', 'sure',
+        'bilkul', 'ji bilkul', 'ji haan', 'haan ji', 'جی', 'ہاں', 'ٹھیک', 'ٹھیک ہے', 'بالکل',
+    ],
+}
+
+# Language markers: loanwords jaise 'order'/'menu' dono mein aate hain is liye kisi mein nahi
+LANGUAGE_MARKERS = {
+    'English': [
+        'hello', 'hi', 'please', 'thanks', 'thank you', 'what', 'want', 'would', 'like', 'the', 'is', 'are',
+        'i', 'my', 'you', 'your', 'can', 'do', 'need', 'send', 'where', 'when', 'how', 'much', 'price', 'food',
+        'good', 'great', 'was',
+    ],
+    'Roman Urdu': [
+        'kya', 'hai', 'hain', 'ka', 'ki', 'ke', 'mein', 'main', 'shukriya', 'chahiye', 'karna', 'karein', 'aap',
+        'mujhe', 'mera', 'meri', 'kitne', 'kitna', 'kab', 'kahan', 'bhai', 'haan', 'nahi', 'acha', 'theek',
+        'bhejein', 'bhej', 'do', 'dein', 'hoon', 'hun', 'wala', 'wali', 'salam', 'assalam', 'bilkul',
+    ],
+}
+
+# "english/urdu/roman" likh kar user khud language bataye to wahi
+LANGUAGE_REQUESTS = {'english': 'English', 'urdu': 'Urdu', 'roman': 'Roman Urdu'}
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_LATIN_RE = re.compile(r'[A-Za-z]')
+
+
+def inflections(word):
+    """
+    Ek Latin keyword ki aam shaklein: English plural (burgers, dishes) aur Urdu -a wale
+    nouns ki jama/oblique (khana -> khane, khanay, khanon; shawarma -> shawarme). Chhote
+    alfaaz (ok, han) jaise ke taise, warna 'oks' jaisi ghalat hits.
+    """
+    forms = [word]
+    if len(word) >= 4 and word.isascii() and word.isalpha():
+        forms += [word + 's', word + 'es']
+        if word.endswith('a'):
+            forms += [word[:-1] + suffix for suffix in ('e', 'ay', 'on', 'ein')]
+    return forms
+
+
+class Vocabulary:
+    """
+    Token n-gram -> labels ki lookup table (Aho-Corasick jaisa, lekin word level par):
+    message ke tokens par ek pass, har position par sab se lamba phrase pehle. Lamba phrase
+    ("order status") apne andar ke chhote keywords ("order") ke labels bhi le leta hai.
+    Catalog version ke sath banti hai, taake naye menu items bhi order_interest hon.
+    """
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+        labels = {}
+
+        def add(phrase, label):
+            labels.setdefault(tuple(phrase.lower().split()), set()).add(label)
+
+        for intent, words in INTENT_KEYWORDS.items():
+            for word in words:
+                for form in (inflections(word) if ' ' not in word else [word]):
+                    add(form, ('intent', intent))
+        # Menu ke items, unke aliases aur catalog ke spelling variants bhi order_interest
+        for item in catalog.items:
+            for alias in [item.name] + item.aliases:
+                add(catalog.normalize(alias), ('intent', 'order_interest'))
+        for canonical, variants in catalog.spelling_variants.items():
+            if (canonical,) in labels:
+                for variant in variants:
+                    for form in inflections(variant):
+                        add(form, ('intent', 'order_interest'))
+        for language, words in LANGUAGE_MARKERS.items():
+            for word in words:
+                add(word, ('lang', language))
+        for word, language in LANGUAGE_REQUESTS.items():
+            add(word, ('request', language))
+        for phrase in list(labels):
+            for size in range(1, len(phrase)):
+                for start in range(len(phrase) - size + 1):
+                    labels[phrase] |= labels.get(phrase[start:start + size], set())
+        # Phrase 'a b' ki key space se jura string, taake scan mein tuple na banana pare
+        self.starts = {}  # pehla token -> us se shuru hone wala sab se lamba phrase (tokens)
+        self.table = {}   # phrase -> (chars, intents, English minus Roman Urdu markers, requested language)
+        for phrase, found in labels.items():
+            self.starts[phrase[0]] = max(self.starts.get(phrase[0], 0), len(phrase))
+            requested = [label for kind, label in found if kind == 'request']
+            self.table[' '.join(phrase)] = (
+                sum(len(t) for t in phrase),
+                tuple(label for kind, label in found if kind == 'intent'),
+                (('lang', 'English') in found) - (('lang', 'Roman Urdu') in found),
+                requested[0] if requested else None,
+            )
+
+    def route(self, text):
+        """
+        Message ka ek scan: intents + language + script. Intent ki confidence = message ke
+        kitne hissay ko us intent ke keywords cover karte hain (poora message sirf keyword ho
+        to 1.0). Poora message cancel phrase ho to baaki intents nahi (cancel kar do != haan).
+        """
+        tokens = _WORD_RE.findall(text.lower())
+        starts = self.starts
+        table = self.table
+        covered = {}
+        english_lead = 0  # English markers minus Roman Urdu markers
+        requested = None
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            i += 1
+            longest = starts.get(token)
+            if longest is None:
+                continue
+            found = None
+            if longest > 1 and i < n:
+                for size in range(min(longest, n - i + 1), 1, -1):
+                    found = table.get(' '.join(tokens[i - 1:i - 1 + size]))
+                    if found is not None:
+                        i += size - 1
+                        break
+            if found is None:
+                found = table.get(token)
+                if found is None:
+                    continue
+            chars, intent_labels, lead, request = found
+            for label in intent_labels:
+                covered[label] = covered.get(label, 0) + chars
+            english_lead += lead
+            if request and requested is None:
+                requested = request
+        word_chars = sum(map(len, tokens)) or 1
+        if covered.get('cancel', 0) >= word_chars:
+            intents = {'cancel': 1.0}
+        else:
+            # round() nahi: woh is poore scan jitna mehnga hai, aur poora cover exact 1.0 hi aata hai
+            intents = {intent: chars / word_chars if chars < word_chars else 1.0 for intent, chars in covered.items()}
+
+        if text.isascii():
+            # Aksar messages: Urdu script ho hi nahi sakta, poora char count zaroori nahi
+            script = 'latin' if _LATIN_RE.search(text) else 'none'
+        else:
+            # Har char par regex ke bajaye tokens par: kis script ke alfaaz ke zyada huroof
+            arabic = latin = 0
+            for token in tokens:
+                if token.isascii():
+                    if not token.isdigit():
+                        latin += len(token)
+                elif '\u0600' <= token[0] <= '\u077f' or '\ufb50' <= token[0] <= '\ufeff':
+                    arabic += len(token)
+            script = 'arabic' if arabic > latin else 'latin' if latin else 'none'
+        if requested:
+            language = requested
+        elif script == 'arabic':
+            language = 'Urdu'
+        elif english_lead > 0:
+            language = 'English'
+        else:
+            language = 'Roman Urdu'
+        return Route(intents, language, script)
+
+
+class Route(NamedTuple):
+    intents: dict = {}            # intent -> confidence (0-1)
+    language: str = 'Roman Urdu'
+    script: str = 'latin'         # 'arabic' | 'latin' | 'none'
+
+    def has(self, intent, min_confidence=0.0):
+        return self.intents.get(intent, 0.0) > 0 and self.intents[intent] >= min_confidence
+
+    def confidence(self, intent):
+        return self.intents.get(intent, 0.0)
+
+
+_vocabulary = None
+_vocabulary_lock = threading.Lock()
+
+
+def get_vocabulary():
+    # Pehle message par banti hai (import par catalog load nahi hota); reload_catalog ke baad dobara
+    global _vocabulary
+    catalog = get_catalog()
+    vocabulary = _vocabulary
+    if vocabulary is None or vocabulary.version != catalog.version:
+        with _vocabulary_lock:
+            if _vocabulary is None or _vocabulary.version != catalog.version:
+                _vocabulary = Vocabulary(catalog)
+            vocabulary = _vocabulary
+    return vocabulary
+
+
+@lru_cache(maxsize=2048)
+def _route(text, vocabulary):
+    return vocabulary.route(text)
+
+
+def classify(text):
+    """Message -> Route. Bilkul wahi text dobara aaye (retry, "ok") to LRU cache se."""
+    return _route(text or '', get_vocabulary())
@@ -0,0 +1,56 @@
+import os
+import threading
+from config import Config
+from aio import async_io
+
+# openai package (aur us ke sath aiohttp) import karna mehenga hai; yeh pehli LLM call
+# (ya startup warmup) par hota hai, webhook module import par nahi.
+
+OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', '100'))  # ASGI mode: OpenAI ke khule connections
+
+_openai = None
+_openai_lock = threading.Lock()
+_aiosession = None
+
+
+def get_openai():
+    global _openai
+    with _openai_lock:
+        if _openai is None:
+            import openai
+            openai.api_key = Config.OPENAI_API_KEY
+            _openai = openai
+    return _openai
+
+
+def chat_completion(**kwargs):
+    """openai.ChatCompletion.create(**kwargs), module pehli dafa yahin load hota hai."""
+    return get_openai().ChatCompletion.create(**kwargs)
+
+
+def _get_aiosession():
+    # Sirf event loop thread se; saari async calls ek keep-alive pool share karti hain
+    global _aiosession
+    if _aiosession is None or _aiosession.closed:
+        import aiohttp
+        _aiosession = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=OPENAI_POOL_SIZE))
+    return _aiosession
+
+
+async def chat_completion_async(**kwargs):
+    """ASGI mode mein acreate (shared aiohttp pool), sync mode mein wahi blocking chat_completion."""
+    if not async_io():
+        return chat_completion(**kwargs)
+    openai = get_openai()
+    token = openai.aiosession.set(_get_aiosession())
+    try:
+        return await openai.ChatCompletion.acreate(**kwargs)
+    finally:
+        openai.aiosession.reset(token)
+
+
+async def close_async_session():
+    global _aiosession
+    if _aiosession is not None:
+        await _aiosession.close()
+        _aiosession = None
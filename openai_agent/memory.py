@@ -0,0 +1,165 @@
+import os
+import threading
+from openai_agent.llm import chat_completion
+from openai_agent.ai_reply import GPT_MODEL
+from openai_agent.prompt_builder import count_tokens
+from metrics import record_llm_usage, timed
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Conversation memory: purane turns ki ek chhoti running summary + recent turns verbatim,
+# dono mila kar MEMORY_TOKEN_BUDGET ke andar. Budget se bahar jaye to sab se purane turns
+# ek LLM call mein summary mein fold hote hain (background mein, har turn par nahi), is liye
+# prompt size conversation lambi hone par bhi takreeban flat rehta hai. Turns ginti se nahi,
+# sirf tokens se kat'te hain, aur jo bhi turn memory se nikle woh pehle summary mein jata hai.
+#
+# Store mein shape: {"summary": str, "turns": [{"role", "content"}, ...]}
+
+MEMORY_TOKEN_BUDGET = int(os.getenv('MEMORY_TOKEN_BUDGET', '600'))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv('MEMORY_SUMMARY_MAX_TOKENS', '150'))
+# Compaction ke baad turns budget ke itne hissay tak aa jayein, taake agli compaction kuch turns baad ho
+COMPACT_TARGET_RATIO = 0.6
+# LLM summary baar baar fail ho to bhi memory is se zyada nahi barhti: upar wale turns
+# bina LLM ke (mukhtasar lines) summary mein fold ho jate hain
+MEMORY_HARD_LIMIT_RATIO = 3
+
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+
+def load_memory(raw):
+    if isinstance(raw, dict):
+        return {'summary': raw.get('summary') or '', 'turns': list(raw.get('turns') or [])}
+    # Purana format: sirf turns ki list
+    return {'summary': '', 'turns': list(raw or [])}
+
+
+def turns_tokens(turns):
+    return sum(4 + count_tokens(t.get('content', '')) for t in turns)
+
+
+def memory_tokens(memory):
+    return count_tokens(memory['summary']) + turns_tokens(memory['turns'])
+
+
+def last_assistant_message(raw):
+    for turn in reversed(load_memory(raw)['turns']):
+        if turn.get('role') == 'assistant':
+            return turn.get('content', '')
+    return ''
+
+
+def add_turns(raw, new_turns, budget=MEMORY_TOKEN_BUDGET):
+    memory = load_memory(raw)
+    memory['turns'] = memory['turns'] + list(new_turns)
+    # Hard cap (tokens): background summary fail hoti rahe tab bhi memory bila had na barhe,
+    # lekin nikalne wale turns bhi summary mein, chup chaap gum nahi
+    if memory_tokens(memory) > budget * MEMORY_HARD_LIMIT_RATIO:
+        k = turns_to_fold(memory, budget)
+        if k:
+            memory['summary'] = condense(memory['summary'], memory['turns'][:k])
+            memory['turns'] = memory['turns'][k:]
+    return memory
+
+
+def condense(summary, turns, max_tokens=MEMORY_SUMMARY_MAX_TOKENS):
+    """
+    Bina LLM ke summary: purani summary + har nikalte turn ki chhoti line, aakhir ke
+    `max_tokens` tak (naye turns zyada kaam ke). LLM summary fail ho tab ka fallback.
+    """
+    lines = [summary] if summary else []
+    lines += [f"{t.get('role', 'user')}: {' '.join(t.get('content', '').split())[:120]}" for t in turns]
+    words = ' | '.join(lines).split(' ')
+    while len(words) > 1 and count_tokens(' '.join(words)) > max_tokens:
+        words = words[max(1, len(words) // 10):]
+    return ' '.join(words)
+
+
+def turns_to_fold(memory, budget=MEMORY_TOKEN_BUDGET):
+    """
+    Budget se upar ho to kitne purane turns fold karne hain (user/assistant pair ki seedh mein).
+    0 = compaction ki zaroorat nahi.
+    """
+    if memory_tokens(memory) <= budget:
+        return 0
+    target = budget * COMPACT_TARGET_RATIO - MEMORY_SUMMARY_MAX_TOKENS
+    turns = memory['turns']
+    k = 0
+    while k < len(turns) - 2 and turns_tokens(turns[k:]) > target:
+        k += 1
+    if k % 2:
+        k += 1  # pair na toote
+    return min(k, max(len(turns) - 2, 0))
+
+
+def summarize(summary, turns, language='Roman Urdu'):
+    transcript = '\n'.join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = (
+        "Aap Al Arab Restaurant ke WhatsApp assistant ki conversation memory update kar rahe hain.\n"
+        f"Maujooda summary ko neeche diye naye turns ke sath mila kar ek nayi mukhtasar summary likhein ({language}).\n"
+        f"Zyada se zyada {MEMORY_SUMMARY_MAX_TOKENS} tokens. Customer ki preferences, order details (naam, items, address, phone, payment), "
+        "sawal jo abhi baqi hain, aur koi shikayat zaroor rakhein. Sirf summary likhein.\n"
+        f"Maujooda summary: {summary or '(khali)'}\n"
+        f"Naye turns:\n{transcript}\n"
+    )
+    with timed('openai.summary'):
+        response = chat_completion(
+            model=GPT_MODEL,
+            messages=[{"role": "system", "content": prompt}],
+            max_tokens=MEMORY_SUMMARY_MAX_TOKENS,
+            temperature=0
+        )
+    record_llm_usage('openai.summary', response)
+    return response.choices[0].message['content'].strip()
+
+
+def _fold(raw, folded, new_summary):
+    """
+    Summary likhte waqt store badal sakta hai: naye turns aakhir mein jurte hain aur kisi aur ne
+    (doosra process, hard cap) folded ke shuru ke kuch turns pehle hi summary mein daal diye hon.
+    Folded ka jo hissa ab bhi turns ke shuru mein hai woh hata do; new_summary poore folded ko cover karti hai.
+    """
+    if raw is None:
+        return None  # session reset / expire: wapas zinda mat karo
+    memory = load_memory(raw)
+    turns = memory['turns']
+    for start in range(len(folded)):
+        remaining = folded[start:]
+        if turns[:len(remaining)] == remaining:
+            memory['turns'] = turns[len(remaining):]
+            memory['summary'] = new_summary
+            return memory
+    # Folded mein se kuch bhi baqi nahi: kisi aur compaction ne sab fold kar diya, us ki summary rehne do
+    return memory
+
+
+def _compact(store, key, language):
+    try:
+        memory = load_memory(store.get(key))
+        k = turns_to_fold(memory)
+        if not k:
+            return
+        folded = memory['turns'][:k]
+        try:
+            new_summary = summarize(memory['summary'], folded, language)
+        except Exception as e:
+            # Agle turn par phir koshish; tab tak turns memory mein hi (hard cap tak)
+            logger.warning('Memory summary error: %s', e)
+            return
+        store.update(key, lambda current: _fold(current, folded, new_summary))
+    finally:
+        with _compacting_lock:
+            _compacting.discard(key)
+
+
+def maybe_compact(store, key, memory, language='Roman Urdu'):
+    # Budget cross ho to background thread mein summary update; customer ka reply nahi rukta
+    if not turns_to_fold(memory):
+        return False
+    with _compacting_lock:
+        if key in _compacting:
+            return False
+        _compacting.add(key)
+    threading.Thread(target=_compact, args=(store, key, language), daemon=True).start()
+    return True
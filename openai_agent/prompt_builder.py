@@ -0,0 +1,145 @@
+import threading
+from catalog.menu_catalog import get_catalog
+from metrics import REGISTRY, usage_value
+
+# get_ai_reply ke liye prompt assembly. Bara static restaurant context pehli call par (har
+# catalog version ka) ek hi dafa banta hai aur har call mein byte-for-byte wohi pehla system
+# message hota hai, taake provider ki prompt caching us prefix ko reuse kar sake. Uske baad
+# state instructions aur phir history asli user/assistant role messages ki shakal mein.
+# Menu/deals/timings ki lines catalog/menu.json se aati hain; import par catalog load nahi hota.
+
+_CONTEXT_HEAD = (
+    "You are the official WhatsApp assistant for Al Arab Restaurant, Karachi.\n"
+    "Your job is to help customers in a friendly, festive, and professional way, using restaurant branding, emojis, and a warm tone.\n"
+    "Always mention Al Arab Restaurant in your greetings and replies.\n"
+)
+_CONTEXT_TAIL = (
+    "Bread/pita, Arabic sauces, falafel, garlic sauce, etc. sab available hain.\n"
+    "If user asks for menu, prices, deals, address, timings, delivery, ya feedback, always answer using above info.\n"
+    "If user asks for menu, suggest popular items and prices.\n"
+    "If user asks for deals, mention combos and specials.\n"
+    "If user asks for address or timing, reply with details.\n"
+    "If user asks for delivery, confirm it's available and share contact.\n"
+    "If user asks about bread/pita, falafel, sauces, etc., answer from above info.\n"
+    "Always use friendly, festive, and Arabic/restaurant-specific style with emojis.\n"
+    "If user gives feedback, thank them warmly.\n"
+    "If user wants to order, follow the step-by-step order collection as before.\n"
+    "If user has already provided any order details (name, address, phone, items, payment), do NOT ask again, just politely confirm.\n"
+    "If user gives all details in one message, confirm and save the order, don't ask again.\n"
+    "IMPORTANT: Never say 'order confirm ho gaya', 'order placed', 'order confirm kar diya', or any similar phrase UNTIL the user has explicitly replied 'confirm' or given clear confirmation.\n"
+    "If all details are present, ONLY send an order summary and ask the user to reply 'confirm' before proceeding.\n"
+    "Do NOT say the order is confirmed or placed until the backend has saved it after user confirmation.\n"
+)
+
+
+def restaurant_context(catalog):
+    return (
+        _CONTEXT_HEAD
+        + catalog.prompt_context()
+        + f"Contact numbers: {', '.join(catalog.info.get('contacts', []))}.\n"
+        + _CONTEXT_TAIL
+    )
+
+STATE_INSTRUCTIONS = {
+    'greeting': (
+        "Greet the user warmly, ask about their mood or what they feel like eating today.\n"
+        "Don't ask for order details yet.\n"
+    ),
+    'order_interest': (
+        "User is interested in ordering. Suggest popular dishes or ask if they'd like to place an order.\n"
+        "Don't ask for details yet, just encourage them.\n"
+    ),
+    'collecting_details': (
+        "User wants to place an order. Now, politely and step-by-step, ask for order details (name, address, phone, items), one at a time.\n"
+        "If user has already provided any order details, do NOT ask again, just politely confirm.\n"
+        "If user gives all details in one message, confirm and save the order, don't ask again.\n"
+    ),
+}
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except Exception:  # tiktoken optional hai
+    _encoding = None
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)  # andaza: ~4 characters per token
+
+
+def count_message_tokens(messages):
+    # Har message par ~4 tokens ka role/format overhead, aur reply priming ke 3
+    return sum(4 + count_tokens(m.get('content', '')) for m in messages) + 3
+
+
+# (catalog version, system message, tokens): har call mein yahi object (same bytes) jata hai,
+# catalog reload ho to naya
+_static = None
+_static_lock = threading.Lock()
+
+
+def static_system_message():
+    global _static
+    catalog = get_catalog()
+    with _static_lock:
+        if _static is None or _static[0] != catalog.version:
+            message = {"role": "system", "content": restaurant_context(catalog)}
+            _static = (catalog.version, message, count_message_tokens([message]))
+        return _static[1]
+
+
+def static_prefix_tokens():
+    static_system_message()
+    return _static[2]
+
+
+REGISTRY.gauge('prompt_static_prefix_tokens', lambda: _static[2] if _static is not None else 0,
+               'Estimated tokens of the static system message every reply call starts with')
+
+
+def build_messages(state, language, history, system_prompt=None, summary=None):
+    """
+    [static context] + [state instructions + language + memory summary] + history (user/assistant roles).
+    history ka aakhri message current user message hona chahiye.
+    """
+    instructions = STATE_INSTRUCTIONS.get(state, '')
+    if system_prompt:
+        instructions += system_prompt + "\n"
+    instructions += f"Reply in {language}.\n"
+    if summary:
+        instructions += f"Conversation summary so far (older messages): {summary}\n"
+    messages = [static_system_message(), {"role": "system", "content": instructions}]
+    for msg in history:
+        if msg.get('role') in ('user', 'assistant'):
+            messages.append({"role": msg['role'], "content": msg['content']})
+    return messages
+
+
+def record_prompt_usage(messages, response):
+    """
+    Har call ki report: estimated prompt tokens, provider ke bataye prompt/cached tokens.
+    cached_tokens tab milte hain jab provider prefix cache hit report kare. Provider ke tokens
+    record_llm_usage llm_tokens_total mein ginta hai; yahan sirf apna estimate.
+    """
+    usage = usage_value(response, 'usage') or {}
+    prompt_tokens = usage_value(usage, 'prompt_tokens')
+    details = usage_value(usage, 'prompt_tokens_details') or {}
+    cached = usage_value(details, 'cached_tokens') or 0
+    completion = usage_value(usage, 'completion_tokens') or 0
+    estimated = count_message_tokens(messages)
+    if prompt_tokens is None:
+        prompt_tokens = estimated
+    report = {
+        'estimated_prompt_tokens': estimated,
+        'static_prefix_tokens': static_prefix_tokens(),
+        'prompt_tokens': prompt_tokens,
+        'cached_tokens': cached,
+        'uncached_tokens': prompt_tokens - cached,
+        'completion_tokens': completion,
+    }
+    REGISTRY.inc('prompt_estimated_tokens_total', estimated)
+    return report
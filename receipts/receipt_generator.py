@@ -1,23 +1,35 @@
 import datetime
+import json
+from catalog.menu_catalog import get_catalog
 
 def generate_receipt(order):
     now = datetime.datetime.now().strftime('%d-%b-%Y %I:%M %p')
-    items_list = order.get('items', [])
+    items_list = order.get('items') or []
     if isinstance(items_list, str):
-        import json
         try:
             items_list = json.loads(items_list)
-        except:
-            items_list = []
+        except ValueError:
+            pass  # JSON nahi, customer ka likha hua text
+    if isinstance(items_list, dict):
+        items_list = [items_list]  # ek hi order line
     items_str = ''
-    if items_list:
-        for item in items_list:
-            name = item.get('name', 'Item')
-            qty = item.get('quantity', 1)
-            items_str += f"- {qty} x {name}\n"
+    if items_list and not isinstance(items_list, list):
+        # List ke bajaye free text (ya JSON string): ek hi line, bina qeemat aur total
+        items_str = f"- {str(items_list).strip()}\n"
+    elif items_list:
+        # Unit price aur line total catalog se; jis item ki qeemat na mile woh bina price ke
+        catalog = get_catalog()
+        lines, total, complete = catalog.price_lines(items_list)
+        for qty, name, unit, line_total in lines:
+            if line_total is None:
+                items_str += f"- {qty} x {name}\n"
+            else:
+                items_str += f"- {qty} x {name} @ {catalog.currency} {unit:,} = {catalog.currency} {line_total:,}\n"
+        if complete:
+            items_str += f"\nTotal: {catalog.currency} {total:,} 🧾\n"
     else:
         return None  # No items, don't send receipt
-    payment_type = order.get('payment_type', '').strip()
+    payment_type = (order.get('payment_type') or '').strip()
     if not payment_type:
         return None  # No payment type, don't send receipt
     receipt = f"""
@@ -1,39 +1,151 @@
-import gspread
-from google.oauth2.service_account import Credentials
 from config import Config
 import datetime
+import re
+import threading
+from sheets.row_index import (find_row, get_row, is_known_miss, rebuild_due, rebuild_row_index, record_miss,
+                              record_rows)
+from metrics import timed
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-SERVICE_ACCOUNT_INFO = Config.get_google_service_account()
-
-creds = Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=SCOPES)
-gc = gspread.authorize(creds)
 
 SHEET_ID = Config.GOOGLE_SHEET_ID
+SHEET_HEADERS = ['Name', 'Address', 'Phone', 'Items', 'Payment Type', 'Notes', 'WhatsApp Number', 'Date/Time', 'Status', 'Order ID']
+STATUS_COL = 9
+ORDER_ID_COL = 10
+
+_client = None
+_client_lock = threading.Lock()
+_worksheet = None
+_worksheet_lock = threading.Lock()
+
+
+class SheetHeaderError(ValueError):
+    """Sheet ke columns SHEET_HEADERS se mukhtalif: append karne se orders ghalat columns mein jayenge."""
+
+
+def get_client():
+    # Service account credentials aur gspread client pehli sheet call (ya warmup) par
+    global _client
+    with _client_lock:
+        if _client is None:
+            import gspread
+            from google.oauth2.service_account import Credentials
+            creds = Credentials.from_service_account_info(Config.get_google_service_account(), scopes=SCOPES)
+            _client = gspread.authorize(creds)
+    return _client
+
+
+def check_header(worksheet):
+    """
+    Append/update se pehle header ki tasdeeq: khali sheet par header likhta hai, purani sheet
+    (SHEET_HEADERS ka shuru ka hissa) mein baqi columns jorta hai. Columns mukhtalif hon to
+    SheetHeaderError; handle cache nahi hota, is liye sheet theek hote hi agli call chal jati hai.
+    """
+    header = [str(value).strip() for value in worksheet.row_values(1)]
+    if not header:
+        worksheet.append_row(SHEET_HEADERS)
+    elif header[:len(SHEET_HEADERS)] == SHEET_HEADERS:
+        return
+    elif header == SHEET_HEADERS[:len(header)]:
+        # Purani sheet: 'Order ID' column header add karo
+        worksheet.update([SHEET_HEADERS], 'A1')
+    else:
+        raise SheetHeaderError(f'Unexpected Google Sheet header {header}, expected {SHEET_HEADERS}')
+
+
+def get_worksheet():
+    # Spreadsheet/worksheet handle aur header check sirf pehli dafa; baad mein cached handle
+    global _worksheet
+    with _worksheet_lock:
+        if _worksheet is None:
+            worksheet = get_client().open_by_key(SHEET_ID).sheet1  # Default: first sheet
+            check_header(worksheet)
+            _worksheet = worksheet
+        return _worksheet
+
+
+def reset_worksheet():
+    # Sheet delete/rename ho jaye to agli call naya handle le
+    global _worksheet
+    with _worksheet_lock:
+        _worksheet = None
+
+
+def format_order_row(row, status='pending', created_at=None, order_id=''):
+    now = (created_at or datetime.datetime.now()).strftime('%d-%b-%Y %I:%M %p')
+    return row + [now, status, order_id]
+
+
+def _first_updated_row(response):
+    # append_rows response: {"updates": {"updatedRange": "Sheet1!A12:J14", ...}}
+    updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+    match = re.search(r'![A-Z]+(\d+)', updated_range)
+    return int(match.group(1)) if match else None
+
+
+@timed('sheets.append')
+def append_orders_to_sheet(rows):
+    """
+    Kai orders ek hi API call mein; rows mein Date/Time, Status aur Order ID pehle se hon.
+    Return: har row ka sheet row number (ya None agar response se pata na chale).
+    """
+    if not rows:
+        return []
+    worksheet = get_worksheet()
+    # Har batch par header dobara: sheet haath se badli ho to ghalat columns mein append na ho
+    check_header(worksheet)
+    response = worksheet.append_rows(rows)
+    first = _first_updated_row(response)
+    return [first + i if first else None for i in range(len(rows))]
 
 
 def append_order_to_sheet(row, status='pending'):
-    sh = gc.open_by_key(SHEET_ID)
-    worksheet = sh.sheet1  # Default: first sheet
-    # Check if sheet is empty, if yes, add headings
-    if worksheet.row_count == 0 or not worksheet.get_all_values():
-        worksheet.append_row(['Name', 'Address', 'Phone', 'Items', 'Payment Type', 'Notes', 'WhatsApp Number', 'Date/Time', 'Status'])
-    # Add current date/time and status to row
-    now = datetime.datetime.now().strftime('%d-%b-%Y %I:%M %p')
-    row = row + [now, status]
-    worksheet.append_row(row)
-
-
-def update_order_status_in_sheet(whatsapp_number, created_at, new_status):
-    sh = gc.open_by_key(SHEET_ID)
-    worksheet = sh.sheet1
-    all_rows = worksheet.get_all_values()
-    # Find the row with matching WhatsApp number and date/time (last match)
-    target_row = None
-    for idx, row in enumerate(all_rows):
-        if len(row) >= 7 and row[6] == whatsapp_number:
-            # Compare date/time (created_at) with row[7] (Date/Time)
-            if len(row) >= 8 and created_at.strftime('%d-%b-%Y %I:%M %p') == row[7]:
-                target_row = idx + 1  # 1-based index for gspread
-    if target_row:
-        worksheet.update_cell(target_row, 9, new_status)  # 9th column is Status 
\ No newline at end of file
+    append_orders_to_sheet([format_order_row(row, status)])
+
+
+@timed('sheets.rebuild_index')
+def rebuild_sheet_row_index():
+    # Sheet haath se edit hui ho (rows upar neeche) to yeh chalayein
+    return rebuild_row_index(get_worksheet(), ORDER_ID_COL)
+
+
+@timed('sheets.find_row')
+def find_order_row(order_id):
+    """
+    Index mein na mile order ki row: Order ID column ek dafa parh kar. Poora index rebuild
+    (DB delete + insert) sirf rate limit ke andar; warna bas yehi row index mein. Sheet mein na
+    mile to miss yaad rehta hai aur SHEET_INDEX_MISS_TTL tak column dobara nahi parha jata.
+    """
+    if is_known_miss(order_id):
+        return None
+    worksheet = get_worksheet()
+    values = worksheet.col_values(ORDER_ID_COL)
+    if rebuild_due():
+        rebuild_row_index(worksheet, ORDER_ID_COL, values)
+        row = get_row(order_id)
+    else:
+        row = find_row(values, order_id)
+        if row is not None:
+            record_rows({order_id: row})
+    if row is None:
+        record_miss(order_id)
+    return row
+
+
+@timed('sheets.update_status')
+def update_order_status_in_sheet(order_id, new_status):
+    """
+    Index se order ki row dhoond kar sirf Status cell update karta hai, sheet parhe baghair.
+    Index mein na ho to find_order_row (negative cache aur rate-limited rebuild ke sath).
+    """
+    row = get_row(order_id)
+    if row is None:
+        row = find_order_row(order_id)
+    if row is None:
+        return False
+    update_status_cell(row, new_status)
+    return True
+
+
+def update_status_cell(row, new_status):
+    get_worksheet().update_cell(row, STATUS_COL, new_status)
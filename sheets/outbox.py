@@ -0,0 +1,190 @@
+import datetime
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy import or_
+from db.models import SheetOutbox, SessionLocal
+from sheets.google_sheets import (append_orders_to_sheet, reset_worksheet, update_order_status_in_sheet,
+                                  update_status_cell, STATUS_COL)
+from sheets.row_index import record_rows
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Write-behind flusher: sheet_outbox ki pending rows ko batch bana kar ek append_rows
+# call mein Google Sheet par bhejta hai. Customer ka confirm turn kabhi Google ka intezar nahi karta.
+# Har gunicorn worker ka apna flusher hota hai, is liye rows pehle ek UPDATE se atomically
+# claim hoti hain ('sending' + claimed_by); har flusher sirf apni claim ki hui rows bhejta hai.
+
+FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '5'))
+FLUSH_BATCH_SIZE = int(os.getenv('SHEETS_FLUSH_BATCH_SIZE', '100'))
+MAX_BACKOFF = 300
+MAX_ATTEMPTS = 8  # sirf non-retryable errors ke liye; quota errors hamesha retry hote hain
+# Itni der se 'sending' row ka flusher mar chuka samjho (crash/kill); dobara claim ho sakti hai
+CLAIM_TIMEOUT = float(os.getenv('SHEETS_CLAIM_TIMEOUT', '300'))
+
+_wakeup = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def _is_retryable(error):
+    import gspread  # sirf error path par; client ban chuka ho to pehle se loaded
+    if isinstance(error, gspread.exceptions.APIError):
+        code = getattr(error.response, 'status_code', None)
+        return code == 429 or (code is not None and code >= 500)
+    return True  # network errors wagherah
+
+
+def _claim(db, batch_size):
+    """
+    Pending (ya purane lease wali 'sending') rows ek UPDATE mein is flush ke naam karo; doosra
+    process wahi rows nahi le sakta (SQLite write lock, Postgres row lock ke baad WHERE dobara).
+    Return: claim token aur claimed rows id order mein.
+    """
+    token = f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    now = datetime.datetime.utcnow()
+    claimable = or_(
+        SheetOutbox.status == 'pending',
+        (SheetOutbox.status == 'sending') & (SheetOutbox.claimed_at < now - datetime.timedelta(seconds=CLAIM_TIMEOUT)),
+    )
+    ids = db.query(SheetOutbox.id).filter(claimable).order_by(SheetOutbox.id).limit(batch_size).subquery()
+    claimed = (
+        db.query(SheetOutbox)
+        .filter(SheetOutbox.id.in_(db.query(ids.c.id)), claimable)
+        .update({'status': 'sending', 'claimed_by': token, 'claimed_at': now}, synchronize_session=False)
+    )
+    db.commit()
+    if not claimed:
+        return token, []
+    return token, db.query(SheetOutbox).filter(SheetOutbox.claimed_by == token).order_by(SheetOutbox.id).all()
+
+
+def flush_once(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Pending rows ka ek batch claim kar ke bhejta hai. Return: bheji gayi rows ki tadaad.
+    Error par exception raise hoti hai taake flusher backoff kar sake.
+    """
+    db = SessionLocal()
+    try:
+        token, claimed = _claim(db, batch_size)
+        if not claimed:
+            return 0
+        # Jo bheja ja raha hai uski copy: append ke dauran status badle to baad mein dobara lagana hai
+        sent_rows = {item.id: item.row for item in claimed}
+        try:
+            row_numbers = append_orders_to_sheet([json.loads(row) for row in sent_rows.values()])
+        except Exception as e:
+            db.expire_all()
+            for item in db.query(SheetOutbox).filter(SheetOutbox.claimed_by == token):
+                item.attempts = (item.attempts or 0) + 1
+                item.last_error = str(e)[:255]
+                failed = not _is_retryable(e) and item.attempts >= MAX_ATTEMPTS
+                item.status = 'failed' if failed else 'pending'
+                item.claimed_by = item.claimed_at = None
+            db.commit()
+            import gspread
+            if isinstance(e, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+                reset_worksheet()
+            raise
+        sheet_rows = {item.id: row for item, row in zip(claimed, row_numbers)}
+        try:
+            # 'sent' se pehle index, taake us ke baad aane wala status update sheet row dhoond sake
+            record_rows({item.order_id: sheet_rows[item.id] for item in claimed if item.order_id and sheet_rows[item.id]})
+        except Exception as e:
+            # Index baad mein rebuild ho sakta hai, rows dobara append nahi karni
+            logger.warning('Sheet row index update error: %s', e)
+        # update_sheet_order_status 'sending' row ko bhi lock kar ke badalta hai; sent mark karte
+        # waqt wahi lock le kar dekho ke append ke dauran kis ka status badla
+        db.expire_all()
+        sending = (
+            db.query(SheetOutbox)
+            .filter(SheetOutbox.claimed_by == token)
+            .with_for_update()
+            .all()
+        )
+        now = datetime.datetime.utcnow()
+        changed = []
+        for item in sending:
+            if item.row != sent_rows[item.id]:
+                changed.append((item.order_id, sheet_rows[item.id], json.loads(item.row)[STATUS_COL - 1]))
+            item.status = 'sent'
+            item.sent_at = now
+        db.commit()
+        for order_id, sheet_row, new_status in changed:
+            _reapply_status(order_id, sheet_row, new_status)
+        return len(claimed)
+    finally:
+        db.close()
+
+
+def _reapply_status(order_id, sheet_row, new_status):
+    # Append purane status ke sath gaya; naya status ab seedha sheet ke Status cell mein
+    try:
+        if sheet_row:
+            update_status_cell(sheet_row, new_status)
+        elif order_id:
+            update_order_status_in_sheet(order_id, new_status)
+    except Exception as e:
+        logger.warning('Google Sheet status update error for order %s: %s', order_id, e)
+
+
+def _flusher():
+    failures = 0
+    while True:
+        _wakeup.wait(timeout=FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            # Backlog ho to batches lagatar bhejo
+            while flush_once() >= FLUSH_BATCH_SIZE:
+                pass
+            failures = 0
+        except Exception as e:
+            failures += 1
+            delay = min(MAX_BACKOFF, 2 ** failures) * random.uniform(0.5, 1.5)
+            logger.warning('Google Sheet outbox flush error (retry in %.0fs): %s', delay, e)
+            time.sleep(delay)
+
+
+def start_sheet_outbox():
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_flusher, name='sheet-outbox-flusher', daemon=True).start()
+    _wakeup.set()  # restart ke baad bachi hui rows foran bhejo
+
+
+def notify_sheet_outbox():
+    start_sheet_outbox()
+    _wakeup.set()
+
+
+def update_sheet_order_status(order_id, new_status):
+    """
+    Order abhi outbox mein pending ho to wahin status badal do (Google call nahi); 'sending'
+    ho to bhi, flusher append ke baad farq dekh kar Status cell dobara likhta hai. Warna index
+    ke zariye sheet ka sirf Status cell update hota hai.
+    """
+    db = SessionLocal()
+    try:
+        item = (
+            db.query(SheetOutbox)
+            .filter(SheetOutbox.order_id == order_id, SheetOutbox.status.in_(('pending', 'sending')))
+            .with_for_update()
+            .first()
+        )
+        if item:
+            row = json.loads(item.row)
+            row[STATUS_COL - 1] = new_status
+            item.row = json.dumps(row)
+            db.commit()
+            return True
+    finally:
+        db.close()
+    return update_order_status_in_sheet(order_id, new_status)
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from db.models import SheetRowIndex, SessionLocal
+
+# order_id -> sheet row ka index. Memory mein cache, DB (sheet_row_index table) mein persist.
+# Sheet haath se edit ho jaye (rows insert/delete) to rebuild_row_index() Order ID column
+# parh kar index theek kar deta hai. Jo order sheet mein mila hi nahi us ka "miss" kuch der
+# yaad rehta hai, taake har status update par column dobara na parha jaye.
+
+MISS_TTL = float(os.getenv('SHEET_INDEX_MISS_TTL', '300'))
+REBUILD_INTERVAL = float(os.getenv('SHEET_INDEX_REBUILD_INTERVAL', '600'))
+MAX_MISSES = 10000
+
+_rows = {}
+_lock = threading.Lock()
+_loaded = False
+_misses = OrderedDict()  # order_id -> expires_at (monotonic)
+_last_rebuild = None
+
+
+def _load():
+    global _loaded
+    if _loaded:
+        return
+    db = SessionLocal()
+    try:
+        for entry in db.query(SheetRowIndex).all():
+            _rows[entry.order_id] = entry.row
+    finally:
+        db.close()
+    _loaded = True
+
+
+def record_rows(mapping):
+    # mapping: {order_id: row}
+    if not mapping:
+        return
+    db = SessionLocal()
+    try:
+        for order_id, row in mapping.items():
+            db.merge(SheetRowIndex(order_id=order_id, row=row))
+        db.commit()
+    finally:
+        db.close()
+    with _lock:
+        _rows.update(mapping)
+        for order_id in mapping:
+            _misses.pop(order_id, None)
+
+
+def get_row(order_id):
+    with _lock:
+        _load()
+        return _rows.get(order_id)
+
+
+def is_known_miss(order_id):
+    with _lock:
+        expires = _misses.get(order_id)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del _misses[order_id]
+        return False
+
+
+def record_miss(order_id):
+    with _lock:
+        _misses[order_id] = time.monotonic() + MISS_TTL
+        _misses.move_to_end(order_id)
+        while len(_misses) > MAX_MISSES:
+            _misses.popitem(last=False)
+
+
+def rebuild_due():
+    # Poora index dobara likhna (delete + insert) REBUILD_INTERVAL mein zyada se zyada ek dafa
+    with _lock:
+        return _last_rebuild is None or time.monotonic() - _last_rebuild >= REBUILD_INTERVAL
+
+
+def find_row(values, order_id):
+    """Order ID column ki values (col_values) mein order ki 1-based row, ya None."""
+    target = str(order_id)
+    for idx, value in enumerate(values):
+        if str(value).strip() == target:
+            return idx + 1
+    return None
+
+
+def rebuild_row_index(worksheet, order_id_col, values=None):
+    """
+    Sheet ka sirf Order ID column parh kar poora index dobara banata hai (values pehle se
+    parhi hon to wahi). Return: index mein orders ki tadaad.
+    """
+    global _loaded, _last_rebuild
+    mapping = {}
+    if values is None:
+        values = worksheet.col_values(order_id_col)
+    for idx, value in enumerate(values):
+        value = str(value).strip()
+        if value.isdigit():
+            mapping[int(value)] = idx + 1  # 1-based row for gspread
+    db = SessionLocal()
+    try:
+        db.query(SheetRowIndex).delete()
+        db.add_all(SheetRowIndex(order_id=order_id, row=row) for order_id, row in mapping.items())
+        db.commit()
+    finally:
+        db.close()
+    with _lock:
+        _rows.clear()
+        _rows.update(mapping)
+        _misses.clear()
+        _loaded = True
+        _last_rebuild = time.monotonic()
+    return len(mapping)
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Config class attributes import par env se bante hain: app modules import hone se pehle
+# sab kuch temp dir aur memory backends ki taraf (asal DB / Google / Meta tak kuch nahi jata)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_workdir = tempfile.mkdtemp(prefix='alarab-tests-')
+os.environ.update({
+    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_workdir, 'app.db')}",
+    'INGEST_QUEUE_PATH': os.path.join(_workdir, 'ingest_queue.db'),
+    'DEDUP_BACKEND': 'memory',
+    'SESSION_BACKEND': 'memory',
+    'MEDIA_CACHE_PATH': os.path.join(_workdir, 'media_cache.db'),
+    'WHATSAPP_CLOUD_TOKEN': 'test-token',
+    'WHATSAPP_PHONE_NUMBER_ID': 'test',
+    'OPENAI_API_KEY': 'sk-test',
+    'GOOGLE_SERVICE_ACCOUNT_JSON': '{}',
+    'GOOGLE_SHEET_ID': 'test-sheet',
+    'VERIFICATION_TOKEN': 'test',
+    'LOG_LEVEL': 'WARNING',
+})
@@ -0,0 +1,58 @@
+import pytest
+from metrics import REGISTRY
+from openai_agent.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache():
+    return AnswerCache()
+
+
+@pytest.mark.parametrize('question, intent', [
+    ('timing kya hai', 'timings'),
+    ('Timings?', 'timings'),
+    ('bhai address kya hai', 'address'),
+    ('do you deliver', 'delivery'),
+    ('any deals?', 'deals'),
+    ('phone number', 'contact'),
+])
+def test_seed_questions_are_answered(cache, question, intent):
+    answer = cache.lookup(question)
+    assert answer == cache._answer(intent, 'Roman Urdu')
+
+
+@pytest.mark.parametrize('question', [
+    'delivery late hai',
+    'no delivery please',
+    'meri delivery',
+    'delivery address',
+    'my address',
+    'number do',
+    'delivery charges kitne hain',
+    'order kahan hai',
+])
+def test_complaints_negations_and_mixed_topics_go_to_the_llm(cache, question):
+    assert cache.lookup(question) is None
+
+
+def test_similarity_needs_the_topic_keyword_and_a_close_match(cache):
+    before = REGISTRY.value('answer_cache_lookups_total', result='similar_hit')
+    assert cache.lookup('delivery hoty hai?') == cache._answer('delivery', 'Roman Urdu')
+    assert REGISTRY.value('answer_cache_lookups_total', result='similar_hit') == before + 1
+    # Keyword ke baghair koi similarity nahi, spelling kitni bhi qareeb ho
+    assert cache.lookup('timng') is None
+
+
+def test_similarity_hits_are_never_learned_as_questions(cache):
+    questions = dict(cache._questions)
+    assert cache.lookup('delivery hoty hai?') is not None
+    assert cache._questions == questions
+
+
+def test_answers_follow_the_language(cache):
+    assert cache.lookup('what are your timings', 'English').startswith('Al Arab Restaurant is open')
+    assert cache.lookup('what are your timings', 'Urdu').startswith('العرب')
+
+
+def test_long_messages_are_not_faq(cache):
+    assert cache.lookup('bhai kal raat jo order kiya tha uski delivery bohat acha tha timing') is None
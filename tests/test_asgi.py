@@ -0,0 +1,68 @@
+import asyncio
+import json
+import pytest
+from whatsapp import asgi
+
+
+@pytest.fixture(autouse=True)
+def no_startup(monkeypatch):
+    # Warmup / sheet outbox / journal workers in tests mein nahi; sirf routing aur responses
+    monkeypatch.setattr(asgi, '_started', True)
+
+
+def request(method, path, body=b'', query_string=b''):
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string}
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start, response = sent
+    headers = dict(start['headers'])
+    assert int(headers[b'content-length']) == len(response['body'])
+    return start['status'], headers[b'content-type'].decode(), response['body'].decode()
+
+
+def test_webhook_verification():
+    assert request('GET', '/webhook', query_string=b'hub.verify_token=test&hub.challenge=42')[::2] == (200, '42')
+    assert request('GET', '/webhook', query_string=b'hub.verify_token=wrong&hub.challenge=42')[0] == 403
+
+
+def test_ping_metrics_and_unknown_paths():
+    assert request('GET', '/ping')[::2] == (200, 'pong')
+    status, content_type, _ = request('GET', '/metrics')
+    assert status == 200 and content_type.startswith('text/plain')
+    assert request('GET', '/nope')[0] == 404
+
+
+def test_post_without_messages_is_acknowledged():
+    status, content_type, body = request('POST', '/webhook', json.dumps({'entry': []}).encode())
+    assert (status, content_type, json.loads(body)) == (200, 'application/json', {'status': 'no messages'})
+
+
+def test_bad_json_is_a_400():
+    status, _, body = request('POST', '/webhook', b'{not json')
+    assert status == 400
+    assert json.loads(body)['status'] == 'error'
+
+
+def test_lifespan_completes_startup_and_shutdown(monkeypatch):
+    calls = []
+    monkeypatch.setattr(asgi, '_startup', lambda: calls.append('startup'))
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(asgi.app({'type': 'lifespan'}, receive, send))
+    assert calls == ['startup']
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,61 @@
+import json
+import pytest
+from catalog.menu_catalog import MENU_PATH, MenuCatalog, get_catalog, load_catalog
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return load_catalog()
+
+
+@pytest.mark.parametrize('text, name, size', [
+    ('chicken shawarma', 'Chicken Shawarma', 'Regular'),
+    ('Chicken Shawarma!!', 'Chicken Shawarma', 'Regular'),
+    ('shwarma chicken', 'Chicken Shawarma', 'Regular'),      # spelling variant + ulta word order
+    ('biryani half', 'Chicken Biryani', 'Half'),
+    ('aadha biryani', 'Chicken Biryani', 'Half'),
+    ('biryani', 'Chicken Biryani', None),                    # do sizes, koi bataya nahi
+    ('zingr burger', 'Zinger Burger', 'Regular'),            # fuzzy
+])
+def test_lookup(catalog, text, name, size):
+    item, found_size = catalog.lookup(text)
+    assert item is not None and item.name == name
+    assert found_size == size
+
+
+def test_lookup_miss(catalog):
+    assert catalog.lookup('nihari') == (None, None)
+    assert catalog.lookup('') == (None, None)
+
+
+def test_price_lines_and_total(catalog):
+    lines, total, complete = catalog.price_lines([
+        {'name': 'Chicken Shawarma', 'quantity': 2},
+        {'name': 'biryani', 'size': 'full', 'quantity': 1},
+    ])
+    assert lines == [(2, 'Chicken Shawarma', 490, 980), (1, 'Chicken Biryani (Full)', 450, 450)]
+    assert (total, complete) == (1430, True)
+
+
+def test_price_lines_unknown_item_is_incomplete(catalog):
+    lines, total, complete = catalog.price_lines([{'name': 'nihari', 'quantity': 1}])
+    assert lines == [(1, 'nihari', None, None)]
+    assert complete is False
+
+
+def test_price_lines_free_text_is_one_line(catalog):
+    lines, _, _ = catalog.price_lines('2 zinger aur fries')
+    assert len(lines) == 1
+
+
+def test_lookup_cache_belongs_to_the_instance():
+    with open(MENU_PATH, encoding='utf-8') as f:
+        data = json.load(f)
+    first, second = MenuCatalog(data), MenuCatalog(data)
+    first.lookup('shwarma chicken')
+    assert len(first._lookup_cache) == 1
+    assert second._lookup_cache == {}
+
+
+def test_get_catalog_is_a_singleton():
+    assert get_catalog() is get_catalog()
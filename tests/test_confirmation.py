@@ -0,0 +1,58 @@
+import pytest
+from aio import run_sync
+from metrics import REGISTRY
+from openai_agent import confirmation
+from openai_agent.confirmation import classify_confirmation_async, lexicon_decision
+
+
+@pytest.mark.parametrize('text', [
+    'yes', 'haan', 'ji', 'jee haan', 'ok', 'theek hai', 'confirm', 'done', 'bilkul', 'جی ہاں', '👍',
+    'kar do', 'order kar do', 'bhai order kar do please', 'kardo', 'کر دیں', 'confirm kar dein',
+])
+def test_yes(text):
+    assert lexicon_decision(text) == 'yes'
+
+
+@pytest.mark.parametrize('text', ['nahi', 'no', 'address galat hai', 'ruko', 'phone number change kar do', 'نہیں'])
+def test_no(text):
+    assert lexicon_decision(text) == 'no'
+
+
+@pytest.mark.parametrize('text', ['cancel', 'cancel kar do', 'rehne do', 'nahi chahiye', 'کینسل'])
+def test_cancel(text):
+    assert lexicon_decision(text) == 'cancel'
+
+
+@pytest.mark.parametrize('text', [
+    'do', 'hai', 'order', 'please', 'kal tak aa jayega?', '', 'karo', 'hai karo', 'کریں',
+    # Inkaar ke sath action: lexicon ulta samajh sakta hai
+    'cancel mat karo', 'cancel na karein', "don't cancel", 'confirm mat karo', 'order nahi karna abhi',
+])
+def test_ambiguous_goes_to_the_llm(text):
+    assert lexicon_decision(text) is None
+
+
+def test_llm_answer_is_memoized(monkeypatch):
+    calls = []
+
+    async def fake_llm(text, timeout=None):
+        calls.append(text)
+        return True
+
+    monkeypatch.setattr(confirmation, 'is_order_confirmation_async', fake_llm)
+    text = 'hmm chaliye bhej hi dijiye sab kuch'
+    before = REGISTRY.value('confirmation_decisions_total', decision='yes', source='cache')
+    assert run_sync(classify_confirmation_async(text)) == 'yes'
+    assert run_sync(classify_confirmation_async(text)) == 'yes'
+    assert calls == [text]
+    assert REGISTRY.value('confirmation_decisions_total', decision='yes', source='cache') == before + 1
+
+
+def test_llm_error_is_unknown_and_not_memoized(monkeypatch):
+    async def broken_llm(text, timeout=None):
+        raise TimeoutError('deadline')
+
+    monkeypatch.setattr(confirmation, 'is_order_confirmation_async', broken_llm)
+    text = 'shayad baad mein dekhte hain'
+    assert run_sync(classify_confirmation_async(text)) == 'unknown'
+    assert confirmation.normalize(text) not in confirmation._memo
@@ -0,0 +1,85 @@
+import pytest
+from db import conversation_log
+from db.conversation_log import ConversationLogger, MESSAGE_MAX_LENGTH, load_history
+from db.models import Conversation, SessionLocal
+
+
+@pytest.fixture
+def writer():
+    db = SessionLocal()
+    db.query(Conversation).delete()
+    db.commit()
+    db.close()
+    writer = ConversationLogger(batch_size=2, max_queue=5)
+    writer._started = True  # background writer nahi: flush() test khud chalata hai
+    return writer
+
+
+def stored():
+    db = SessionLocal()
+    try:
+        return [(c.whatsapp_number, c.sender, c.message) for c in db.query(Conversation).order_by(Conversation.id)]
+    finally:
+        db.close()
+
+
+def test_messages_are_written_in_batches_on_flush(writer):
+    for i in range(5):
+        assert writer.log('923001', 'user' if i % 2 == 0 else 'bot', f'message {i}')
+    assert stored() == []
+    assert writer.flush() == 5
+    assert [m for _, _, m in stored()] == [f'message {i}' for i in range(5)]
+    assert writer.get_stats()['batches'] == 3
+    assert writer.get_stats()['backlog'] == 0
+
+
+def test_full_queue_drops_instead_of_blocking(writer):
+    assert all(writer.log('923001', 'user', f'm{i}') for i in range(5))
+    assert not writer.log('923001', 'user', 'one too many')
+    assert writer.get_stats()['dropped'] == 1
+
+
+def test_empty_messages_and_numbers_are_skipped(writer):
+    assert not writer.log('', 'user', 'hi')
+    assert not writer.log('923001', 'user', '')
+    assert writer.get_stats()['queued'] == 0
+
+
+def test_long_messages_are_truncated(writer):
+    writer.log('923001', 'bot', 'x' * (MESSAGE_MAX_LENGTH + 50))
+    writer.flush()
+    assert len(stored()[0][2]) == MESSAGE_MAX_LENGTH
+
+
+def test_failed_flush_keeps_the_rows_for_the_next_one(writer, monkeypatch):
+    writer.log('923001', 'user', 'hello')
+
+    class BrokenSession:
+        def bulk_insert_mappings(self, *args):
+            raise RuntimeError('database is locked')
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(conversation_log, 'SessionLocal', BrokenSession)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.get_stats()['backlog'] == 1
+    monkeypatch.setattr(conversation_log, 'SessionLocal', SessionLocal)
+    assert writer.flush() == 1
+    assert stored() == [('923001', 'user', 'hello')]
+
+
+def test_history_comes_back_as_memory_turns_oldest_first(writer):
+    for i in range(4):
+        writer.log('923002', 'user' if i % 2 == 0 else 'bot', f'turn {i}')
+    writer.log('923003', 'user', 'someone else')
+    writer.flush()
+    assert load_history('923002', limit=3) == [
+        {'role': 'assistant', 'content': 'turn 1'},
+        {'role': 'user', 'content': 'turn 2'},
+        {'role': 'assistant', 'content': 'turn 3'},
+    ]
@@ -0,0 +1,48 @@
+from metrics import REGISTRY
+from whatsapp.dedup import SeenMessageIndex, SqliteSeenBackend
+
+
+def test_first_claim_wins_and_duplicates_are_counted():
+    index = SeenMessageIndex(ttl=60, max_entries=100)
+    duplicates = REGISTRY.value('dedup_duplicates_total')
+    assert index.claim('wamid.1') is True
+    assert index.claim('wamid.1') is False
+    assert index.claim('wamid.2') is True
+    assert REGISTRY.value('dedup_duplicates_total') == duplicates + 1
+
+
+def test_message_without_id_is_always_processed():
+    index = SeenMessageIndex(ttl=60, max_entries=100)
+    assert index.claim(None) is True
+    assert index.claim('') is True
+
+
+def test_release_lets_a_redelivery_run_again():
+    index = SeenMessageIndex(ttl=60, max_entries=100)
+    assert index.claim('wamid.1') is True
+    index.release('wamid.1')
+    assert index.claim('wamid.1') is True
+
+
+def test_expired_claim_can_be_claimed_again():
+    index = SeenMessageIndex(ttl=0, max_entries=100)
+    assert index.claim('wamid.1') is True
+    assert index.claim('wamid.1') is True
+
+
+def test_index_stays_bounded():
+    index = SeenMessageIndex(ttl=60, max_entries=3)
+    for i in range(10):
+        index.claim(f'wamid.{i}')
+    assert index.size() == 3
+
+
+def test_sqlite_backend_is_shared_between_indexes(tmp_path):
+    # Do workers/processes: har ek ka apna memory index, backing file ek
+    path = str(tmp_path / 'seen.db')
+    first = SeenMessageIndex(ttl=60, max_entries=100, backend=SqliteSeenBackend(path))
+    second = SeenMessageIndex(ttl=60, max_entries=100, backend=SqliteSeenBackend(path))
+    assert first.claim('wamid.1') is True
+    assert second.claim('wamid.1') is False
+    first.release('wamid.1')
+    assert second.claim('wamid.1') is True
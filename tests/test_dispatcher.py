@@ -0,0 +1,119 @@
+import threading
+import time
+import pytest
+from whatsapp.dispatcher import AsyncKeyedDispatcher, KeyedDispatcher, merge_text_payloads, plan_turns, split_payload
+
+
+def text_payload(sender, body, message_id=None):
+    message = {'from': sender, 'id': message_id or f'wamid.{sender}.{body}', 'type': 'text', 'text': {'body': body}}
+    return {'entry': [{'changes': [{'value': {'messages': [message]}}]}]}
+
+
+def body_of(payload):
+    return payload['entry'][0]['changes'][0]['value']['messages'][0]['text']['body']
+
+
+def test_messages_of_one_sender_run_in_arrival_order():
+    seen = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        time.sleep(0.001)
+        with lock:
+            seen.append(body_of(payload))
+
+    dispatcher = KeyedDispatcher(handler, workers=4, coalesce_window=0)
+    items = [(sender, text_payload(sender, f'{sender}-{i}')) for i in range(10) for sender in ('a', 'b', 'c')]
+    assert dispatcher.run_many(items, timeout=10) == [None] * len(items)
+    for sender in ('a', 'b', 'c'):
+        assert [body for body in seen if body.startswith(sender)] == [f'{sender}-{i}' for i in range(10)]
+
+
+def test_one_sender_never_runs_concurrently():
+    active = {}
+    overlaps = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        sender = payload['entry'][0]['changes'][0]['value']['messages'][0]['from']
+        with lock:
+            active[sender] = active.get(sender, 0) + 1
+            if active[sender] > 1:
+                overlaps.append(sender)
+        time.sleep(0.002)
+        with lock:
+            active[sender] -= 1
+
+    dispatcher = KeyedDispatcher(handler, workers=8, coalesce_window=0)
+    dispatcher.run_many([('a', text_payload('a', str(i))) for i in range(20)], timeout=10)
+    assert overlaps == []
+
+
+def test_handler_error_is_reported_for_that_message_only():
+    def handler(payload):
+        if body_of(payload) == 'boom':
+            raise RuntimeError('handler failed')
+
+    dispatcher = KeyedDispatcher(handler, workers=2, coalesce_window=0)
+    items = [('a', text_payload('a', 'ok-1')), ('a', text_payload('a', 'boom')), ('a', text_payload('a', 'ok-2')),
+             ('b', text_payload('b', 'ok-3'))]
+    errors = dispatcher.run_many(items, timeout=10)
+    assert errors[0] is None and errors[2] is None and errors[3] is None
+    assert isinstance(errors[1], RuntimeError)
+    assert dispatcher.get_stats()['errors'] == 1
+
+
+def test_run_raises_handler_error():
+    def handler(payload):
+        raise ValueError('bad payload')
+
+    dispatcher = KeyedDispatcher(handler, workers=1, coalesce_window=0)
+    with pytest.raises(ValueError):
+        dispatcher.run('a', text_payload('a', 'hi'), timeout=5)
+
+
+def test_run_raises_timeout_when_the_handler_is_still_busy():
+    release = threading.Event()
+    dispatcher = KeyedDispatcher(lambda payload: release.wait(5), workers=1, coalesce_window=0)
+    try:
+        with pytest.raises(TimeoutError):
+            dispatcher.run('a', text_payload('a', 'hi'), timeout=0.05)
+    finally:
+        release.set()
+
+
+def test_coalesced_texts_become_one_turn():
+    turns = []
+    dispatcher = KeyedDispatcher(lambda payload: turns.append(body_of(payload)), workers=1, coalesce_window=0.05)
+    errors = dispatcher.run_many([('a', text_payload('a', 'hi')), ('a', text_payload('a', 'menu'))], timeout=5)
+    assert errors == [None, None]
+    assert turns == ['hi\nmenu']
+
+
+def test_plan_turns_keeps_unmerged_messages_separate():
+    batch = [(text_payload('a', 'one'), None, 0), (text_payload('a', 'two'), None, 0)]
+    turns, coalesced = plan_turns(batch)
+    assert coalesced == 0
+    assert [entries for _, entries in turns] == [[batch[0]], [batch[1]]]
+    turns, coalesced = plan_turns(batch, merge_text_payloads)
+    assert coalesced == 1
+    assert len(turns) == 1 and turns[0][1] == batch
+
+
+def test_split_payload_gives_one_payload_per_message():
+    data = {'object': 'whatsapp_business_account', 'entry': [{'id': '1', 'changes': [{'value': {
+        'contacts': [{'wa_id': 'a'}, {'wa_id': 'b'}],
+        'messages': [{'from': 'a', 'id': 'm1', 'type': 'text', 'text': {'body': 'x'}},
+                     {'from': 'b', 'id': 'm2', 'type': 'text', 'text': {'body': 'y'}}],
+    }}]}]}
+    payloads = split_payload(data)
+    assert [body_of(p) for p in payloads] == ['x', 'y']
+    assert payloads[1]['entry'][0]['changes'][0]['value']['contacts'] == [{'wa_id': 'b'}]
+
+
+def test_async_dispatcher_submit_before_start_is_a_clear_error():
+    async def handler(payload):
+        pass
+
+    with pytest.raises(RuntimeError, match='start'):
+        AsyncKeyedDispatcher(handler).submit('a', text_payload('a', 'hi'))
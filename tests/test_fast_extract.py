@@ -0,0 +1,72 @@
+import pytest
+from openai_agent.fast_extract import extract_items, extract_payment_type, extract_phone, fast_extract
+
+FIELDS = ['phone', 'payment_type', 'items']
+
+
+@pytest.mark.parametrize('text, phone', [
+    ('03001234567', '03001234567'),
+    ('mera number 0300-1234567 hai', '03001234567'),
+    ('+92 300 1234567', '03001234567'),
+    ('call 923001234567', '03001234567'),
+    ('0300123456', None),                    # ek digit kam
+    ('03001234567 ya 03111234567', None),   # do alag numbers: mubham
+])
+def test_phone(text, phone):
+    assert extract_phone(text) == phone
+
+
+@pytest.mark.parametrize('text, payment', [
+    ('cash on delivery', 'Cash on Delivery'),
+    ('COD', 'Cash on Delivery'),
+    ('easy paisa se', 'EasyPaisa'),
+    ('jazz cash', 'JazzCash'),
+    ('easypaisa ya card payment', None),
+    ('jaldi bhejna', None),
+    # Akele alfaaz address/sawal mein aate hain
+    ('House 5, near Meezan bank, Gulistan-e-Johar', None),
+    ('discount card hai?', None),
+    ('ghar cash and carry ke samne hai', None),
+])
+def test_payment_type(text, payment):
+    assert extract_payment_type(text) == payment
+
+
+def test_items_with_quantities_sizes_and_spelling_variants():
+    assert extract_items('2 chicken shwarma aur ek biryani half') == [
+        {'name': 'Chicken Shawarma', 'quantity': 2},
+        {'name': 'Chicken Biryani', 'quantity': 1, 'size': 'Half'},
+    ]
+    assert extract_items('zinger burger x 3') == [{'name': 'Zinger Burger', 'quantity': 3}]
+
+
+def test_longest_alias_wins():
+    assert extract_items('chicken cheese shawarma') == [{'name': 'Chicken Cheese Shawarma', 'quantity': 1}]
+
+
+def test_no_items():
+    assert extract_items('kya haal hai') is None
+
+
+def test_message_fully_consumed_skips_the_llm():
+    values, consumed = fast_extract('2 zinger, 03001234567, cod', FIELDS)
+    assert values == {'phone': '03001234567', 'payment_type': 'Cash on Delivery',
+                      'items': [{'name': 'Zinger Burger', 'quantity': 2}]}
+    assert consumed is True
+
+
+def test_leftover_words_still_need_the_llm():
+    values, consumed = fast_extract('03001234567, naam Ahmed aur address Block 15 Johar', FIELDS)
+    assert values == {'phone': '03001234567'}
+    assert consumed is False
+
+
+def test_only_anchored_fields_are_kept_when_the_message_is_not_consumed():
+    values, consumed = fast_extract('2 zinger, cod, address Block 15 Johar 03001234567', FIELDS)
+    assert consumed is False
+    assert values == {'phone': '03001234567'}
+
+
+def test_only_requested_fields_are_extracted():
+    values, _ = fast_extract('03001234567 cod', ['payment_type'])
+    assert values == {'payment_type': 'Cash on Delivery'}
@@ -0,0 +1,101 @@
+import json
+import pytest
+import requests
+from whatsapp import send_message
+from whatsapp.send_message import GraphClient
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body if body is not None else {}
+        self.headers = headers or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def post(self, url, timeout=None, **kwargs):
+        self.calls.append(url)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+OK = FakeResponse(200, {'messages': [{'id': 'wamid.1'}]})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(send_message.time, 'sleep', slept.append)
+    return slept
+
+
+def client(*outcomes, max_retries=3):
+    graph = GraphClient('token', '123', base_url='https://graph.test', max_retries=max_retries)
+    graph.session = FakeSession(outcomes)
+    return graph
+
+
+def test_5xx_on_a_message_is_not_resent(sleeps):
+    graph = client(FakeResponse(500, {'error': {'message': 'oops'}}), OK)
+    result = graph.send_message({'to': 'a'})
+    assert not result.ok and result.retryable
+    assert len(graph.session.calls) == 1
+    assert sleeps == []
+
+
+def test_5xx_on_a_media_upload_is_retried(sleeps):
+    graph = client(FakeResponse(502), FakeResponse(200, {'id': 'media-1'}))
+    result = graph.upload_media('menu.pdf', b'%PDF', 'application/pdf')
+    assert result.ok and result.media_id == 'media-1' and result.attempts == 2
+    assert len(sleeps) == 1
+
+
+def test_429_and_throttling_codes_are_retried(sleeps):
+    graph = client(FakeResponse(429), FakeResponse(400, {'error': {'code': 130429}}), OK)
+    result = graph.send_message({'to': 'a'})
+    assert result.ok and result.message_id == 'wamid.1' and result.attempts == 3
+
+
+def test_retry_after_is_honoured_even_on_5xx(sleeps):
+    graph = client(FakeResponse(503, headers={'Retry-After': '2'}), OK)
+    assert graph.send_message({'to': 'a'}).ok
+    assert sleeps == [2.0]
+
+
+def test_long_retry_after_returns_a_retryable_result(sleeps):
+    usage = json.dumps({'123': [{'estimated_time_to_regain_access': 5}]})
+    graph = client(FakeResponse(429, headers={'X-Business-Use-Case-Usage': usage}))
+    result = graph.send_message({'to': 'a'})
+    assert not result.ok and result.retry_after == 300
+    assert sleeps == []
+
+
+def test_connection_errors_are_retried_but_read_timeouts_are_not(sleeps):
+    graph = client(requests.ConnectionError('refused'), OK)
+    assert graph.send_message({'to': 'a'}).ok
+    graph = client(requests.ReadTimeout('slow'), OK)
+    result = graph.send_message({'to': 'a'})
+    assert not result.ok and result.retryable and len(graph.session.calls) == 1
+
+
+def test_retries_stop_at_max_retries(sleeps):
+    graph = client(*[FakeResponse(429)] * 3, max_retries=2)
+    result = graph.send_message({'to': 'a'})
+    assert not result.ok and result.attempts == 3
+    assert len(sleeps) == 2
+
+
+def test_permanent_errors_are_not_retried(sleeps):
+    graph = client(FakeResponse(400, {'error': {'code': 131026, 'message': 'undeliverable'}}))
+    result = graph.send_message({'to': 'a'})
+    assert not result.ok and not result.retryable and result.error_code == 131026
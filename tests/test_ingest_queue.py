@@ -0,0 +1,125 @@
+import sqlite3
+import time
+from whatsapp.dispatcher import KeyedDispatcher
+from whatsapp.ingest_queue import MAX_ATTEMPTS, IngestQueue
+
+
+def text_payload(sender, body):
+    message = {'from': sender, 'id': f'wamid.{sender}.{body}', 'type': 'text', 'text': {'body': body}}
+    return {'entry': [{'changes': [{'value': {'messages': [message]}}]}]}
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_finished_job_is_removed_from_the_journal(tmp_path):
+    handled = []
+    queue = IngestQueue(str(tmp_path / 'q.db'), KeyedDispatcher(handled.append, workers=2, coalesce_window=0))
+    queue.start()
+    queue.enqueue_many([text_payload('a', 'one'), text_payload('b', 'two')])
+    assert wait_until(lambda: queue.depth() == {})
+    assert len(handled) == 2
+
+
+def test_failing_job_is_retried_then_marked_failed(tmp_path):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        raise RuntimeError('LLM down')
+
+    queue = IngestQueue(str(tmp_path / 'q.db'), KeyedDispatcher(handler, workers=1, coalesce_window=0), retry_delay=0)
+    queue.start()
+    job_id = queue.enqueue(text_payload('a', 'hi'))
+    assert wait_until(lambda: queue.depth() == {'failed': 1})
+    assert len(calls) == MAX_ATTEMPTS
+    status, attempts, error = sqlite3.connect(str(tmp_path / 'q.db')).execute(
+        'SELECT status, attempts, last_error FROM ingest_jobs WHERE id = ?', (job_id,)).fetchone()
+    assert (status, attempts) == ('failed', MAX_ATTEMPTS)
+    assert 'LLM down' in error
+
+
+def test_job_that_fails_once_succeeds_on_retry(tmp_path):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError('temporary')
+
+    queue = IngestQueue(str(tmp_path / 'q.db'), KeyedDispatcher(handler, workers=1, coalesce_window=0), retry_delay=0)
+    queue.start()
+    queue.enqueue(text_payload('a', 'hi'))
+    assert wait_until(lambda: queue.depth() == {})
+    assert len(calls) == 2
+
+
+def test_unfinished_jobs_are_replayed_after_restart(tmp_path):
+    path = str(tmp_path / 'q.db')
+    # Pichla process: job claim hui ('processing') aur process crash
+    crashed = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0), lease_seconds=0)
+    crashed.enqueue(text_payload('a', 'one'))
+    crashed.enqueue(text_payload('a', 'two'))
+    with crashed._lock:
+        crashed._claim()
+    assert crashed.depth() == {'pending': 1, 'processing': 1}
+
+    handled = []
+    queue = IngestQueue(path, KeyedDispatcher(lambda payload: handled.append(payload), workers=1, coalesce_window=0))
+    queue.start()
+    assert wait_until(lambda: queue.depth() == {})
+    bodies = [p['entry'][0]['changes'][0]['value']['messages'][0]['text']['body'] for p in handled]
+    assert bodies == ['one', 'two']
+
+
+def test_live_siblings_jobs_are_not_recovered(tmp_path):
+    path = str(tmp_path / 'q.db')
+    # Doosra gunicorn worker zinda hai aur job chala raha hai (lease abhi baaki)
+    sibling = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0), lease_seconds=60)
+    sibling.enqueue(text_payload('a', 'one'))
+    with sibling._lock:
+        assert sibling._claim() is not None
+
+    queue = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0))
+    assert queue.recover() == 0
+    with queue._lock:
+        assert queue._claim() is None
+    assert queue.depth() == {'processing': 1}
+
+
+def test_two_connections_never_claim_the_same_job(tmp_path):
+    path = str(tmp_path / 'q.db')
+    first = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0))
+    second = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0))
+    for i in range(4):
+        first.enqueue(text_payload('a', str(i)))
+    claimed = []
+    for queue in (first, second, first, second, first):
+        with queue._lock:
+            job = queue._claim()
+        if job:
+            claimed.append(job[0])
+    assert len(claimed) == 4
+    assert len(set(claimed)) == 4
+
+
+def test_failed_job_waits_for_its_backoff(tmp_path):
+    path = str(tmp_path / 'q.db')
+    queue = IngestQueue(path, KeyedDispatcher(lambda payload: None, workers=1, coalesce_window=0), retry_delay=30)
+    job_id = queue.enqueue(text_payload('a', 'hi'))
+    with queue._lock:
+        _, _, attempts = queue._claim()
+    before = time.time()
+    queue._finish(job_id, attempts, 'LLM down')
+    next_attempt_at, = sqlite3.connect(path).execute(
+        'SELECT next_attempt_at FROM ingest_jobs WHERE id = ?', (job_id,)).fetchone()
+    assert next_attempt_at >= before + 30
+    with queue._lock:
+        assert queue._claim() is None
+        assert queue._next_due() > 25
@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from openai_agent.intents import classify
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'intent_corpus.json')
+with open(CORPUS_PATH, encoding='utf-8') as f:
+    CORPUS = json.load(f)
+
+
+def routed_intents(text):
+    # Handler cancel sirf poore-message match par karta hai
+    route = classify(text)
+    return {i for i in route.intents if i != 'cancel' or route.confidence('cancel') >= 1.0}
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['text'] for case in CORPUS])
+def test_labelled_corpus(case):
+    assert routed_intents(case['text']) == set(case['intents'])
+    assert classify(case['text']).language == case['language']
+
+
+def test_keywords_match_whole_words_only():
+    assert not classify('totally amazing food').has('receipt')
+    assert classify('total kitna hua').has('receipt')
+
+
+def test_cancel_confidence_is_full_only_for_a_whole_cancel_request():
+    assert classify('Cancel!').confidence('cancel') == 1.0
+    assert classify('order cancel karna hai').intents == {'cancel': 1.0}
+    assert classify('cancel kar do').intents == {'cancel': 1.0}
+    assert 0 < classify('cancel mat karo').confidence('cancel') < 1.0
+    assert 0 < classify('nahi, address galat hai').confidence('cancel') < 1.0
+
+
+@pytest.mark.parametrize('text, intent', [
+    ('can i get 3 chicken shawarmas', 'order_interest'),
+    ('do shawarme aur ek pepsi', 'order_interest'),
+    ('kuch khane ko mangwana hai', 'order_interest'),
+    ('2 zinger', 'order_interest'),
+    ('بریانی ملے گی؟', 'order_interest'),
+    ('okk', 'affirmative'),
+    ('sure', 'affirmative'),
+    ('ji bilkul', 'affirmative'),
+    ('ٹھیک ہے', 'affirmative'),
+    ('rider kahan hai?', 'receipt'),
+])
+def test_inflections_catalog_items_and_common_replies(text, intent):
+    assert classify(text).has(intent)
+
+
+def test_short_keywords_are_not_inflected():
+    assert not classify('oks').has('affirmative')
+    assert not classify('hans').has('affirmative')
+
+
+def test_longest_phrase_wins():
+    route = classify('order ka status')
+    assert route.has('receipt', min_confidence=1.0)
+
+
+@pytest.mark.parametrize('text, language', [
+    ('english please', 'English'),
+    ('urdu mein baat karein', 'Urdu'),
+    ('آرڈر کرنا ہے', 'Urdu'),
+    ('', 'Roman Urdu'),
+])
+def test_language(text, language):
+    assert classify(text).language == language
@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+from whatsapp import send_message
+from whatsapp.media_cache import MediaCache
+from whatsapp.send_message import SendResult, send_whatsapp_document
+
+
+class FakeGraph:
+    def __init__(self, rejected=()):
+        self.uploads = 0
+        self.sent = []
+        self.rejected = set(rejected)
+        self.lock = threading.Lock()
+
+    def upload_media(self, filename, content, mime_type):
+        time.sleep(0.1)  # asal upload ki tarah sust, taake threads ek sath miss karein
+        with self.lock:
+            self.uploads += 1
+            return SendResult(ok=True, status_code=200, media_id=f'media-{self.uploads}')
+
+    def send_message(self, payload):
+        media_id = payload['document']['id']
+        if media_id in self.rejected:
+            return SendResult(ok=False, status_code=400, error_code=131053, error_message='invalid media')
+        with self.lock:
+            self.sent.append(media_id)
+        return SendResult(ok=True, status_code=200, message_id='wamid.1')
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / 'menu.pdf'
+    path.write_bytes(b'%PDF-1.4 menu')
+    return str(path)
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    cache = MediaCache(str(tmp_path / 'media.db'))
+    monkeypatch.setattr(send_message, 'get_media_cache', lambda: cache)
+    return cache
+
+
+def test_concurrent_misses_upload_once(monkeypatch, cache, pdf):
+    graph = FakeGraph()
+    monkeypatch.setattr(send_message, 'get_graph_client', lambda: graph)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(send_whatsapp_document('a', pdf))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results) and len(results) == 8
+    assert graph.uploads == 1
+    assert graph.sent == ['media-1'] * 8
+
+
+def test_rejected_media_id_is_uploaded_again_once(monkeypatch, cache, pdf):
+    graph = FakeGraph(rejected={'stale'})
+    monkeypatch.setattr(send_message, 'get_graph_client', lambda: graph)
+    cache.put(cache.key_for(pdf), 'stale')
+    assert send_whatsapp_document('a', pdf)
+    assert send_whatsapp_document('b', pdf)
+    assert graph.uploads == 1
+    assert cache.get(cache.key_for(pdf)) == 'media-1'
+
+
+def test_changed_file_gets_a_new_key(cache, pdf):
+    before = cache.key_for(pdf)
+    with open(pdf, 'ab') as f:
+        f.write(b' v2')
+    assert cache.key_for(pdf) != before
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = MediaCache(str(tmp_path / 'media.db'), ttl=-1)
+    cache.put('k', 'media-1')
+    assert cache.get('k') is None
@@ -0,0 +1,77 @@
+from openai_agent import memory
+from openai_agent.memory import add_turns, load_memory, memory_tokens, turns_to_fold, _compact, _fold
+from whatsapp.session_store import MemorySessionStore
+
+
+def pair(i, words=20):
+    return [{'role': 'user', 'content': f'message {i} ' + 'khana ' * words},
+            {'role': 'assistant', 'content': f'reply {i} ' + 'theek ' * words}]
+
+
+def conversation(pairs, words=20):
+    return {'summary': '', 'turns': [t for i in range(pairs) for t in pair(i, words)]}
+
+
+def test_turns_are_not_capped_by_count():
+    raw = {'summary': '', 'turns': []}
+    for i in range(30):
+        raw = add_turns(raw, [{'role': 'user', 'content': 'ok'}, {'role': 'assistant', 'content': 'ji'}])
+    assert len(raw['turns']) == 60
+
+
+def test_old_format_list_is_loaded():
+    assert load_memory([{'role': 'user', 'content': 'hi'}]) == {'summary': '', 'turns': [{'role': 'user', 'content': 'hi'}]}
+
+
+def test_fold_count_keeps_pairs_and_the_latest_exchange():
+    convo = conversation(20)
+    k = turns_to_fold(convo, budget=600)
+    assert k % 2 == 0
+    assert 0 < k <= len(convo['turns']) - 2
+    assert turns_to_fold(conversation(1), budget=600) == 0
+
+
+def test_hard_cap_folds_evicted_turns_into_the_summary():
+    raw = conversation(40)
+    raw = add_turns(raw, pair(99), budget=600)
+    assert memory_tokens(raw) < 600 * memory.MEMORY_HARD_LIMIT_RATIO
+    assert raw['turns'][-1]['content'].startswith('reply 99')
+    # Nikle hue turns summary mein (aakhri nikla turn zaroor)
+    evicted = 80 + 2 - len(raw['turns'])
+    assert f'message {(evicted - 1) // 2}' in raw['summary'] or f'reply {(evicted - 1) // 2}' in raw['summary']
+
+
+def test_compaction_replaces_old_turns_with_the_llm_summary(monkeypatch):
+    monkeypatch.setattr(memory, 'summarize', lambda summary, turns, language: f'{len(turns)} turns folded')
+    store = MemorySessionStore()
+    store.set('a', conversation(20))
+    _compact(store, 'a', 'Roman Urdu')
+    compacted = store.get('a')
+    assert compacted['summary'].endswith('turns folded')
+    assert memory_tokens(compacted) <= 600
+    assert compacted['turns'][-1]['content'].startswith('reply 19')
+
+
+def test_fold_survives_turns_added_and_folded_meanwhile():
+    turns = conversation(4)['turns']
+    folded = turns[:4]
+    # Summary likhte waqt kisi aur ne pehle 2 turns fold kar diye aur naya pair aa gaya
+    current = {'summary': 'other', 'turns': turns[2:] + pair(9)}
+    result = _fold(current, folded, 'new summary')
+    assert result['summary'] == 'new summary'
+    assert result['turns'] == turns[4:] + pair(9)
+
+
+def test_fold_does_not_resurrect_a_deleted_session():
+    assert _fold(None, pair(0), 'summary') is None
+
+
+def test_failed_summary_keeps_the_turns(monkeypatch):
+    def fail(*args):
+        raise RuntimeError('LLM down')
+
+    monkeypatch.setattr(memory, 'summarize', fail)
+    store = MemorySessionStore()
+    store.set('a', conversation(20))
+    _compact(store, 'a', 'Roman Urdu')
+    assert len(store.get('a')['turns']) == 40
@@ -0,0 +1,58 @@
+import json
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from db.migrations import backfill_order_items, migrate, widen_order_items_column
+from db.models import Order, OrderItem, SessionLocal, ensure_indexes
+
+
+@pytest.fixture
+def old_engine(tmp_path):
+    # Pehle wala schema: orders bina index aur items VARCHAR(1000)
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE orders (id INTEGER PRIMARY KEY, name VARCHAR(100), address VARCHAR(255), '
+            'phone VARCHAR(20), payment_type VARCHAR(20), whatsapp_number VARCHAR(50), items VARCHAR(1000), '
+            'notes VARCHAR(255), status VARCHAR(20), created_at DATETIME)'
+        ))
+    return engine
+
+
+@pytest.fixture
+def orders():
+    db = SessionLocal()
+    db.query(OrderItem).delete()
+    db.query(Order).delete()
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_missing_indexes_are_created_once(old_engine):
+    assert 'ix_orders_whatsapp_number_created_at' in ensure_indexes(old_engine)
+    names = {ix['name'] for ix in inspect(old_engine).get_indexes('orders')}
+    assert 'ix_orders_whatsapp_number_created_at' in names
+    assert ensure_indexes(old_engine) == []
+
+
+def test_sqlite_items_column_is_left_alone(old_engine):
+    # SQLite VARCHAR ki length enforce nahi karta, ALTER ki zaroorat nahi
+    assert widen_order_items_column(old_engine) is False
+
+
+def test_backfill_creates_item_rows_once(orders):
+    items = json.dumps([{'name': 'chicken shawarma', 'quantity': 2}, {'name': 'Lebanese Shawarma'}])
+    orders.add_all([Order(id=1, items=items), Order(id=2, items='not json'), Order(id=3, items='[]')])
+    orders.commit()
+    assert backfill_order_items(batch_size=1) == 1
+    rows = orders.query(OrderItem.order_id, OrderItem.name, OrderItem.quantity, OrderItem.line_total).order_by(OrderItem.id).all()
+    assert rows == [(1, 'Chicken Shawarma', 2, 980), (1, 'Lebanese Shawarma', 1, 500)]
+    assert backfill_order_items() == 0
+
+
+def test_migrate_is_idempotent(old_engine, orders):
+    first = migrate(old_engine)
+    assert 'ix_orders_whatsapp_number_created_at' in first['indexes_created']
+    assert set(inspect(old_engine).get_table_names()) >= {'orders', 'order_items', 'sheet_outbox', 'conversations'}
+    second = migrate(old_engine)
+    assert (second['columns_added'], second['indexes_created'], second['orders_backfilled']) == ([], [], 0)
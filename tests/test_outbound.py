@@ -0,0 +1,105 @@
+import time
+from whatsapp import outbound
+from whatsapp.outbound import OutboundDispatcher, RateLimiter, merge_outbound_texts
+from whatsapp.outbound_journal import OutboundJournal
+from whatsapp.send_message import SendResult
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def fake_graph(monkeypatch, latency=0.0):
+    sent = []
+
+    def send(to, message):
+        time.sleep(latency)
+        sent.append((to, message))
+        return SendResult(ok=True)
+
+    monkeypatch.setattr(outbound, 'send_whatsapp_message', send)
+    return sent
+
+
+def text(message, futures=None):
+    return {'type': 'text', 'message': message, 'futures': futures or [], 'to': 'a'}
+
+
+def test_rate_limiter_spaces_sends_beyond_the_burst():
+    limiter = RateLimiter(rate=50, burst=1)
+    started = time.monotonic()
+    waited = sum(limiter.acquire() for _ in range(6))
+    assert time.monotonic() - started >= 0.09
+    assert waited > 0
+
+
+def test_zero_rate_is_unlimited():
+    limiter = RateLimiter(rate=0)
+    assert all(limiter.acquire() == 0.0 for _ in range(1000))
+
+
+def test_back_to_back_texts_merge_until_a_document():
+    document = {'type': 'document', 'file_path': 'menu.pdf', 'futures': [], 'to': 'a'}
+    merged = merge_outbound_texts([text('one'), text('two'), document, text('three')])
+    assert [p.get('message') for p in merged] == ['one\n\ntwo', None, 'three']
+
+
+def test_merged_text_keeps_every_future_and_journal_id():
+    merged = merge_outbound_texts([dict(text('one', ['f1']), journal_ids=[1]), dict(text('two', ['f2']), journal_ids=[2])])
+    assert merged[0]['futures'] == ['f1', 'f2']
+    assert merged[0]['journal_ids'] == [1, 2]
+
+
+def test_texts_over_the_whatsapp_limit_are_not_merged():
+    long = 'x' * (outbound.MAX_TEXT_LENGTH - 1)
+    assert len(merge_outbound_texts([text(long), text('two')])) == 2
+
+
+def test_coalescing_window_sends_one_message(monkeypatch):
+    sent = fake_graph(monkeypatch)
+    dispatcher = OutboundDispatcher(workers=1, rate_limit=0, coalesce_window=0.1, mode='queue')
+    futures = [dispatcher.send_text('a', 'confirm'), dispatcher.send_text('a', 'receipt')]
+    assert all(f.result(timeout=5) for f in futures)
+    assert sent == [('a', 'confirm\n\nreceipt')]
+
+
+def test_default_window_does_not_merge(monkeypatch):
+    sent = fake_graph(monkeypatch)
+    dispatcher = OutboundDispatcher(workers=1, rate_limit=0, mode='queue')
+    futures = [dispatcher.send_text('a', 'confirm'), dispatcher.send_text('a', 'receipt')]
+    assert all(f.result(timeout=5) for f in futures)
+    assert sent == [('a', 'confirm'), ('a', 'receipt')]
+
+
+def test_queued_send_is_journaled_until_graph_answers(monkeypatch, tmp_path):
+    fake_graph(monkeypatch, latency=0.2)
+    journal = OutboundJournal(str(tmp_path / 'q.db'))
+    dispatcher = OutboundDispatcher(workers=1, rate_limit=0, coalesce_window=0, mode='queue', journal=journal)
+    future = dispatcher.send_text('a', 'hello')
+    assert journal.depth() == 1
+    assert future.result(timeout=5)
+    assert wait_until(lambda: journal.depth() == 0)
+
+
+def test_sends_of_a_stopped_worker_are_resent(monkeypatch, tmp_path):
+    sent = fake_graph(monkeypatch)
+    path = str(tmp_path / 'q.db')
+    # Pichla worker: jawab journal mein likha aur Graph tak bhejne se pehle mar gaya
+    OutboundJournal(path, lease_seconds=0).add('a', {'type': 'text', 'message': 'lost reply'})
+
+    journal = OutboundJournal(path, lease_seconds=0.3)
+    dispatcher = OutboundDispatcher(workers=1, rate_limit=0, coalesce_window=0, mode='queue', journal=journal)
+    dispatcher.send_text('b', 'fresh')
+    assert wait_until(lambda: ('a', 'lost reply') in sent and journal.depth() == 0)
+    assert sent.count(('a', 'lost reply')) == 1
+
+
+def test_live_workers_sends_are_not_taken_over(tmp_path):
+    path = str(tmp_path / 'q.db')
+    OutboundJournal(path, lease_seconds=60).add('a', {'type': 'text', 'message': 'in flight'})
+    assert OutboundJournal(path).claim_expired() == []
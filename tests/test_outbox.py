@@ -0,0 +1,160 @@
+import datetime
+import json
+import pytest
+from sqlalchemy import create_engine, text
+from benchmarks.fakes import FakeGspreadClient
+from db.models import SessionLocal, SheetOutbox, SheetRowIndex, ensure_columns
+from sheets import google_sheets, outbox, row_index
+from sheets.google_sheets import SHEET_HEADERS, STATUS_COL, SheetHeaderError, format_order_row
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    db = SessionLocal()
+    db.query(SheetOutbox).delete()
+    db.query(SheetRowIndex).delete()
+    db.commit()
+    db.close()
+    monkeypatch.setattr(row_index, '_rows', {})
+    monkeypatch.setattr(row_index, '_misses', row_index.OrderedDict())
+    monkeypatch.setattr(row_index, '_loaded', False)
+    monkeypatch.setattr(row_index, '_last_rebuild', None)
+    worksheet = FakeGspreadClient().sheet1
+    monkeypatch.setattr(google_sheets, '_worksheet', worksheet)
+    return worksheet
+
+
+def add_pending(order_id, name='Ahmed'):
+    db = SessionLocal()
+    db.add(SheetOutbox(order_id=order_id, row=json.dumps(format_order_row(
+        [name, 'Block 15', '03001234567', '[]', 'Cash', '', '923001234567'], order_id=order_id))))
+    db.commit()
+    db.close()
+
+
+def outbox_statuses():
+    db = SessionLocal()
+    try:
+        return [item.status for item in db.query(SheetOutbox).order_by(SheetOutbox.id)]
+    finally:
+        db.close()
+
+
+def test_flush_appends_pending_rows_in_one_batch(sheet):
+    add_pending(1, 'Ahmed')
+    add_pending(2, 'Sara')
+    assert outbox.flush_once() == 2
+    assert sheet.rows[0] == SHEET_HEADERS
+    assert [row[0] for row in sheet.rows[1:]] == ['Ahmed', 'Sara']
+    assert outbox_statuses() == ['sent', 'sent']
+    assert outbox.flush_once() == 0
+    # Row index se status update, sheet parhe baghair
+    assert row_index.get_row(2) == 3
+    assert outbox.update_sheet_order_status(2, 'delivered') is True
+    assert sheet.rows[2][STATUS_COL - 1] == 'delivered'
+
+
+def test_status_change_while_pending_is_applied_in_the_outbox(sheet):
+    add_pending(1)
+    assert outbox.update_sheet_order_status(1, 'cancelled') is True
+    assert sheet.rows == []
+    outbox.flush_once()
+    assert sheet.rows[1][STATUS_COL - 1] == 'cancelled'
+
+
+def test_status_change_during_the_append_is_not_lost(sheet, monkeypatch):
+    add_pending(1)
+    append_rows = sheet.append_rows
+
+    def racing_append(rows):
+        response = append_rows(rows)
+        if rows and rows[0] != SHEET_HEADERS:
+            # Google call ke dauran customer ne cancel kiya
+            assert outbox.update_sheet_order_status(1, 'cancelled') is True
+        return response
+
+    monkeypatch.setattr(sheet, 'append_rows', racing_append)
+    assert outbox.flush_once() == 1
+    assert sheet.rows[1][STATUS_COL - 1] == 'cancelled'
+    assert outbox_statuses() == ['sent']
+
+
+def test_unexpected_header_keeps_rows_pending(sheet):
+    sheet.rows.append(['Order ID', 'Name'])
+    add_pending(1)
+    with pytest.raises(SheetHeaderError):
+        outbox.flush_once()
+    assert outbox_statuses() == ['pending']
+    assert len(sheet.rows) == 1
+
+
+def test_old_header_is_extended(sheet):
+    sheet.rows.append(SHEET_HEADERS[:-1])
+    add_pending(1)
+    assert outbox.flush_once() == 1
+    assert sheet.rows[0] == SHEET_HEADERS
+
+
+def test_missing_order_reads_the_column_once(sheet):
+    sheet.rows.append(SHEET_HEADERS)
+    client = sheet.client
+    assert google_sheets.update_order_status_in_sheet(999, 'delivered') is False
+    assert google_sheets.update_order_status_in_sheet(999, 'delivered') is False
+    assert client.stats['col_values'] == 1
+
+
+def test_second_flusher_does_not_append_rows_claimed_by_the_first(sheet, monkeypatch):
+    add_pending(1)
+    add_pending(2)
+    append_rows = sheet.append_rows
+    nested = []
+
+    def append_while_another_worker_flushes(rows):
+        if rows and rows[0] != SHEET_HEADERS and not nested:
+            # Doosre gunicorn worker ka flusher isi waqt chala
+            nested.append(outbox.flush_once())
+        return append_rows(rows)
+
+    monkeypatch.setattr(sheet, 'append_rows', append_while_another_worker_flushes)
+    assert outbox.flush_once() == 2
+    assert nested == [0]
+    assert [row[0] for row in sheet.rows[1:]] == ['Ahmed', 'Ahmed']
+    assert len(sheet.rows) == 3
+    assert outbox_statuses() == ['sent', 'sent']
+
+
+def test_stale_sending_lease_is_reclaimed(sheet):
+    add_pending(1)
+    db = SessionLocal()
+    item = db.query(SheetOutbox).one()
+    item.status = 'sending'
+    item.claimed_by = 'dead-worker'
+    item.claimed_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=outbox.CLAIM_TIMEOUT + 1)
+    db.commit()
+    db.close()
+    assert outbox.flush_once() == 1
+    assert outbox_statuses() == ['sent']
+
+
+def test_fresh_sending_lease_is_left_alone(sheet):
+    add_pending(1)
+    db = SessionLocal()
+    item = db.query(SheetOutbox).one()
+    item.status = 'sending'
+    item.claimed_by = 'live-worker'
+    item.claimed_at = datetime.datetime.utcnow()
+    db.commit()
+    db.close()
+    assert outbox.flush_once() == 0
+    assert sheet.rows == []
+
+
+def test_ensure_columns_adds_claim_columns_to_an_old_outbox_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE sheet_outbox (id INTEGER PRIMARY KEY, order_id INTEGER, row TEXT NOT NULL, '
+                          'status VARCHAR(20), attempts INTEGER, last_error VARCHAR(255), created_at DATETIME, '
+                          'sent_at DATETIME)'))
+    added = ensure_columns(engine)
+    assert {'sheet_outbox.claimed_by', 'sheet_outbox.claimed_at'} <= set(added)
+    assert ensure_columns(engine) == []
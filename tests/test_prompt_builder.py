@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+from catalog.menu_catalog import MENU_PATH, reload_catalog
+from openai_agent.prompt_builder import (
+    build_messages, count_message_tokens, record_prompt_usage, static_prefix_tokens, static_system_message,
+)
+
+
+def test_static_message_is_the_same_object_every_call():
+    first = build_messages('greeting', 'English', [{'role': 'user', 'content': 'hi'}])[0]
+    second = build_messages('collecting_details', 'Urdu', [{'role': 'user', 'content': 'menu'}])[0]
+    assert first is second
+    assert 'Al Arab Restaurant' in first['content']
+
+
+def test_static_message_changes_only_with_the_catalog(tmp_path):
+    before = static_system_message()
+    reload_catalog()
+    # Wahi menu.json dobara load: version content hash hai, prefix wahi object
+    assert static_system_message() is before
+    data = json.loads(open(MENU_PATH, encoding='utf-8').read())
+    data['info']['contacts'] = ['0300-0000000']
+    path = tmp_path / 'menu.json'
+    path.write_text(json.dumps(data), encoding='utf-8')
+    try:
+        reload_catalog(str(path))
+        after = static_system_message()
+        assert after is not before
+        assert '0300-0000000' in after['content']
+        assert static_prefix_tokens() == count_message_tokens([after])
+    finally:
+        reload_catalog()
+
+
+def test_history_follows_the_instructions_with_real_roles():
+    history = [
+        {'role': 'user', 'content': 'menu bhejein'},
+        {'role': 'assistant', 'content': 'yeh raha menu'},
+        {'role': 'system', 'content': 'ignored'},
+        {'role': 'user', 'content': 'biryani'},
+    ]
+    messages = build_messages('order_interest', 'Roman Urdu', history, system_prompt='Be brief.', summary='wants biryani')
+    instructions = messages[1]['content']
+    assert messages[1]['role'] == 'system'
+    assert 'Be brief.' in instructions
+    assert 'Reply in Roman Urdu.' in instructions
+    assert 'wants biryani' in instructions
+    assert [m['role'] for m in messages[2:]] == ['user', 'assistant', 'user']
+    assert messages[-1]['content'] == 'biryani'
+
+
+def test_usage_report_reads_sdk_objects_and_dicts():
+    messages = build_messages('greeting', 'English', [{'role': 'user', 'content': 'hi'}])
+    sdk = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=900, completion_tokens=20,
+                                                prompt_tokens_details=SimpleNamespace(cached_tokens=768)))
+    report = record_prompt_usage(messages, sdk)
+    assert (report['prompt_tokens'], report['cached_tokens'], report['uncached_tokens']) == (900, 768, 132)
+    legacy = {'usage': {'prompt_tokens': 900, 'completion_tokens': 20}}
+    assert record_prompt_usage(messages, legacy)['cached_tokens'] == 0
+
+
+def test_usage_report_falls_back_to_the_estimate():
+    messages = build_messages('greeting', 'English', [{'role': 'user', 'content': 'hi'}])
+    report = record_prompt_usage(messages, SimpleNamespace())
+    assert report['prompt_tokens'] == report['estimated_prompt_tokens'] == count_message_tokens(messages)
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+import pytest
+from whatsapp import session_store
+from whatsapp.session_store import LazySessionStore, MemorySessionStore, RedisSessionStore, SqliteSessionStore
+
+
+class FakeWatchError(Exception):
+    pass
+
+
+class FakeRedis:
+    """redis.Redis ka chhota sa hissa jo RedisSessionStore use karta hai: get/set/delete + WATCH pipeline."""
+
+    def __init__(self):
+        self.data = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        with self.lock:
+            self.data[name] = value
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def delete(self, name):
+        with self.lock:
+            self.data.pop(name, None)
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.watched = {}
+        self.commands = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, name):
+        self.watched[name] = self.client.versions.get(name, 0)
+
+    def get(self, name):
+        return self.client.get(name)
+
+    def multi(self):
+        self.commands = []
+
+    def set(self, name, value, ex=None):
+        self.commands.append(('set', name, value))
+
+    def delete(self, name):
+        self.commands.append(('delete', name, None))
+
+    def execute(self):
+        with self.client.lock:
+            if any(self.client.versions.get(n, 0) != v for n, v in self.watched.items()):
+                raise FakeWatchError()
+            for op, name, value in self.commands:
+                if op == 'set':
+                    self.client.data[name] = value
+                else:
+                    self.client.data.pop(name, None)
+                self.client.versions[name] = self.client.versions.get(name, 0) + 1
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySessionStore(ttl=60)
+    if request.param == 'sqlite':
+        return SqliteSessionStore(str(tmp_path / 'sessions.db'), 'session', ttl=60)
+    return RedisSessionStore(FakeRedis(), 'session', ttl=60, watch_error=FakeWatchError)
+
+
+def test_dict_interface(store):
+    store['a'] = {'state': 'greeting'}
+    assert store['a'] == {'state': 'greeting'}
+    assert 'a' in store and 'b' not in store
+    assert store.get('b', 'x') == 'x'
+    assert store.pop('a') == {'state': 'greeting'}
+    assert store.pop('a', None) is None
+    with pytest.raises(KeyError):
+        store['a']
+
+
+def test_update_returning_none_deletes_the_key(store):
+    store.set('a', {'turns': []})
+    assert store.update('a', lambda current: None) is None
+    assert 'a' not in store
+    assert store.update('a', lambda current: current or {'turns': [1]}) == {'turns': [1]}
+
+
+def test_concurrent_updates_are_not_lost(store):
+    store.set('counter', 0)
+
+    def bump():
+        for _ in range(50):
+            store.update('counter', lambda n: n + 1)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get('counter') == 200
+
+
+def test_redis_update_retries_when_the_key_changes_under_watch():
+    client = FakeRedis()
+    store = RedisSessionStore(client, 'session', watch_error=FakeWatchError)
+    store.set('a', 1)
+    calls = []
+
+    def fn(current):
+        calls.append(current)
+        if len(calls) == 1:
+            client.set('session:a', '10')  # doosre worker ka write WATCH aur EXEC ke beech
+        return current + 1
+
+    assert store.update('a', fn) == 11
+    assert calls == [1, 10]
+    assert store.get('a') == 11
+
+
+def test_sqlite_updates_are_atomic_across_connections(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    first = SqliteSessionStore(path, 'session')
+    second = SqliteSessionStore(path, 'session')
+    first.set('a', [])
+
+    def slow_append(current):
+        # Yeh transaction khuli hai: doosre connection ka update intezar kare, overwrite na kare
+        time.sleep(0.2)
+        return current + ['first']
+
+    thread = threading.Thread(target=first.update, args=('a', slow_append))
+    thread.start()
+    time.sleep(0.05)
+    second.update('a', lambda current: current + ['second'])
+    thread.join()
+    assert sorted(first.get('a')) == ['first', 'second']
+
+
+def test_sqlite_namespaces_and_ttl_are_separate(tmp_path):
+    path = str(tmp_path / 'sessions.db')
+    sessions = SqliteSessionStore(path, 'session', ttl=60)
+    languages = SqliteSessionStore(path, 'language', ttl=-1)  # foran expire
+    sessions.set('a', 'collecting_details')
+    languages.set('a', 'English')
+    assert sessions.get('a') == 'collecting_details'
+    assert languages.get('a') is None
+
+
+def test_lazy_store_creates_nothing_until_first_use(monkeypatch, tmp_path):
+    path = tmp_path / 'sessions.db'
+    monkeypatch.setattr(session_store.Config, 'SESSION_BACKEND', 'sqlite')
+    monkeypatch.setattr(session_store.Config, 'SESSION_DB_PATH', str(path))
+    store = LazySessionStore('session')
+    assert not os.path.exists(path)
+    store.set('a', 1)
+    assert os.path.exists(path)
+    assert store.blocking and store.get('a') == 1
@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+from logging_config import get_logger
+from metrics import timed
+
+logger = get_logger(__name__)
+
+# Startup warmup: module import par koi network/DB kaam nahi hota (sab clients lazy hain);
+# server bind hone ke baad yeh background thread DB tables, OpenAI module, Graph session,
+# Google Sheet handle aur menu catalog pehle se tayyar kar deta hai, taake pehle customer
+# ko yeh intezar na karna pare. Koi step fail ho to sirf log; woh client pehli call par
+# dobara koshish karta hai. WARMUP=0 par band (sab kuch pehli zarurat par).
+
+WARMUP = os.getenv('WARMUP', '1').lower() not in ('0', 'false', 'no', 'off')
+
+_thread = None
+_done = threading.Event()
+_start_lock = threading.Lock()
+
+
+def _steps():
+    from db.models import ensure_db
+    from openai_agent.llm import get_openai
+    from whatsapp.send_message import get_graph_client
+    from sheets.google_sheets import get_worksheet
+    from catalog.menu_catalog import get_catalog
+    return [('db', ensure_db), ('openai', get_openai), ('graph', get_graph_client),
+            ('sheets', get_worksheet), ('catalog', get_catalog)]
+
+
+def run_warmup():
+    start = time.perf_counter()
+    try:
+        for name, step in _steps():
+            try:
+                with timed(f'warmup.{name}'):
+                    step()
+            except Exception as e:
+                logger.warning('Warmup %s failed: %s', name, e)
+        logger.info('Warmup finished in %.2fs', time.perf_counter() - start)
+    finally:
+        _done.set()
+
+
+def start_warmup():
+    """Background warmup ek dafa start karta hai; dobara call (har request par bhi) sasti hai."""
+    global _thread
+    if _thread is not None or not WARMUP:
+        return
+    with _start_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=run_warmup, name='warmup', daemon=True)
+            _thread.start()
+
+
+def wait_for_warmup(timeout=None):
+    if _thread is None:
+        return True
+    return _done.wait(timeout)
@@ -0,0 +1,166 @@
+import json
+from urllib.parse import parse_qs
+from config import Config
+from whatsapp.handler import handle_incoming_message_async
+from whatsapp.ingest_queue import get_ingest_queue
+from whatsapp.dedup import get_seen_index
+from whatsapp.dispatcher import AsyncKeyedDispatcher, sender_of, split_payload
+from whatsapp.intake import claim_messages, duplicate_response, inline_response, queued_response, release_claims
+from whatsapp.outbound import get_async_outbound_dispatcher
+from whatsapp.send_message import close_async_graph_client
+from openai_agent.llm import close_async_session
+from sheets.outbox import start_sheet_outbox
+from db.conversation_log import get_conversation_logger
+from logging_config import get_logger, should_dump, dropped_log_records
+from metrics import REGISTRY, render_metrics
+from warmup import start_warmup
+from aio import run_blocking, use_async_io
+
+logger = get_logger(__name__)
+
+# ASGI entry point (Flask webhook.py ka asyncio mutabadil, Flask import nahi hota): wahi routes
+# aur wahi handler logic, lekin har conversation event loop par ek coroutine hai, OS thread
+# nahi. OpenAI aur Graph API async clients (shared keep-alive pools) se; SQLAlchemy, SQLite
+# (dedup, ingest journal) aur gspread ka blocking kaam bounded executor (BLOCKING_WORKERS) par.
+# Ek process ASYNC_MAX_CONVERSATIONS tak conversations ek sath sambhalta hai.
+#
+# Run: uvicorn whatsapp.asgi:app --host 0.0.0.0 --port 5000   (ya python -m whatsapp.asgi)
+
+dispatcher = AsyncKeyedDispatcher(handle_incoming_message_async)
+
+REGISTRY.gauge('ingest_queue_depth', lambda: dispatcher.get_stats()['queued'],
+               'Incoming messages waiting for a worker')
+REGISTRY.gauge('outbound_queue_depth', lambda: get_async_outbound_dispatcher().get_stats()['queued'],
+               'Replies waiting in per-customer send queues')
+REGISTRY.gauge('conversation_log_backlog', lambda: get_conversation_logger().get_stats()['backlog'],
+               'Transcript rows not yet written to the database')
+REGISTRY.gauge('log_records_dropped', dropped_log_records, 'Log records dropped because the log queue was full')
+REGISTRY.gauge('active_conversations', lambda: dispatcher.get_stats()['active_customers'],
+               'Customers whose messages are being handled on the event loop')
+
+_started = False
+
+
+def _startup():
+    # Event loop par ek dafa (lifespan startup, warna pehli request): dispatchers is loop se
+    # bandhte hain, phir warmup, sheet outbox flusher aur journal ke pending jobs ka replay
+    global _started
+    if _started:
+        return
+    _started = True
+    dispatcher.start()
+    get_async_outbound_dispatcher().dispatcher.start()
+    start_warmup()
+    start_sheet_outbox()
+    if Config.INGEST_MODE == 'queue':
+        get_ingest_queue(dispatcher).start()
+
+
+async def _shutdown():
+    await close_async_session()
+    await close_async_graph_client()
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return body
+
+
+async def _respond(send, status, body, content_type='application/json'):
+    if content_type == 'application/json':
+        body = json.dumps(body)
+    body = body.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _verify(query_string):
+    params = parse_qs(query_string.decode())
+    if params.get('hub.verify_token', [None])[0] == Config.VERIFICATION_TOKEN:
+        return 200, params.get('hub.challenge', [''])[0]
+    return 403, 'Verification token mismatch'
+
+
+async def _receive_webhook(body):
+    # webhook.py ke POST jaisa; blocking hisse (dedup, journal) executor par
+    try:
+        data = json.loads(body)
+        if should_dump(logger):
+            logger.debug('Webhook payload: %s', data)
+        payloads = split_payload(data)
+        if not payloads:
+            logger.debug('No messages found in webhook payload')
+            return 200, {'status': 'no messages'}
+        seen = get_seen_index()
+        outcomes, fresh = await run_blocking(claim_messages, seen, payloads)
+        if not fresh:
+            logger.info('Duplicate webhook dropped: %s', [o['id'] for o in outcomes])
+            body, status = duplicate_response(outcomes, seen.get_stats())
+            return status, body
+        if Config.INGEST_MODE == 'queue':
+            queue = get_ingest_queue(dispatcher)
+            try:
+                job_ids = await run_blocking(queue.enqueue_many, [payload for payload, _ in fresh])
+            except Exception:
+                await run_blocking(release_claims, seen, fresh)
+                raise
+            body, status = queued_response(outcomes, fresh, job_ids)
+            return status, body
+        errors = await dispatcher.run_many([(sender_of(payload), payload) for payload, _ in fresh])
+        body, status = await run_blocking(inline_response, seen, outcomes, fresh, errors)
+        return status, body
+    except Exception as e:
+        logger.exception('Webhook error: %s', e)
+        return 400, {'status': 'error', 'error': str(e)}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _startup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await _shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    use_async_io()
+    _startup()
+    method, path = scope['method'], scope['path']
+    if path == '/webhook' and method == 'POST':
+        status, body = await _receive_webhook(await _read_body(receive))
+        await _respond(send, status, body)
+    elif path == '/webhook' and method == 'GET':
+        status, text = _verify(scope.get('query_string', b''))
+        await _respond(send, status, text, 'text/plain; charset=utf-8')
+    elif path == '/ping' and method == 'GET':
+        await _respond(send, 200, 'pong', 'text/plain; charset=utf-8')
+    elif path == '/metrics' and method == 'GET':
+        # Prometheus scrape: per-stage latency histograms, LLM calls/tokens, errors, queue depths
+        await _respond(send, 200, render_metrics(), 'text/plain; version=0.0.4')
+    else:
+        await _respond(send, 404, 'Not Found', 'text/plain; charset=utf-8')
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from metrics import REGISTRY
+
+# Meta timeout par wohi webhook dobara bhejta hai. Yahan har messages[].id ek dafa
+# "claim" hota hai; dobara aaye to drop. Memory index bounded + TTL hai, aur optional
+# sqlite/redis backing se dedup restart aur kai workers ke beech bhi chalta hai.
+
+
+class SeenMessageIndex:
+    def __init__(self, ttl=Config.DEDUP_TTL, max_entries=Config.DEDUP_MAX_ENTRIES, backend=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend
+        self._seen = OrderedDict()  # message_id -> seen_at
+        self._lock = threading.Lock()
+
+    def _claim_local(self, message_id, now):
+        seen_at = self._seen.get(message_id)
+        if seen_at is not None and now - seen_at < self.ttl:
+            return False
+        self._seen[message_id] = now
+        self._seen.move_to_end(message_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return True
+
+    def claim(self, message_id):
+        """
+        Pehli dafa True (process karo), duplicate par False (drop karo).
+        Bina id wale message hamesha process hote hain.
+        """
+        if not message_id:
+            return True
+        now = time.time()
+        with self._lock:
+            first = self._claim_local(message_id, now)
+            if first and self.backend is not None:
+                first = self.backend.claim(message_id, now, self.ttl)
+                if not first:
+                    # Claim doosre worker ka hai: woh release kare to redelivery yahan bhi chal sake
+                    self._seen.pop(message_id, None)
+        REGISTRY.inc('dedup_checks_total')
+        if not first:
+            REGISTRY.inc('dedup_duplicates_total')
+        return first
+
+    def release(self, message_id):
+        # Processing fail hui: claim wapas, taake Meta ki redelivery par yeh message dobara chale
+        if not message_id:
+            return
+        with self._lock:
+            self._seen.pop(message_id, None)
+            if self.backend is not None:
+                self.backend.release(message_id)
+
+    def size(self):
+        with self._lock:
+            return len(self._seen)
+
+    def get_stats(self):
+        # Counters /metrics wale hi (process bhar ke), size is index ki
+        return {'checked': REGISTRY.value('dedup_checks_total'),
+                'duplicates_dropped': REGISTRY.value('dedup_duplicates_total'), 'size': self.size()}
+
+
+class SqliteSeenBackend:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS seen_messages (message_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)')
+        self._last_purge = 0
+
+    def claim(self, message_id, now, ttl):
+        if now - self._last_purge > 300:
+            self._last_purge = now
+            self._conn.execute('DELETE FROM seen_messages WHERE seen_at < ?', (now - ttl,))
+        # INSERT OR IGNORE atomic hai: sirf ek process/worker ko rowcount 1 milega
+        cur = self._conn.execute('INSERT OR IGNORE INTO seen_messages (message_id, seen_at) VALUES (?, ?)', (message_id, now))
+        return cur.rowcount == 1
+
+    def release(self, message_id):
+        self._conn.execute('DELETE FROM seen_messages WHERE message_id = ?', (message_id,))
+
+
+class RedisSeenBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def claim(self, message_id, now, ttl):
+        return bool(self.client.set(f"seen:{message_id}", int(now), nx=True, ex=int(ttl)))
+
+    def release(self, message_id):
+        self.client.delete(f"seen:{message_id}")
+
+
+def _create_backend():
+    if Config.DEDUP_BACKEND == 'sqlite':
+        return SqliteSeenBackend(Config.DEDUP_DB_PATH)
+    if Config.DEDUP_BACKEND == 'redis':
+        import redis
+        return RedisSeenBackend(redis.Redis.from_url(Config.REDIS_URL))
+    return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_seen_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SeenMessageIndex(backend=_create_backend())
+    return _index
+
+
+def get_dedup_stats():
+    return get_seen_index().get_stats()
+
+
+# Scrape index nahi banata (sqlite/redis backend pehle webhook par hi khulta hai)
+REGISTRY.gauge('dedup_index_size', lambda: _index.size() if _index is not None else 0,
+               'Message IDs held in the in-memory seen-message index')
@@ -0,0 +1,352 @@
+import asyncio
+import copy
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from config import Config
+from logging_config import get_logger
+from aio import run_blocking, use_async_io
+
+logger = get_logger(__name__)
+
+# Per-customer dispatcher: ek customer (from_number) ke messages arrival order mein ek-ek
+# kar ke chalte hain, alag customers worker pool par parallel. Optional coalescing window
+# mein aane wale lagatar text messages ek hi turn ban jate hain.
+
+
+def message_of(payload):
+    try:
+        return payload['entry'][0]['changes'][0]['value']['messages'][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def sender_of(payload):
+    message = message_of(payload)
+    return message.get('from') if isinstance(message, dict) else None
+
+
+def split_payload(data):
+    """
+    Meta ek delivery mein kai entries / changes / messages (aur kai customers) bhej sakta hai.
+    Har message ka alag payload banata hai, usi shakal mein (metadata aur us sender ka contact
+    sath), arrival order mein.
+    """
+    if not isinstance(data, dict):
+        return []
+    payloads = []
+    for entry in data.get('entry') or []:
+        for change in entry.get('changes') or []:
+            value = change.get('value') or {}
+            for message in value.get('messages') or []:
+                if not isinstance(message, dict):
+                    continue
+                single = {k: v for k, v in value.items() if k not in ('messages', 'statuses', 'contacts')}
+                contacts = [c for c in value.get('contacts') or [] if c.get('wa_id') == message.get('from')]
+                if contacts:
+                    single['contacts'] = contacts
+                single['messages'] = [message]
+                payloads.append(dict(
+                    {k: v for k, v in data.items() if k != 'entry'},
+                    entry=[dict(
+                        {k: v for k, v in entry.items() if k != 'changes'},
+                        changes=[dict({k: v for k, v in change.items() if k != 'value'}, value=single)],
+                    )],
+                ))
+    return payloads
+
+
+def merge_text_payloads(payloads):
+    """
+    Ek hi sender ke sirf-text payloads ko ek payload mein jorta hai (texts newline se).
+    Koi non-text message ho to list waisi hi wapas.
+    """
+    if len(payloads) < 2:
+        return payloads
+    msgs = []
+    for p in payloads:
+        try:
+            msg = p['entry'][0]['changes'][0]['value']['messages'][0]
+        except (KeyError, IndexError, TypeError):
+            return payloads
+        if msg.get('type') != 'text':
+            return payloads
+        msgs.append(msg)
+    merged = copy.deepcopy(payloads[-1])
+    last = merged['entry'][0]['changes'][0]['value']['messages'][0]
+    last['text']['body'] = '\n'.join(m['text']['body'] for m in msgs)
+    last['coalesced_ids'] = [m.get('id') for m in msgs]
+    return [merged]
+
+
+def plan_turns(batch, merge=None):
+    """
+    Batch [(payload, on_done, arrived_at)] ke turns: [(payload, entries)], entries = batch ke
+    woh items jin ka on_done is turn ke nateeje par hai. Bina merge har message apna turn hai,
+    taake ek message ka error doosre (kamyab) messages par na lage; jore gaye messages ek sath
+    kamyab ya fail. Return: (turns, kitne messages jore gaye).
+    """
+    payloads = [payload for payload, _, _ in batch]
+    if merge:
+        merged = merge(payloads)
+        if len(merged) < len(payloads):
+            return [(payload, batch) for payload in merged], len(payloads) - len(merged)
+    return [(payload, [entry]) for payload, entry in zip(payloads, batch)], 0
+
+
+class KeyedDispatcher:
+    def __init__(self, handler, workers=Config.INGEST_WORKERS, coalesce_window=Config.COALESCE_WINDOW, merge=merge_text_payloads):
+        self.handler = handler
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self.max_wait = coalesce_window * 3
+        self.merge = merge
+        self._cond = threading.Condition()
+        self._queues = {}      # key -> deque[(payload, on_done, arrived_at)]
+        self._scheduled = {}   # key -> ready_at (heap mein valid entry)
+        self._running = set()
+        self._heap = []
+        self._seq = itertools.count()
+        self._started = False
+        self.stats = {'submitted': 0, 'turns': 0, 'coalesced': 0, 'errors': 0}
+
+    def _schedule(self, key, ready_at):
+        self._scheduled[key] = ready_at
+        heapq.heappush(self._heap, (ready_at, next(self._seq), key))
+        self._cond.notify()
+
+    def submit(self, key, payload, on_done=None):
+        now = time.time()
+        with self._cond:
+            self.stats['submitted'] += 1
+            queue = self._queues.setdefault(key, deque())
+            queue.append((payload, on_done, now))
+            if key not in self._running:
+                # Debounce: har naye message par window aage, lekin pehle message se max_wait tak
+                ready_at = min(now + self.coalesce_window, queue[0][2] + self.max_wait)
+                self._schedule(key, ready_at)
+
+    def run(self, key, payload, timeout=None):
+        # Inline mode: submit kar ke khatam hone ka intezar
+        done = threading.Event()
+        result = {}
+
+        def on_done(error):
+            result['error'] = error
+            done.set()
+        self.start()
+        self.submit(key, payload, on_done)
+        if not done.wait(timeout):
+            raise TimeoutError('message processing timed out')
+        if result.get('error'):
+            raise result['error']
+
+    def run_many(self, items, timeout=None):
+        """
+        Inline mode, batched webhook: (key, payload) sab ek sath submit; har key apne order mein,
+        alag keys parallel. Return: har item ka error (ya None), usi order mein.
+        """
+        done = [threading.Event() for _ in items]
+        errors = [None] * len(items)
+
+        def on_done(index):
+            def callback(error):
+                errors[index] = error
+                done[index].set()
+            return callback
+        self.start()
+        for index, (key, payload) in enumerate(items):
+            self.submit(key, payload, on_done(index))
+        deadline = None if timeout is None else time.time() + timeout
+        for index, event in enumerate(done):
+            if not event.wait(None if deadline is None else max(0.0, deadline - time.time())):
+                errors[index] = TimeoutError('message processing timed out')
+        return errors
+
+    def _next_batch(self):
+        # Caller must hold self._cond
+        while True:
+            if not self._heap:
+                self._cond.wait()
+                continue
+            ready_at, _, key = self._heap[0]
+            if self._scheduled.get(key) != ready_at:
+                heapq.heappop(self._heap)  # purani (stale) entry
+                continue
+            wait = ready_at - time.time()
+            if wait > 0:
+                self._cond.wait(wait)
+                continue
+            heapq.heappop(self._heap)
+            del self._scheduled[key]
+            self._running.add(key)
+            queue = self._queues[key]
+            batch = list(queue)
+            queue.clear()
+            return key, batch
+
+    def _process(self, batch):
+        turns, coalesced = plan_turns(batch, self.merge if self.coalesce_window > 0 else None)
+        self.stats['coalesced'] += coalesced
+        errors = {}  # id(entry) -> us message ka pehla error
+        for payload, entries in turns:
+            self.stats['turns'] += 1
+            try:
+                self.handler(payload)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.exception('Dispatcher handler error: %s', e)
+                for entry in entries:
+                    errors.setdefault(id(entry), e)
+        for entry in batch:
+            on_done = entry[1]
+            if on_done:
+                on_done(errors.get(id(entry)))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                key, batch = self._next_batch()
+            try:
+                self._process(batch)
+            finally:
+                with self._cond:
+                    self._running.discard(key)
+                    queue = self._queues.get(key)
+                    if queue:
+                        # Processing ke dauran naye messages aaye: inhe bhi window ke baad chalao
+                        self._schedule(key, queue[-1][2] + self.coalesce_window)
+                    else:
+                        self._queues.pop(key, None)
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f'dispatch-worker-{i}', daemon=True).start()
+
+    def get_stats(self):
+        with self._cond:
+            return dict(self.stats, active_customers=len(self._running),
+                        queued=sum(len(q) for q in self._queues.values()))
+
+
+class AsyncKeyedDispatcher:
+    """
+    KeyedDispatcher ka asyncio roop (ASGI mode): har key ke payloads arrival order mein ek task
+    mein, alag keys ek hi event loop par concurrent, `concurrency` tak. `handler` coroutine
+    function hai. submit() kisi bhi thread se ho sakta hai (e.g. ingest journal ka feeder);
+    wahan se aaye on_done callbacks blocking executor par chalte hain.
+    """
+
+    def __init__(self, handler, concurrency=Config.ASYNC_MAX_CONVERSATIONS, coalesce_window=Config.COALESCE_WINDOW,
+                 merge=merge_text_payloads):
+        self.handler = handler
+        self.workers = concurrency  # IngestQueue isi se in-flight jobs ki hadd banata hai
+        self.coalesce_window = coalesce_window
+        self.max_wait = coalesce_window * 3
+        self.merge = merge
+        self._loop = None
+        self._slots = None
+        self._queues = {}  # key -> [(payload, on_done, arrived_at)]
+        self._tasks = {}   # key -> drain task
+        self.stats = {'submitted': 0, 'turns': 0, 'coalesced': 0, 'errors': 0}
+
+    def start(self):
+        # Event loop thread se (ASGI startup ya pehli request): dispatcher is loop ka ho jata hai
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._slots = asyncio.Semaphore(self.workers)
+
+    def submit(self, key, payload, on_done=None):
+        if self._loop is None:
+            raise RuntimeError('AsyncKeyedDispatcher.submit() called before start(); start it on the event loop first')
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._submit(key, payload, on_done, time.time())
+            return
+        if on_done is not None:
+            callback = on_done
+            on_done = lambda error: run_blocking(callback, error)  # noqa: E731
+        self._loop.call_soon_threadsafe(self._submit, key, payload, on_done, time.time())
+
+    def _submit(self, key, payload, on_done, arrived_at):
+        self.stats['submitted'] += 1
+        self._queues.setdefault(key, []).append((payload, on_done, arrived_at))
+        if key not in self._tasks:
+            self._tasks[key] = self._loop.create_task(self._drain(key))
+
+    async def _drain(self, key):
+        use_async_io()
+        try:
+            while self._queues.get(key):
+                while self.coalesce_window > 0:
+                    # Debounce: aakhri message ke window baad, lekin pehle message se max_wait tak
+                    queue = self._queues[key]
+                    wait = min(queue[-1][2] + self.coalesce_window, queue[0][2] + self.max_wait) - time.time()
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                async with self._slots:
+                    batch = self._queues.pop(key)
+                    await self._process(batch)
+        finally:
+            self._tasks.pop(key, None)
+
+    async def _process(self, batch):
+        turns, coalesced = plan_turns(batch, self.merge if self.coalesce_window > 0 else None)
+        self.stats['coalesced'] += coalesced
+        errors = {}  # id(entry) -> us message ka pehla error
+        for payload, entries in turns:
+            self.stats['turns'] += 1
+            try:
+                await self.handler(payload)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.exception('Dispatcher handler error: %s', e)
+                for entry in entries:
+                    errors.setdefault(id(entry), e)
+        for entry in batch:
+            on_done = entry[1]
+            if on_done:
+                try:
+                    result = on_done(errors.get(id(entry)))
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    logger.exception('Dispatcher callback error: %s', e)
+
+    async def run_many(self, items, timeout=None):
+        """KeyedDispatcher.run_many jaisa: har item ka error (ya None), usi order mein."""
+        self.start()
+        futures = [self._loop.create_future() for _ in items]
+        for future, (key, payload) in zip(futures, items):
+            self._submit(key, payload, lambda error, future=future: future.done() or future.set_result(error), time.time())
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+        return [f.result() if f.done() else TimeoutError('message processing timed out') for f in futures]
+
+    def get_stats(self):
+        return dict(self.stats, active_customers=len(self._tasks),
+                    queued=sum(len(q) for q in self._queues.values()))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher(handler=None):
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = KeyedDispatcher(handler)
+        elif handler is not None and _dispatcher.handler is None:
+            _dispatcher.handler = handler
+    return _dispatcher
@@ -1,39 +1,93 @@
 import os
 import json
-import re
-from whatsapp.send_message import send_whatsapp_message, send_whatsapp_document
-from sheets.google_sheets import append_order_to_sheet, update_order_status_in_sheet
-from db.models import Order, SessionLocal, Conversation
+from whatsapp.outbound import queue_message, queue_document
+from sheets.google_sheets import append_order_to_sheet, format_order_row
+from sheets.outbox import notify_sheet_outbox, update_sheet_order_status
+from db.models import Order, SessionLocal, SheetOutbox
+from db.orders import add_order_items, latest_order
 from receipts.receipt_generator import generate_receipt
-import openai
-from openai_agent.ai_reply import get_ai_reply, is_order_confirmation
-import time
+from openai_agent.llm import chat_completion_async
+from openai_agent.confirmation import classify_confirmation_async
+from openai_agent.extraction import ORDER_FIELDS, extract_fields_async
+from openai_agent.fast_extract import fast_extract, record_llm_call
+from openai_agent.prompt_builder import build_messages, record_prompt_usage
+from openai_agent.answer_cache import get_answer_cache
+from openai_agent.intents import classify
+from openai_agent.memory import load_memory, add_turns, maybe_compact, last_assistant_message
+import threading
+from whatsapp.session_store import LazySessionStore
+from whatsapp.dispatcher import message_of, split_payload
+from db.conversation_log import log_message, load_history
+from catalog.menu_catalog import get_catalog
+from logging_config import get_logger, should_dump
+from metrics import message_trace, record_llm_usage, timed
+from aio import run_blocking, run_sync, wait_future
 
-user_histories = {}
-user_languages = {}
-user_sessions = {}  # NEW: per-user order state
+logger = get_logger(__name__)
 
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Per-user state ab pluggable store mein (memory / sqlite / redis, Config.SESSION_BACKEND);
+# backend pehle message par banta hai, import par nahi
+user_histories = LazySessionStore('history')
+user_languages = LazySessionStore('language')
+user_sessions = LazySessionStore('session')  # per-user order state
+
+async def store_io(fn, *args):
+    # sqlite/redis store disk/network I/O karta hai: async mode mein event loop ke bajaye executor par
+    if user_sessions.blocking:
+        return await run_blocking(fn, *args)
+    return fn(*args)
 
 GPT_MODEL = "gpt-4o-mini"
+# Menu PDF ke nateeje ka zyada se zyada intezar (upload + retries); is ke baad text menu
+MENU_PDF_TIMEOUT = float(os.getenv('MENU_PDF_TIMEOUT', '45'))
 
 # Helper: Detect language preference or ask
 LANG_OPTIONS = ['English', 'Urdu', 'Roman Urdu']
 def detect_language(text):
-    text_lower = text.lower()
-    if 'english' in text_lower or any(word in text_lower for word in ['hello', 'order', 'menu', 'please', 'thanks']):
-        return 'English'
-    elif 'urdu' in text_lower or any(word in text_lower for word in ['آرڈر', 'کھانا', 'شکریہ', 'مہربانی']):
-        return 'Urdu'
-    elif 'roman' in text_lower or any(word in text_lower for word in ['kya', 'hai', 'ka', 'mein', 'order', 'biryani', 'shukriya']):
-        return 'Roman Urdu'
-    return 'Roman Urdu'
+    return classify(text).language
 
-def get_user_language(from_number, text):
+def get_user_language(from_number, text, route=None):
     # Lock language on first message
-    if from_number not in user_languages:
-        user_languages[from_number] = detect_language(text)
-    return user_languages[from_number]
+    detected = route.language if route else detect_language(text)
+    return user_languages.update(from_number, lambda language: language or detected)
+
+def save_session(from_number, session, snapshot, is_new=False):
+    # Sirf is turn mein badle hue fields ko store ki latest value par atomically merge karo,
+    # taake doosre worker/process ka progress overwrite na ho. is_new: turn ke shuru mein store
+    # mein session tha hi nahi (snapshot default hai)
+    changes = {k: v for k, v in session.items() if snapshot.get(k) != v}
+    def merge(current):
+        if current is None:
+            if not is_new:
+                # Beech mein doosre worker ne session delete kiya (order save/cancel): zinda mat karo
+                return None
+            current = snapshot
+        merged = dict(current)
+        merged.update(changes)
+        return merged
+    return user_sessions.update(from_number, merge)
+
+# Jin numbers ki history is process mein conversations table se check ho chuki hai
+_history_checked = set()
+_history_checked_lock = threading.Lock()
+
+def ensure_history(from_number):
+    # Restart ke baad returning customer: store khali ho to history table se lazily (ek dafa) load
+    with _history_checked_lock:
+        if from_number in _history_checked:
+            return
+        if len(_history_checked) > 100000:
+            _history_checked.clear()
+        _history_checked.add(from_number)
+    if from_number in user_histories:
+        return
+    try:
+        turns = load_history(from_number)
+    except Exception as e:
+        logger.warning('Conversation history load error: %s', e)
+        return
+    if turns:
+        user_histories.update(from_number, lambda current: current or {'summary': '', 'turns': turns})
 
 # Smart AI reply using GPT-4o-mini
 
@@ -54,433 +108,365 @@ def update_order_status(order_id, new_status, from_number=None):
                     'pending': 'Aapka order abhi pending hai. ⏳'
                 }
                 msg = status_msgs.get(new_status, f'Aapka order status: {new_status}')
-                send_whatsapp_message(from_number, msg)
+                queue_message(from_number, msg)
     except Exception as e:
-        print('Order status update error:', e)
+        logger.exception('Order status update error: %s', e)
     finally:
         db.close()
-    # Update in Google Sheet (optional, if you want to sync status)
-    # TODO: Implement if needed
+    # Update in Google Sheet (row index se, poori sheet parhe baghair)
+    try:
+        update_sheet_order_status(order_id, new_status)
+    except Exception as e:
+        logger.warning('Google Sheet status update error: %s', e)
+
+# Sirf in states mein FAQ cache; order details collect karte waqt har message LLM ko
+FAQ_STATES = ('greeting', 'order_interest')
 
 def get_ai_reply(message, from_number, system_prompt=None, state='greeting'):
-    history = user_histories.get(from_number, [])
-    history.append({"role": "user", "content": message})
-    history = history[-10:]
-    prompt = ""
-    if system_prompt:
-        prompt += system_prompt + "\n"
-    for msg in history:
-        prompt += f"{msg['role']}: {msg['content']}\n"
-    language = user_languages.get(from_number, 'Roman Urdu')
-    # Al Arab Restaurant full context prompt
-    al_arab_context = (
-        "You are the official WhatsApp assistant for Al Arab Restaurant, Karachi.\n"
-        "Your job is to help customers in a friendly, festive, and professional way, using restaurant branding, emojis, and a warm tone.\n"
-        "Always mention Al Arab Restaurant in your greetings and replies.\n"
-        "Menu highlights: Chicken Shawarma (Rs. 490), Lebanese Shawarma (Rs. 500), Chicken Crispy Shawarma (Rs. 530), Chicken Cheese Shawarma (Rs. 530), Fish Shawarma (Rs. 590), Beef Shawarma (Rs. 460), Beef with Fries Shawarma (Rs. 500), Beef Cheese Shawarma (Rs. 540), Falafel Platter (Rs. 980/650), Falafel Roll (Rs. 250), Chicken Hummus Platter (Rs. 1,999), Beef Hummus Platter (Rs. 1,800), Zinger Burger (Rs. 500), Broast Chest (Rs. 550), Chicken Biryani (Rs. 250/450), Sweet Corn (Rs. 250), Cheezi Potatoes (Rs. 350), 6 Flavour Fries (Rs. 290), Chicken Fried Rice (Rs. 500), Chicken Manchurian with Rice (Rs. 800), Pasta/Lasagna specials.\n"
-        "Deals: Pizza combos, Super Deal Rs. 500, Eid/Ramadan specials, daily combos.\n"
-        "Timings: Rozana 12:00pm se 3:15am tak.\n"
-        "Address: Gulistan-e-Johar, Block 15, Decent Towers, Continental Bakery ke qareeb. Dusra outlet: Alamgir Road, B.M. Society, Sharafabad.\n"
-        "Delivery, takeaway, dine-in available.\n"
-        "Contact numbers: 0300-2581719, 0345-3383881, 0333-7857596, 0314-9760610.\n"
-        "Bread/pita, Arabic sauces, falafel, garlic sauce, etc. sab available hain.\n"
-        "If user asks for menu, prices, deals, address, timings, delivery, ya feedback, always answer using above info.\n"
-        "If user asks for menu, suggest popular items and prices.\n"
-        "If user asks for deals, mention combos and specials.\n"
-        "If user asks for address or timing, reply with details.\n"
-        "If user asks for delivery, confirm it's available and share contact.\n"
-        "If user asks about bread/pita, falafel, sauces, etc., answer from above info.\n"
-        "Always use friendly, festive, and Arabic/restaurant-specific style with emojis.\n"
-        "If user gives feedback, thank them warmly.\n"
-        "If user wants to order, follow the step-by-step order collection as before.\n"
-        "If user has already provided any order details (name, address, phone, items, payment), do NOT ask again, just politely confirm.\n"
-        "If user gives all details in one message, confirm and save the order, don't ask again.\n"
-        "IMPORTANT: Never say 'order confirm ho gaya', 'order placed', 'order confirm kar diya', or any similar phrase UNTIL the user has explicitly replied 'confirm' or given clear confirmation.\n"
-        "If all details are present, ONLY send an order summary and ask the user to reply 'confirm' before proceeding.\n"
-        "Do NOT say the order is confirmed or placed until the backend has saved it after user confirmation.\n"
-    )
-    # Conversational, human-like, restaurant-specific prompt
-    if state == 'greeting':
-        prompt = (
-            al_arab_context +
-            f"Greet the user warmly, ask about their mood or what they feel like eating today.\n"
-            f"Don't ask for order details yet.\n"
-            f"Reply in {language}.\n"
-        ) + prompt
-    elif state == 'order_interest':
-        prompt = (
-            al_arab_context +
-            f"User is interested in ordering. Suggest popular dishes or ask if they'd like to place an order.\n"
-            f"Don't ask for details yet, just encourage them.\n"
-            f"Reply in {language}.\n"
-        ) + prompt
-    elif state == 'collecting_details':
-        prompt = (
-            al_arab_context +
-            f"User wants to place an order. Now, politely and step-by-step, ask for order details (name, address, phone, items), one at a time.\n"
-            f"If user has already provided any order details, do NOT ask again, just politely confirm.\n"
-            f"If user gives all details in one message, confirm and save the order, don't ask again.\n"
-            f"Reply in {language}.\n"
-        ) + prompt
-    else:
-        prompt = (
-            al_arab_context +
-            f"Reply in {language}.\n"
-        ) + prompt
-    print("[DEBUG] Calling OpenAI API with prompt:", prompt)
+    return run_sync(get_ai_reply_async(message, from_number, system_prompt=system_prompt, state=state))
+
+async def get_ai_reply_async(message, from_number, system_prompt=None, state='greeting'):
+    # Memory: purane turns ki summary + recent turns, token budget ke andar
+    memory = load_memory(await store_io(user_histories.get, from_number))
+    history = memory['turns'] + [{"role": "user", "content": message}]
+    language = await store_io(user_languages.get, from_number, 'Roman Urdu')
+    # Timings/address/deals/contact/delivery jaise FAQ ka jawab cache se, bina LLM call ke
+    if state in FAQ_STATES and not system_prompt:
+        cached = get_answer_cache().lookup(message, language)
+        if cached:
+            logger.debug("Answer cache hit: state=%s", state)
+            new_turns = [history[-1], {"role": "assistant", "content": cached}]
+            await store_io(user_histories.update, from_number, lambda current: add_turns(current, new_turns))
+            return cached
+    # Static context pehle (prefix cache), phir state instructions, phir role messages
+    messages = build_messages(state, language, history, system_prompt=system_prompt, summary=memory['summary'])
+    logger.debug("Calling OpenAI API: state=%s, messages=%d, history=%d", state, len(messages), len(history))
+    if should_dump(logger):
+        logger.debug("OpenAI prompt: %s", messages)
     try:
-        response = openai.ChatCompletion.create(
-            model=GPT_MODEL,
-            messages=[{"role": "system", "content": prompt}]
-        )
-        print("[DEBUG] OpenAI API response:", response)
+        with timed('openai.reply'):
+            response = await chat_completion_async(
+                model=GPT_MODEL,
+                messages=messages
+            )
+        record_llm_usage('openai.reply', response)
+        usage = record_prompt_usage(messages, response)
+        logger.debug("OpenAI prompt tokens: %s (cached %s, uncached %s)", usage['prompt_tokens'], usage['cached_tokens'], usage['uncached_tokens'])
         reply = response.choices[0].message['content'].strip()
-        print("[DEBUG] AI reply:", reply)
-        history.append({"role": "assistant", "content": reply})
-        user_histories[from_number] = history
+        if should_dump(logger):
+            logger.debug("AI reply: %s", reply)
+        new_turns = [history[-1], {"role": "assistant", "content": reply}]
+        memory = await store_io(user_histories.update, from_number, lambda current: add_turns(current, new_turns))
+        maybe_compact(user_histories, from_number, memory, language)
         return reply
     except Exception as e:
-        print('[DEBUG] OpenAI API error:', e)
+        logger.error('OpenAI API error: %s', e)
         return "Sorry, I am unable to reply right now."
 
-# Smart order extraction using GPT-4o-mini
-
-def extract_field(message, field, language):
-    # Use LLM to extract a single field from message
-    prompt = f"""
-Aap Al Arab Restaurant ke WhatsApp order assistant hain. User ka message {language} mein ho sakta hai. Sirf aur sirf {field} nikaal kar valid JSON mein do. Agar na ho to null return karo.
-Example output: {{"{field}": "value"}}
-Message: {message}
-"""
-    response = openai.ChatCompletion.create(
-        model=GPT_MODEL,
-        messages=[{"role": "system", "content": prompt}]
-    )
-    raw = response.choices[0].message['content']
+def _append_order_to_sheet_safely(row):
     try:
-        clean = re.sub(r"^```json|^```|```$", "", raw.strip(), flags=re.MULTILINE).strip()
-        return json.loads(clean).get(field)
+        append_order_to_sheet(row, status='pending')
+        logger.info('Order saved to Google Sheet.')
     except Exception as e:
-        print(f'Field extraction error ({field}):', e)
+        logger.error('Google Sheet save error: %s', e)
+
+def format_items(items):
+    if isinstance(items, list):
+        lines, _, _ = get_catalog().price_lines(items)
+        return ', '.join(f"{qty} x {label}" for qty, label, _, _ in lines)
+    return items
+
+def format_total(items):
+    # Sab items ki qeemat catalog mein mile tabhi total dikhao
+    if not isinstance(items, list):
         return None
+    _, total, complete = get_catalog().price_lines(items)
+    return f"{get_catalog().currency} {total:,}" if complete and total else None
 
 def handle_incoming_message(data):
-    print("[DEBUG] handle_incoming_message called with data:", data)
+    # Flask mode: wahi coroutine, worker thread mein bina event loop (aio.run_sync)
+    return run_sync(handle_incoming_message_async(data))
+
+async def handle_incoming_message_async(data):
+    # Webhook har message alag bhejta hai; purane journal jobs mein kai messages ho sakte hain.
+    # Har message ka trace ID, total latency aur stage-wise timings (metrics.py).
+    # Fail hua message baqi messages ko nahi rokta, lekin pehla error dispatcher tak jata hai
+    # (journal retry / webhook 500); warna fail hua kaam kamyab gina jata. Jawab queue hote hi
+    # outbound journal mein durable hain, is liye message Graph ka intezar kiye baghair poora.
+    error = None
+    for payload in split_payload(data) or [data]:
+        message = message_of(payload) or {}
+        try:
+            with message_trace(message.get('id')):
+                await _handle_incoming_message(payload)
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+def _cancel_latest_order(from_number):
+    # Return: customer ko jawab
+    db = SessionLocal()
     try:
-        entry = data['entry'][0]
-        changes = entry['changes'][0]
-        value = changes['value']
-        messages = value.get('messages')
-        if not messages:
-            print("[DEBUG] No messages found in webhook payload")
-            return
-        msg = messages[0]
-        from_number = msg['from']
-        # Location message handle
-        if msg.get('type') == 'location' and 'location' in msg:
-            loc = msg['location']
-            address = loc.get('address', '')
-            name = loc.get('name', '')
-            full_address = f"{address} {name}".strip()
-            print(f"[DEBUG] Location received from {from_number}: {full_address}")
-            # Save to session
-            session = user_sessions.get(from_number, {'name': None, 'address': None, 'phone': None, 'items': None, 'payment_type': None, 'step': 'collecting_details'})
-            session['address'] = full_address
-            user_sessions[from_number] = session
-            send_whatsapp_message(from_number, f"Location mil gayi! Address: {full_address}")
-            # Continue normal flow (try to extract other fields, etc.)
-            # You may want to trigger the next step here if needed
-            # For now, just return to avoid double-processing
-            return
-        text = msg['text']['body'].strip() if msg.get('type') == 'text' else ''
-        print(f"[DEBUG] Incoming message from {from_number}: {text}")
+        order = latest_order(db, from_number)
+        if not order:
+            return 'Koi active order nahi mila. Shukriya!'
+        order.status = 'cancelled'
+        order.notes = (order.notes or '') + ' [User cancelled or reported prank]'
+        db.commit()
+        try:
+            update_sheet_order_status(order.id, 'cancelled')
+        except Exception as e:
+            logger.warning('Google Sheet cancel update error: %s', e)
+        return 'Aapka order cancel kar diya gaya hai. Shukriya!'
+    finally:
+        db.close()
 
-        # --- MENU PDF SEND LOGIC (moved to top, before state machine) ---
-        menu_keywords = ['menu', 'menu bhejein', 'menu send', 'menu chahiye', 'menu chahta hoon', 'menu please', 'menu pdf']
-        if any(word in text.lower() for word in menu_keywords):
-            print(f"[DEBUG] Menu keyword detected in message: {text}")
-            menu_pdf_path = 'menu.pdf' if os.path.exists('menu.pdf') else os.path.join('whatsapp', 'menu.pdf')
-            pdf_sent = False
-            if os.path.exists(menu_pdf_path):
-                try:
-                    send_whatsapp_message(from_number, 'Yeh raha hamara menu! (PDF attached)')
-                    pdf_sent = send_whatsapp_document(from_number, menu_pdf_path, caption='Al Arab Restaurant Menu')
-                    print(f"[DEBUG] PDF send attempted, success: {pdf_sent}")
-                except Exception as e:
-                    print('[DEBUG] Menu PDF send error:', e)
-                    pdf_sent = False
-            if not pdf_sent:
-                send_whatsapp_message(from_number, 'Maaf kijiye, menu PDF abhi available nahi hai. Text menu bhej raha hoon.')
-                # Only send text menu if PDF failed
-                menu_highlights = (
-                    "Menu highlights: Chicken Shawarma (Rs. 490), Lebanese Shawarma (Rs. 500), Chicken Crispy Shawarma (Rs. 530), Chicken Cheese Shawarma (Rs. 530), Fish Shawarma (Rs. 590), Beef Shawarma (Rs. 460), Beef Cheese Shawarma (Rs. 540), Falafel Platter (Rs. 980/650), Falafel Roll (Rs. 250), Chicken Hummus Platter (Rs. 1,999), Beef Hummus Platter (Rs. 1,800), Zinger Burger (Rs. 500), Broast Chest (Rs. 550), Chicken Biryani (Rs. 250/450), Sweet Corn (Rs. 250), Cheezi Potatoes (Rs. 350), 6 Flavour Fries (Rs. 290), Chicken Fried Rice (Rs. 500), Chicken Manchurian with Rice (Rs. 800), Pasta/Lasagna specials.\nDeals: Pizza combos, Super Deal Rs. 500, Eid/Ramadan specials, daily combos.\nTimings: Rozana 12:00pm se 3:15am tak.\nAddress: Gulistan-e-Johar, Block 15, Decent Towers, Continental Bakery ke qareeb. Dusra outlet: Alamgir Road, B.M. Society, Sharafabad.\nDelivery, takeaway, dine-in available.\nContact: 0300-2581719, 0345-3383881, 0333-7857596, 0314-9760610."
-                )
-                send_whatsapp_message(from_number, menu_highlights)
-            return
-        # Cancel/Prank detection
-        if text.lower() in ['cancel', 'galat', 'غلط', 'کینسل']:
-            db = SessionLocal()
+def _latest_order_receipt(from_number):
+    # Return: customer ko jawab (raseed ya wajah)
+    db = SessionLocal()
+    try:
+        order = latest_order(db, from_number)
+        if not order:
+            return 'Koi recent order nahi mila. Pehle order karein!'
+        # Only send receipt if order exists
+        receipt = generate_receipt({
+            'name': order.name,
+            'address': order.address,
+            'phone': order.phone,
+            'items': order.items,
+            'payment_type': order.payment_type,
+            'whatsapp_number': order.whatsapp_number,
+            'status': order.status
+        })
+        return receipt or 'Aapki order ki raseed abhi available nahi hai.'
+    finally:
+        db.close()
+
+def _save_order(from_number, session, row):
+    db = SessionLocal()
+    try:
+        db_order = Order(
+            name=session['name'] if session['name'] else 'N/A',
+            address=session['address'],
+            phone=session['phone'],
+            payment_type=session['payment_type'] if session['payment_type'] else 'N/A',
+            whatsapp_number=from_number,
+            items=json.dumps(session['items']),
+            notes='',
+            status='pending'
+        )
+        db.add(db_order)
+        db.flush()
+        add_order_items(db, db_order.id, session['items'])
+        # Sheet row order ke sath hi commit hoti hai; flusher background mein Google ko bhejega
+        db.add(SheetOutbox(order_id=db_order.id, row=json.dumps(format_order_row(row, status='pending', order_id=db_order.id))))
+        db.commit()
+        notify_sheet_outbox()
+        logger.info('Order %s saved to database and queued for Google Sheet.', db_order.id)
+    except Exception as e:
+        logger.exception('Database save error: %s', e)
+        logger.error('Order data: %s', session)
+        # DB na chale to bhi order sheet tak pohanche, lekin customer ka reply na ruke
+        threading.Thread(target=_append_order_to_sheet_safely, args=(row,), daemon=True).start()
+    finally:
+        db.close()
+
+async def _handle_incoming_message(data):
+    if should_dump(logger):
+        logger.debug("handle_incoming_message called with data: %s", data)
+    entry = data['entry'][0]
+    changes = entry['changes'][0]
+    value = changes['value']
+    messages = value.get('messages')
+    if not messages:
+        logger.debug("No messages found in webhook payload")
+        return
+    msg = messages[0]
+    from_number = msg['from']
+    # Is message ke log hone se pehle, taake reload hui history mein current message dobara na aaye
+    await run_blocking(ensure_history, from_number)
+    # Location message handle
+    if msg.get('type') == 'location' and 'location' in msg:
+        loc = msg['location']
+        address = loc.get('address', '')
+        name = loc.get('name', '')
+        full_address = f"{address} {name}".strip()
+        log_message(from_number, 'user', f"[location] {full_address}")
+        logger.debug("Location received from %s: %s", from_number, full_address)
+        # Save to session
+        stored = await store_io(user_sessions.get, from_number)
+        session = dict(stored or {'name': None, 'address': None, 'phone': None, 'items': None, 'payment_type': None, 'step': 'collecting_details'})
+        snapshot = dict(session)
+        session['address'] = full_address
+        await store_io(save_session, from_number, session, snapshot, stored is None)
+        queue_message(from_number, f"Location mil gayi! Address: {full_address}")
+        # Continue normal flow (try to extract other fields, etc.)
+        # You may want to trigger the next step here if needed
+        # For now, just return to avoid double-processing
+        return
+    text = msg['text']['body'].strip() if msg.get('type') == 'text' else ''
+    log_message(from_number, 'user', text)
+    logger.debug("Incoming message from %s: %s", from_number, text)
+    # Ek scan mein saare intents + language; neeche ke saare faisle isi se
+    route = classify(text)
+
+    # --- MENU PDF SEND LOGIC (moved to top, before state machine) ---
+    if route.has('menu'):
+        logger.debug("Menu keyword detected in message: %s", text)
+        menu_pdf_path = 'menu.pdf' if os.path.exists('menu.pdf') else os.path.join('whatsapp', 'menu.pdf')
+        pdf_sent = False
+        if os.path.exists(menu_pdf_path):
             try:
-                order = db.query(Order).filter(Order.whatsapp_number == from_number).order_by(Order.created_at.desc()).first()
-                if order:
-                    order.status = 'cancelled'
-                    order.notes = (order.notes or '') + ' [User cancelled or reported prank]'
-                    db.commit()
-                    try:
-                        update_order_status_in_sheet(from_number, order.created_at, 'cancelled')
-                    except Exception as e:
-                        print('Google Sheet cancel update error:', e)
-                    send_whatsapp_message(from_number, 'Aapka order cancel kar diya gaya hai. Shukriya!')
-                else:
-                    send_whatsapp_message(from_number, 'Koi active order nahi mila. Shukriya!')
+                queue_message(from_number, 'Yeh raha hamara menu! (PDF attached)')
+                # Customer ki queue mein pichle text ke baad; fallback ke liye nateeja chahiye
+                pdf_sent = await wait_future(queue_document(from_number, menu_pdf_path, caption='Al Arab Restaurant Menu'), MENU_PDF_TIMEOUT)
+                logger.debug("PDF send attempted, success: %s", bool(pdf_sent))
             except Exception as e:
-                print('Order cancel error:', e)
-            finally:
-                db.close()
+                logger.warning('Menu PDF send error: %s', e)
+                pdf_sent = False
+        if not pdf_sent:
+            queue_message(from_number, 'Maaf kijiye, menu PDF abhi available nahi hai. Text menu bhej raha hoon.')
+            # Only send text menu if PDF failed
+            queue_message(from_number, get_catalog().render_menu_text())
+        return
+    # Cancel/Prank detection
+    # Sirf tab jab poora message hi cancel keyword ho
+    if route.has('cancel', min_confidence=1.0):
+        try:
+            queue_message(from_number, await run_blocking(_cancel_latest_order, from_number))
+        except Exception as e:
+            logger.exception('Order cancel error: %s', e)
+        return
+    # --- NEW: Receipt/Status request if no active session ---
+    stored = await store_io(user_sessions.get, from_number)
+    if not stored:
+        if route.has('receipt'):
+            try:
+                queue_message(from_number, await run_blocking(_latest_order_receipt, from_number))
+            except Exception as e:
+                logger.exception('Receipt/status error: %s', e)
+                queue_message(from_number, 'Kuch masla ho gaya, receipt nahi bhej sakte.')
             return
-        # --- NEW: Receipt/Status request if no active session ---
-        session = user_sessions.get(from_number)
-        if not session:
-            receipt_keywords = ['receipt', 'raseed', 'total', 'bill', 'status', 'order status', 'order ka status', 'order ki raseed']
-            if any(word in text.lower() for word in receipt_keywords):
-                db = SessionLocal()
-                try:
-                    order = db.query(Order).filter(Order.whatsapp_number == from_number).order_by(Order.created_at.desc()).first()
-                    if order:
-                        # Only send receipt if order exists
-                        receipt = generate_receipt({
-                            'name': order.name,
-                            'address': order.address,
-                            'phone': order.phone,
-                            'items': order.items,
-                            'payment_type': order.payment_type,
-                            'whatsapp_number': order.whatsapp_number,
-                            'status': order.status
-                        })
-                        if receipt:
-                            send_whatsapp_message(from_number, receipt)
-                        else:
-                            send_whatsapp_message(from_number, 'Aapki order ki raseed abhi available nahi hai.')
-                    else:
-                        send_whatsapp_message(from_number, 'Koi recent order nahi mila. Pehle order karein!')
-                except Exception as e:
-                    print('Receipt/status error:', e)
-                    send_whatsapp_message(from_number, 'Kuch masla ho gaya, receipt nahi bhej sakte.')
-                finally:
-                    db.close()
-                return
-        # --- END NEW ---
-        # Language preference (lock on first message)
-        language = get_user_language(from_number, text)
-        # User session state
-        session = user_sessions.get(from_number, {'name': None, 'address': None, 'phone': None, 'items': None, 'payment_type': None, 'step': 'greeting'})
-        print(f"[DEBUG] Session state for {from_number}: {session}")
-        # State machine progression
-        if session['step'] == 'greeting':
-            if any(word in text.lower() for word in ['order', 'menu', 'biryani', 'burger', 'shawarma', 'khaana', 'khana', 'dish', 'item', 'pizza', 'rice', 'pulao']):
-                session['step'] = 'order_interest'
-            else:
-                ai_response = get_ai_reply(text, from_number, state='greeting')
-                print(f"[DEBUG] AI reply (greeting): {ai_response}")
-                send_whatsapp_message(from_number, ai_response or 'Sorry, I am unable to reply right now.')
-                user_sessions[from_number] = session
-                return
-        if session['step'] == 'order_interest':
-            if any(word in text.lower() for word in ['haan', 'yes', 'ok', 'theek', 'chalo', 'kar do', 'place', 'confirm']):
-                session['step'] = 'collecting_details'
-            else:
-                ai_response = get_ai_reply(text, from_number, state='order_interest')
-                print(f"[DEBUG] AI reply (order_interest): {ai_response}")
-                send_whatsapp_message(from_number, ai_response or 'Sorry, I am unable to reply right now.')
-                user_sessions[from_number] = session
-                return
-        # Always try to extract missing fields from every message and AI reply
-        if session['step'] == 'collecting_details':
-            # Try to extract all fields from current message
-            field_error = False
-            if not session['name']:
-                try:
-                    name = extract_field(text, 'name', language)
-                    print(f"[DEBUG] Extracted name from user: {name}")
-                    if name:
-                        session['name'] = name
-                except Exception as e:
-                    print(f"[DEBUG] Name extraction error: {e}")
-                    field_error = True
-            if not session['address']:
-                try:
-                    address = extract_field(text, 'address', language)
-                    print(f"[DEBUG] Extracted address from user: {address}")
-                    if address:
-                        session['address'] = address
-                except Exception as e:
-                    print(f"[DEBUG] Address extraction error: {e}")
-                    field_error = True
-            if not session['phone']:
-                try:
-                    phone = extract_field(text, 'phone', language)
-                    print(f"[DEBUG] Extracted phone from user: {phone}")
-                    if phone:
-                        session['phone'] = phone
-                except Exception as e:
-                    print(f"[DEBUG] Phone extraction error: {e}")
-                    field_error = True
-            if not session['items']:
-                try:
-                    items = extract_field(text, 'items', language)
-                    print(f"[DEBUG] Extracted items from user: {items}")
-                    if items:
-                        session['items'] = items
-                except Exception as e:
-                    print(f"[DEBUG] Items extraction error: {e}")
-                    field_error = True
-            if not session['payment_type']:
-                try:
-                    payment_type = extract_field(text, 'payment_type', language)
-                    print(f"[DEBUG] Extracted payment_type from user: {payment_type}")
-                    if payment_type:
-                        session['payment_type'] = payment_type
-                except Exception as e:
-                    print(f"[DEBUG] Payment type extraction error: {e}")
-                    field_error = True
-            # Also try to extract from last AI reply if available
-            last_ai = user_histories.get(from_number, [])[-1]['content'] if user_histories.get(from_number, []) else ''
-            if last_ai:
-                try:
-                    if not session['name']:
-                        name = extract_field(last_ai, 'name', language)
-                        print(f"[DEBUG] Extracted name from AI: {name}")
-                        if name:
-                            session['name'] = name
-                except Exception as e:
-                    print(f"[DEBUG] Name extraction error (AI): {e}")
-                    field_error = True
-                try:
-                    if not session['address']:
-                        address = extract_field(last_ai, 'address', language)
-                        print(f"[DEBUG] Extracted address from AI: {address}")
-                        if address:
-                            session['address'] = address
-                except Exception as e:
-                    print(f"[DEBUG] Address extraction error (AI): {e}")
-                    field_error = True
-                try:
-                    if not session['phone']:
-                        phone = extract_field(last_ai, 'phone', language)
-                        print(f"[DEBUG] Extracted phone from AI: {phone}")
-                        if phone:
-                            session['phone'] = phone
-                except Exception as e:
-                    print(f"[DEBUG] Phone extraction error (AI): {e}")
-                    field_error = True
-                try:
-                    if not session['items']:
-                        items = extract_field(last_ai, 'items', language)
-                        print(f"[DEBUG] Extracted items from AI: {items}")
-                        if items:
-                            session['items'] = items
-                except Exception as e:
-                    print(f"[DEBUG] Items extraction error (AI): {e}")
-                    field_error = True
-                try:
-                    if not session['payment_type']:
-                        payment_type = extract_field(last_ai, 'payment_type', language)
-                        print(f"[DEBUG] Extracted payment_type from AI: {payment_type}")
-                        if payment_type:
-                            session['payment_type'] = payment_type
-                except Exception as e:
-                    print(f"[DEBUG] Payment type extraction error (AI): {e}")
-                    field_error = True
-            if field_error:
-                send_whatsapp_message(from_number, 'Maaf kijiye, mujhe aapka message sahi samajh nahi aaya. Thoda clearly likh dein, please.')
-                user_sessions[from_number] = session
-                return
-            # Now check which required fields are still missing
-            required_missing = []
-            if not session['name']:
-                required_missing.append('name')
-            if not session['items']:
-                required_missing.append('items')
-            if not session['address']:
-                required_missing.append('address')
-            if not session['phone']:
-                required_missing.append('phone')
-            # If any required field missing, ask only that one (in loving style)
-            prompts = {
-                'name': 'Aapka naam share kar dein, taki order confirm ho sake! 😊',
-                'address': 'Delivery address likh dein ya WhatsApp ka location button use kar ke apni location share kar dein! 🏠📍',
-                'phone': 'Aapka contact number mil sakta hai, taki rider aap se raabta kar sake? 📞',
-                'items': 'Aap kya order karna chahenge? (item aur quantity likhein) 🍽️',
-            }
-            if required_missing:
-                ai_response = get_ai_reply(text, from_number, state='collecting_details')
-                print(f"[DEBUG] AI reply (collecting_details): {ai_response}")
-                send_whatsapp_message(from_number, prompts[required_missing[0]])
-                user_sessions[from_number] = session
-                return
-            # All required fields present, send summary for confirmation
-            summary = f"Aapka order summary:\n- Naam: {session['name'] if session['name'] else 'N/A'}\n- Item: {session['items']}\n- Address: {session['address']}\n- Phone: {session['phone']}\n- Payment: {session['payment_type'] if session['payment_type'] else 'N/A'}\nAgar sab theek hai to 'confirm' likhein, warna jo galat hai woh batayein."
-            send_whatsapp_message(from_number, summary)
-            session['step'] = 'confirming_order'
-            user_sessions[from_number] = session
+    # --- END NEW ---
+    # Language preference (lock on first message)
+    language = await store_io(get_user_language, from_number, text, route)
+    # User session state
+    session = dict(stored or {'name': None, 'address': None, 'phone': None, 'items': None, 'payment_type': None, 'step': 'greeting'})
+    snapshot = dict(session)
+    is_new = stored is None
+    logger.debug("Session state for %s: %s", from_number, session)
+    # State machine progression
+    if session['step'] == 'greeting':
+        if route.has('order_interest'):
+            session['step'] = 'order_interest'
+        else:
+            ai_response = await get_ai_reply_async(text, from_number, state='greeting')
+            queue_message(from_number, ai_response or 'Sorry, I am unable to reply right now.')
+            await store_io(save_session, from_number, session, snapshot, is_new)
             return
-        # Confirmation step: wait for user to reply 'confirm'
-        if session.get('step') == 'confirming_order':
+    if session['step'] == 'order_interest':
+        if route.has('affirmative'):
+            session['step'] = 'collecting_details'
+        else:
+            ai_response = await get_ai_reply_async(text, from_number, state='order_interest')
+            queue_message(from_number, ai_response or 'Sorry, I am unable to reply right now.')
+            await store_io(save_session, from_number, session, snapshot, is_new)
+            return
+    # Always try to extract missing fields from every message and AI reply
+    if session['step'] == 'collecting_details':
+        # Saare missing fields ek hi LLM call mein nikalo (user message + last AI reply)
+        field_error = False
+        consumed = False
+        missing_fields = [f for f in ORDER_FIELDS if not session[f]]
+        if missing_fields:
+            # Pehle local fast-path: phone, payment aur menu items bina LLM ke. Message mein aur
+            # baatein bhi hon to fast_extract sirf phone deta hai, baaki LLM poore context se nikale
+            fast_values, consumed = fast_extract(text, missing_fields)
+            if fast_values:
+                logger.debug("Fast-path extracted fields: %s", fast_values)
+                session.update(fast_values)
+                missing_fields = [f for f in missing_fields if f not in fast_values]
+            record_llm_call(avoided=consumed or not missing_fields)
+        if missing_fields and not consumed:
+            last_ai = last_assistant_message(await store_io(user_histories.get, from_number))
             try:
-                confirmed = is_order_confirmation(text)
+                extracted = await extract_fields_async(text, missing_fields, language, context=last_ai)
+                logger.debug("Extracted fields: %s", extracted)
+                for field, value in extracted.items():
+                    session[field] = value
+                if extracted.get('items'):
+                    # LLM ke item naam catalog ke canonical naam/size par
+                    session['items'] = get_catalog().normalize_items(session['items'])
             except Exception as e:
-                print('[DEBUG] LLM confirmation error:', e)
-                confirmed = False
-            if confirmed:
-                print(f"[DEBUG] Attempting to save order: {session}")
-                try:
-                    row = [
-                        session['name'] if session['name'] else 'N/A',
-                        session['address'],
-                        session['phone'],
-                        json.dumps(session['items']),
-                        session['payment_type'] if session['payment_type'] else 'N/A',
-                        '',  # notes
-                        from_number
-                    ]
-                    append_order_to_sheet(row, status='pending')
-                    print('[DEBUG] Order saved to Google Sheet.')
-                except Exception as e:
-                    print('Google Sheet save error:', e)
-                db = SessionLocal()
-                try:
-                    db_order = Order(
-                        name=session['name'] if session['name'] else 'N/A',
-                        address=session['address'],
-                        phone=session['phone'],
-                        payment_type=session['payment_type'] if session['payment_type'] else 'N/A',
-                        whatsapp_number=from_number,
-                        items=json.dumps(session['items']),
-                        notes='',
-                        status='pending'
-                    )
-                    db.add(db_order)
-                    db.commit()
-                    print('[DEBUG] Order saved to database.')
-                except Exception as e:
-                    print('Database save error:', e)
-                    import traceback
-                    traceback.print_exc()
-                    print('Order data:', session)
-                finally:
-                    db.close()
-                # Only now send the confirmation message
-                confirm_msg = f"Shukriya! Aapka order confirm ho gaya hai. Al Arab Restaurant se kuch hi dair mein aapka order deliver ho jayega! \U0001F357\U0001F69A\u2728\nAapka order yeh address par deliver hoga: {session['address']} \U0001F3E0\nAgar yeh address galat hai ya aapne order nahi diya, to reply karein: 'Cancel' ya 'Galat'."
-                send_whatsapp_message(from_number, confirm_msg)
-                receipt = generate_receipt({**session, 'whatsapp_number': from_number})
-                if receipt:
-                    send_whatsapp_message(from_number, receipt)
-                # Clear session after order
-                user_sessions.pop(from_number, None)
-            else:
-                send_whatsapp_message(from_number, "Agar sab theek hai to 'confirm' ya koi bhi positive jawab dein (jaise 'haan', 'ok', 'theek hai', 'yes', etc.), warna jo galat hai woh batayein.")
+                logger.warning("Field extraction error: %s", e)
+                field_error = True
+        if field_error:
+            queue_message(from_number, 'Maaf kijiye, mujhe aapka message sahi samajh nahi aaya. Thoda clearly likh dein, please.')
+            await store_io(save_session, from_number, session, snapshot, is_new)
+            return
+        # Now check which required fields are still missing
+        required_missing = []
+        if not session['name']:
+            required_missing.append('name')
+        if not session['items']:
+            required_missing.append('items')
+        if not session['address']:
+            required_missing.append('address')
+        if not session['phone']:
+            required_missing.append('phone')
+        # If any required field missing, ask only that one (in loving style)
+        prompts = {
+            'name': 'Aapka naam share kar dein, taki order confirm ho sake! 😊',
+            'address': 'Delivery address likh dein ya WhatsApp ka location button use kar ke apni location share kar dein! 🏠📍',
+            'phone': 'Aapka contact number mil sakta hai, taki rider aap se raabta kar sake? 📞',
+            'items': 'Aap kya order karna chahenge? (item aur quantity likhein) 🍽️',
+        }
+        if required_missing:
+            ai_response = await get_ai_reply_async(text, from_number, state='collecting_details')
+            queue_message(from_number, prompts[required_missing[0]])
+            await store_io(save_session, from_number, session, snapshot, is_new)
             return
+        # All required fields present, send summary for confirmation
+        total = format_total(session['items'])
+        total_line = f"- Total: {total}\n" if total else ''
+        summary = f"Aapka order summary:\n- Naam: {session['name'] if session['name'] else 'N/A'}\n- Item: {format_items(session['items'])}\n{total_line}- Address: {session['address']}\n- Phone: {session['phone']}\n- Payment: {session['payment_type'] if session['payment_type'] else 'N/A'}\nAgar sab theek hai to 'confirm' likhein, warna jo galat hai woh batayein."
+        queue_message(from_number, summary)
+        session['step'] = 'confirming_order'
+        await store_io(save_session, from_number, session, snapshot, is_new)
+        return
+    # Confirmation step: wait for user to reply 'confirm'
+    if session.get('step') == 'confirming_order':
+        # Saaf haan/nahi/cancel local lexicon se; LLM sirf mubham jawab par (deadline ke sath)
+        decision = await classify_confirmation_async(text)
+        logger.debug("Confirmation decision: %s", decision)
+        if decision == 'yes':
+            logger.debug("Attempting to save order: %s", session)
+            row = [
+                session['name'] if session['name'] else 'N/A',
+                session['address'],
+                session['phone'],
+                json.dumps(session['items']),
+                session['payment_type'] if session['payment_type'] else 'N/A',
+                '',  # notes
+                from_number
+            ]
+            await run_blocking(_save_order, from_number, session, row)
+            # Only now send the confirmation message
+            confirm_msg = f"Shukriya! Aapka order confirm ho gaya hai. Al Arab Restaurant se kuch hi dair mein aapka order deliver ho jayega! \U0001F357\U0001F69A\u2728\nAapka order yeh address par deliver hoga: {session['address']} \U0001F3E0\nAgar yeh address galat hai ya aapne order nahi diya, to reply karein: 'Cancel' ya 'Galat'."
+            queue_message(from_number, confirm_msg)
+            receipt = generate_receipt({**session, 'whatsapp_number': from_number})
+            if receipt:
+                queue_message(from_number, receipt)
+            # Clear session after order
+            await store_io(user_sessions.delete, from_number)
+        elif decision == 'cancel':
+            await store_io(user_sessions.delete, from_number)
+            queue_message(from_number, 'Theek hai, aapka order cancel kar diya gaya hai. Jab chahein dobara order karein! 😊')
+        elif decision == 'unknown':
+            queue_message(from_number, "Maaf kijiye, samajh nahi aaya. Order confirm karna hai to 'confirm' likhein, cancel karna hai to 'cancel'.")
         else:
-            user_sessions[from_number] = session
-    except Exception as e:
-        print('Error in handle_incoming_message:', e) 
\ No newline at end of file
+            queue_message(from_number, "Agar sab theek hai to 'confirm' ya koi bhi positive jawab dein (jaise 'haan', 'ok', 'theek hai', 'yes', etc.), warna jo galat hai woh batayein.")
+        return
+    else:
+        await store_io(save_session, from_number, session, snapshot, is_new)
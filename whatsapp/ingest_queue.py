@@ -0,0 +1,224 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+from whatsapp.dispatcher import sender_of
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Durable ingest journal: webhook payload pehle SQLite file mein likha jata hai,
+# phir ek feeder thread jobs ko per-customer dispatcher ko deta hai (ek customer
+# ke messages order mein, alag customers parallel). Kai processes (gunicorn workers) ek hi
+# journal file share karte hain: job `BEGIN IMMEDIATE` ke andar claim hoti hai aur claim
+# karne wale worker ka lease hota hai jo woh zinda rehte renew karta hai. Crash ke baad
+# jin 'processing' jobs ka lease khatam ho gaya woh dobara chalti hain; zinda sibling ki
+# jobs nahi. Fail hui job backoff (next_attempt_at) ke baad retry hoti hai.
+
+MAX_ATTEMPTS = 3
+
+_COLUMNS = {
+    'claimed_by': 'TEXT',
+    'lease_until': 'REAL',
+    'next_attempt_at': 'REAL NOT NULL DEFAULT 0',
+}
+
+
+class IngestQueue:
+    def __init__(self, path, dispatcher, max_inflight=None, lease_seconds=None, retry_delay=None):
+        self.path = path
+        self.dispatcher = dispatcher
+        self.lease_seconds = Config.INGEST_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.retry_delay = Config.INGEST_RETRY_DELAY if retry_delay is None else retry_delay
+        # Is process ki pehchan; pid container restart par wahi ho sakta hai, is liye uuid bhi
+        self.owner = f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        # Memory mein ek waqt mein itni hi jobs claim hon; baqi journal mein intezar karein. ASGI
+        # dispatcher ke `workers` sainkron mein hote hain, is liye alag hadd (INGEST_MAX_INFLIGHT)
+        self._slots = threading.BoundedSemaphore(max_inflight or min(dispatcher.workers * 4, Config.INGEST_MAX_INFLIGHT))
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._started = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS ingest_jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'payload TEXT NOT NULL, '
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'last_error TEXT, '
+            'created_at REAL NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+        # Purani journal file mein lease/backoff columns nahi the
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(ingest_jobs)')}
+        for column, definition in _COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f'ALTER TABLE ingest_jobs ADD COLUMN {column} {definition}')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_ingest_jobs_status ON ingest_jobs (status, id)')
+
+    def enqueue(self, payload):
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'INSERT INTO ingest_jobs (payload, created_at, updated_at) VALUES (?, ?, ?)',
+                (json.dumps(payload), now, now)
+            )
+            self._wakeup.notify()
+        return cur.lastrowid
+
+    def enqueue_many(self, payloads):
+        # Batched webhook ke saare messages ek transaction mein; ya sab journal mein ya koi nahi
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                job_ids = [
+                    self._conn.execute(
+                        'INSERT INTO ingest_jobs (payload, created_at, updated_at) VALUES (?, ?, ?)',
+                        (json.dumps(payload), now, now)
+                    ).lastrowid
+                    for payload in payloads
+                ]
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._wakeup.notify(len(job_ids))
+        return job_ids
+
+    # Claim ho sakti hai: pending aur backoff khatam, ya 'processing' jis ka lease expire ho gaya
+    # (claim karne wala process mar gaya). Dono jagah same shart: SELECT aur guarded UPDATE.
+    _CLAIMABLE = ("((status = 'pending' AND next_attempt_at <= ?) "
+                  "OR (status = 'processing' AND lease_until < ?))")
+
+    def _claim(self):
+        """
+        Caller must hold self._lock. Agli claim ho sakne wali job is process ke naam: BEGIN IMMEDIATE
+        write lock leta hai, is liye doosra process beech mein wahi row nahi utha sakta.
+        """
+        now = time.time()
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._conn.execute(
+                f'SELECT id, payload, attempts FROM ingest_jobs WHERE {self._CLAIMABLE} ORDER BY id LIMIT 1',
+                (now, now)
+            ).fetchone()
+            claimed = row is not None and self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'processing', attempts = attempts + 1, claimed_by = ?, "
+                f'lease_until = ?, updated_at = ? WHERE id = ? AND {self._CLAIMABLE}',
+                (self.owner, now + self.lease_seconds, now, row[0], now, now)
+            ).rowcount == 1
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        if not claimed:
+            return None
+        return row[0], json.loads(row[1]), row[2] + 1
+
+    def _next_due(self):
+        # Caller must hold self._lock. Sab se pehle retry hone wali pending job kitni der mein
+        row = self._conn.execute(
+            "SELECT MIN(next_attempt_at) FROM ingest_jobs WHERE status = 'pending'"
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _finish(self, job_id, attempts, error=None):
+        with self._lock:
+            if error is None:
+                self._conn.execute('DELETE FROM ingest_jobs WHERE id = ?', (job_id,))
+            elif attempts >= MAX_ATTEMPTS:
+                self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'failed', last_error = ?, claimed_by = NULL, lease_until = NULL, "
+                    'updated_at = ? WHERE id = ? AND claimed_by = ?',
+                    (error, time.time(), job_id, self.owner)
+                )
+            else:
+                # Foran dobara nahi: jo cheez (LLM, Graph) abhi fail hui woh agle second bhi fail hogi
+                now = time.time()
+                self._conn.execute(
+                    "UPDATE ingest_jobs SET status = 'pending', last_error = ?, claimed_by = NULL, lease_until = NULL, "
+                    'next_attempt_at = ?, updated_at = ? WHERE id = ? AND claimed_by = ?',
+                    (error, now + self.retry_delay * 4 ** (attempts - 1), now, job_id, self.owner)
+                )
+                self._wakeup.notify()
+
+    def _renew_leases(self):
+        # Jab tak yeh process zinda hai, is ki 'processing' jobs ka lease aage barhta rahe
+        while True:
+            time.sleep(max(0.01, self.lease_seconds / 3))
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE ingest_jobs SET lease_until = ? WHERE status = 'processing' AND claimed_by = ?",
+                        (time.time() + self.lease_seconds, self.owner)
+                    )
+            except sqlite3.Error as e:
+                logger.warning('Ingest lease renewal error: %s', e)
+
+    def _job_done(self, job_id, attempts, error):
+        self._slots.release()
+        if error is not None:
+            logger.warning('Ingest job %s failed (attempt %s): %s', job_id, attempts, error)
+        self._finish(job_id, attempts, error=None if error is None else str(error))
+
+    def _feeder(self):
+        while True:
+            self._slots.acquire()
+            with self._lock:
+                job = self._claim()
+                while job is None:
+                    due = self._next_due()
+                    self._wakeup.wait(timeout=5 if due is None else min(5, due + 0.01))
+                    job = self._claim()
+            job_id, payload, attempts = job
+            self.dispatcher.submit(
+                sender_of(payload), payload,
+                on_done=lambda error, job_id=job_id, attempts=attempts: self._job_done(job_id, attempts, error)
+            )
+
+    def recover(self):
+        # Mare hue processes ke adhoore jobs (lease khatam) wapas pending; zinda siblings ki jobs nahi
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE ingest_jobs SET status = 'pending', claimed_by = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = 'processing' AND lease_until < ?",
+                (now, now)
+            )
+        return cur.rowcount
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        recovered = self.recover()
+        if recovered:
+            logger.info('Ingest queue: replaying %d unfinished job(s)', recovered)
+        self.dispatcher.start()
+        threading.Thread(target=self._feeder, name='ingest-feeder', daemon=True).start()
+        threading.Thread(target=self._renew_leases, name='ingest-lease', daemon=True).start()
+
+    def depth(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_ingest_queue(dispatcher):
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue(Config.INGEST_QUEUE_PATH, dispatcher)
+    return _queue
@@ -0,0 +1,62 @@
+from whatsapp.dispatcher import message_of
+from metrics import REGISTRY
+
+# Webhook POST ke woh hisse jo Flask (whatsapp/webhook.py) aur ASGI (whatsapp/asgi.py) dono
+# entry points share karte hain: dedup claim, outcomes aur response ki shakal.
+
+
+def claim_messages(seen, payloads):
+    """
+    Har message ka dedup claim (redelivered messages[].id kisi bhi kaam se pehle drop).
+    Return: (outcomes, fresh); fresh = [(payload, outcome)] sirf pehli dafa aaye messages.
+    """
+    outcomes = []
+    fresh = []
+    for payload in payloads:
+        message = message_of(payload)
+        outcome = {'id': message.get('id'), 'from': message.get('from')}
+        if seen.claim(message.get('id')):
+            fresh.append((payload, outcome))
+        else:
+            outcome['status'] = 'duplicate'
+        outcomes.append(outcome)
+    return outcomes, fresh
+
+
+def release_claims(seen, fresh):
+    for _, outcome in fresh:
+        seen.release(outcome['id'])
+
+
+def count_outcomes(outcomes):
+    for outcome in outcomes:
+        REGISTRY.inc('webhook_messages_total', outcome=outcome['status'])
+
+
+def duplicate_response(outcomes, dedup_stats):
+    # Poori delivery redelivery thi: yehi woh messages hain jin ke liye dedup hai, is liye ginti zaruri
+    count_outcomes(outcomes)
+    return {'status': 'duplicate', 'messages': outcomes, 'dedup': dedup_stats}, 200
+
+
+def queued_response(outcomes, fresh, job_ids):
+    for (_, outcome), job_id in zip(fresh, job_ids):
+        outcome.update(status='queued', job_id=job_id)
+    count_outcomes(outcomes)
+    return {'status': 'queued', 'messages': outcomes}, 200
+
+
+def inline_response(seen, outcomes, fresh, errors):
+    for (_, outcome), error in zip(fresh, errors):
+        if error is None:
+            outcome['status'] = 'ok'
+        else:
+            # Sirf fail hue messages ka claim wapas: Meta ki redelivery par wohi dobara chalenge,
+            # kamyab messages duplicate ban kar drop honge
+            seen.release(outcome['id'])
+            outcome.update(status='error', error=str(error))
+    count_outcomes(outcomes)
+    failed = sum(1 for o in outcomes if o['status'] == 'error')
+    if failed:
+        return {'status': 'partial' if failed < len(fresh) else 'error', 'messages': outcomes}, 500
+    return {'status': 'ok', 'messages': outcomes}, 200
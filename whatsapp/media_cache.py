@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Uploaded media (jaise menu.pdf) ka WhatsApp media ID cache. Key = file path + content hash,
+# is liye file badalte hi naya upload hota hai. WhatsApp media 30 din baad expire hota hai,
+# TTL us se kam rakha hai. SQLite file ki wajah se restart ke baad bhi cache bacha rehta hai.
+# Cache miss par ek key ka upload ek hi thread karta hai (lock_for); baqi usi ka media ID lete hain.
+
+MEDIA_CACHE_PATH = os.getenv('MEDIA_CACHE_PATH', 'media_cache.db')
+MEDIA_CACHE_TTL = int(os.getenv('MEDIA_CACHE_TTL', str(25 * 24 * 3600)))
+
+
+class MediaCache:
+    def __init__(self, path=MEDIA_CACHE_PATH, ttl=MEDIA_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hashes = {}  # (path, mtime_ns, size) -> sha256, taake har baar file na parhni pare
+        self._key_locks = {}  # cache key -> upload lock (single-flight)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS media_cache ('
+            'cache_key TEXT PRIMARY KEY, media_id TEXT NOT NULL, uploaded_at REAL NOT NULL)'
+        )
+
+    def key_for(self, file_path):
+        file_path = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        stat_key = (file_path, st.st_mtime_ns, st.st_size)
+        digest = self._hashes.get(stat_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self._hashes[stat_key] = digest
+        return f"{file_path}:{digest}"
+
+    def lock_for(self, key):
+        """Ek key ka upload lock: miss par check-then-upload isi ke andar, taake ek waqt mein ek hi upload."""
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT media_id, uploaded_at FROM media_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+        if not row:
+            return None
+        if time.time() - row[1] > self.ttl:
+            self.invalidate(key)
+            return None
+        return row[0]
+
+    def put(self, key, media_id):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO media_cache (cache_key, media_id, uploaded_at) VALUES (?, ?, ?)',
+                (key, media_id, time.time())
+            )
+
+    def invalidate(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM media_cache WHERE cache_key = ?', (key,))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_media_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaCache()
+    return _cache
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from whatsapp.dispatcher import AsyncKeyedDispatcher, KeyedDispatcher
+from whatsapp.outbound_journal import OutboundJournal
+from whatsapp.send_message import SendResult, send_whatsapp_message, send_whatsapp_message_async, send_whatsapp_document
+from config import Config
+from logging_config import get_logger
+from aio import async_io, run_blocking
+
+logger = get_logger(__name__)
+
+# Outbound dispatcher: har customer (recipient) ke jawab ek queue mein order se jate hain,
+# alag customers parallel, aur sab sends par ek global messages/second hadd (Graph API
+# throughput limit). Optional coalescing window mein ek customer ke lagatar text messages
+# ek hi message ban kar jate hain. Har send ek Future deta hai; jise nateeja chahiye
+# (e.g. menu PDF gaya ya nahi) woh .result() kar le. Queue mode mein har send pehle
+# OutboundJournal (SQLite) mein likha jata hai, is liye handler jawab queue karte hi aage barh
+# jata hai (Graph ka intezar nahi) aur crash par queue hue jawab journal se dobara jate hain.
+
+OUTBOUND_MODE = os.getenv('OUTBOUND_MODE', 'queue')  # 'queue' ya 'inline' (purana, seedha send)
+OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', '8'))
+OUTBOUND_RATE_LIMIT = float(os.getenv('OUTBOUND_RATE_LIMIT', '80'))  # messages/second, 0 = koi hadd nahi
+# >0 ho to har jawab itni der ruk kar us customer ke lagatar texts ek message mein jorta hai
+# (har jawab utna late), is liye default 0 = off
+OUTBOUND_COALESCE_WINDOW = float(os.getenv('OUTBOUND_COALESCE_WINDOW', '0'))
+# ASGI mode: itne customers ko ek sath sends (event loop par, threads nahi)
+OUTBOUND_ASYNC_CONCURRENCY = int(os.getenv('OUTBOUND_ASYNC_CONCURRENCY', '64'))
+MAX_TEXT_LENGTH = 4096  # WhatsApp text body ki hadd; is se lambe merge nahi hote
+LATENCY_SAMPLES = 1000
+
+
+class RateLimiter:
+    """Token bucket: `rate` sends/second, `burst` tak ek sath. acquire() zarurat ho to rukta hai."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # Token mil gaya to 0, warna agla token kitni der mein
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self):
+        # Wahi bucket (threads aur event loop dono ek hi hadd share karte hain), sirf intezar async
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            delay = self._take()
+            if not delay:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+def merge_outbound_texts(payloads):
+    """
+    Lagatar text sends ko ek message mein jorta hai (khali line se). Document ya bahut lamba
+    text beech mein ho to wahan merge toot jata hai, taake order wahi rahe.
+    """
+    merged = []
+    for payload in payloads:
+        last = merged[-1] if merged else None
+        if (
+            last is not None and last['type'] == 'text' and payload['type'] == 'text'
+            and len(last['message']) + len(payload['message']) + 2 <= MAX_TEXT_LENGTH
+        ):
+            merged[-1] = dict(last, message=last['message'] + '\n\n' + payload['message'],
+                              futures=last['futures'] + payload['futures'],
+                              journal_ids=last.get('journal_ids', []) + payload.get('journal_ids', []))
+        else:
+            merged.append(payload)
+    return merged
+
+
+class OutboundDispatcher:
+    def __init__(self, workers=OUTBOUND_WORKERS, rate_limit=OUTBOUND_RATE_LIMIT,
+                 coalesce_window=OUTBOUND_COALESCE_WINDOW, mode=OUTBOUND_MODE, limiter=None, journal=None):
+        self.mode = mode
+        self.limiter = limiter or RateLimiter(rate_limit)
+        self.journal = journal  # queue mode mein sends yahan durable; None = sirf memory (tests, inline)
+        self.dispatcher = self._make_dispatcher(workers, coalesce_window)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)  # queue mein aane se Graph jawab tak
+        self.stats = {'sent': 0, 'failed': 0, 'rate_limited_seconds': 0.0}
+
+    def _make_dispatcher(self, workers, coalesce_window):
+        return KeyedDispatcher(self._send, workers=workers, coalesce_window=coalesce_window, merge=merge_outbound_texts)
+
+    def _send(self, payload):
+        waited = self.limiter.acquire()
+        try:
+            if payload['type'] == 'document':
+                result = send_whatsapp_document(payload['to'], payload['file_path'], caption=payload.get('caption'))
+            else:
+                result = send_whatsapp_message(payload['to'], payload['message'])
+        except Exception as e:
+            logger.exception('Outbound send error: %s', e)
+            result = SendResult(ok=False, error_message=str(e))
+        self._finish(payload, result, waited)
+
+    def _finish(self, payload, result, waited):
+        latency = time.time() - payload['queued_at']
+        with self._lock:
+            self._latencies.append(latency)
+            self.stats['sent' if result else 'failed'] += 1
+            self.stats['rate_limited_seconds'] += waited
+        if self.journal is not None:
+            # Fail hua send bhi: GraphClient retry kar chuka, journal se dobara bhejna sirf crash ke liye
+            try:
+                self.journal.done(payload.get('journal_ids'))
+            except Exception as e:
+                logger.warning('Outbound journal delete error: %s', e)
+        for future in payload['futures']:
+            future.set_result(result)
+
+    def _submit(self, to, payload):
+        future = Future()
+        if self.mode == 'queue':
+            if self.journal is not None:
+                # Queue mein jane se pehle durable (sirf JSON fields); Graph ke baad mit jata hai
+                self.journal.start(self._resend)
+                payload['journal_ids'] = [self.journal.add(to, payload)]
+            payload.update(to=to, futures=[future], queued_at=time.time())
+            self.dispatcher.start()
+            self.dispatcher.submit(to, payload)
+        else:
+            payload.update(to=to, futures=[future], queued_at=time.time())
+            self._send(payload)
+        return future
+
+    def _resend(self, to, payload, send_id):
+        # Mare hue process ka journal mein reh gaya send
+        payload = dict(payload, to=to, futures=[Future()], queued_at=time.time(), journal_ids=[send_id])
+        self.dispatcher.start()
+        self.dispatcher.submit(to, payload)
+
+    def send_text(self, to, message):
+        return self._submit(to, {'type': 'text', 'message': message})
+
+    def send_document(self, to, file_path, caption=None):
+        return self._submit(to, {'type': 'document', 'file_path': file_path, 'caption': caption})
+
+    def get_stats(self):
+        dispatch = self.dispatcher.get_stats()
+        with self._lock:
+            stats = dict(self.stats)
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats['latency_p50'] = latencies[len(latencies) // 2]
+            stats['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            stats['latency_max'] = latencies[-1]
+        stats.update(queued=dispatch['queued'], active_recipients=dispatch['active_customers'],
+                     merged=dispatch['coalesced'])
+        if self.journal is not None:
+            stats['journaled'] = self.journal.depth()
+        return stats
+
+
+class AsyncOutboundDispatcher(OutboundDispatcher):
+    """
+    ASGI mode ka outbound: wahi per-recipient order, merge, stats aur Futures, lekin har
+    customer ki queue event loop par ek task hai aur text async Graph client se jata hai.
+    Rate limiter threaded dispatcher ke sath share hota hai. Documents (upload + media cache)
+    blocking executor par.
+    """
+
+    def __init__(self, workers=OUTBOUND_ASYNC_CONCURRENCY, coalesce_window=OUTBOUND_COALESCE_WINDOW, limiter=None,
+                 journal=None):
+        super().__init__(workers=workers, coalesce_window=coalesce_window, mode='queue', limiter=limiter,
+                         journal=journal)
+
+    def _make_dispatcher(self, workers, coalesce_window):
+        return AsyncKeyedDispatcher(self._send_async, concurrency=workers, coalesce_window=coalesce_window,
+                                    merge=merge_outbound_texts)
+
+    async def _send_async(self, payload):
+        waited = await self.limiter.acquire_async()
+        try:
+            if payload['type'] == 'document':
+                result = await run_blocking(send_whatsapp_document, payload['to'], payload['file_path'],
+                                            caption=payload.get('caption'))
+            else:
+                result = await send_whatsapp_message_async(payload['to'], payload['message'])
+        except Exception as e:
+            logger.exception('Outbound send error: %s', e)
+            result = SendResult(ok=False, error_message=str(e))
+        self._finish(payload, result, waited)
+
+
+_outbound = None
+_outbound_lock = threading.Lock()
+_async_outbound = None
+
+
+def get_outbound_dispatcher():
+    global _outbound
+    with _outbound_lock:
+        if _outbound is None:
+            journal = OutboundJournal(Config.INGEST_QUEUE_PATH) if OUTBOUND_MODE == 'queue' else None
+            _outbound = OutboundDispatcher(journal=journal)
+    return _outbound
+
+
+def get_async_outbound_dispatcher():
+    # Sirf event loop thread se; global rate limit aur journal threaded dispatcher ke sath ek hi
+    # (crash ke baad reh gaye sends threaded dispatcher dobara bhejta hai)
+    global _async_outbound
+    if _async_outbound is None:
+        threaded = get_outbound_dispatcher()
+        _async_outbound = AsyncOutboundDispatcher(limiter=threaded.limiter, journal=threaded.journal)
+    return _async_outbound
+
+
+def _current_outbound():
+    return get_async_outbound_dispatcher() if async_io() else get_outbound_dispatcher()
+
+
+def queue_message(to, message):
+    # Handler ka hot path: customer ki queue mein daal do, Graph API ka intezar nahi
+    return _current_outbound().send_text(to, message)
+
+
+def queue_document(to, file_path, caption=None):
+    return _current_outbound().send_document(to, file_path, caption=caption)
+
@@ -0,0 +1,102 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Outbound sends ka durable journal (ingest journal wali SQLite file, alag table). Har queue hua
+# jawab bhejne se pehle yahan likha jata hai aur Graph ka nateeja aane par mit jata hai, is liye
+# incoming message ka job jawab queue hote hi khatam ho sakta hai, Graph ka intezar nahi. Har row
+# is process ke naam lease par hoti hai jo yeh process zinda rehte renew karta hai; crash ho
+# jaye to lease khatam hone par koi bhi zinda process woh sends dobara bhej deta hai
+# (at-least-once: crash aur delete ke beech gaya jawab dobara ja sakta hai).
+
+OUTBOUND_LEASE_SECONDS = float(os.getenv('OUTBOUND_LEASE_SECONDS', '60'))
+
+
+class OutboundJournal:
+    def __init__(self, path, lease_seconds=None):
+        self.path = path
+        self.lease_seconds = OUTBOUND_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.owner = f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbound_sends ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, recipient TEXT NOT NULL, payload TEXT NOT NULL, '
+            'claimed_by TEXT, lease_until REAL NOT NULL, created_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_outbound_sends_lease ON outbound_sends (lease_until)')
+        self._lock = threading.Lock()
+        self._started = False
+
+    def add(self, recipient, payload):
+        # payload: sirf JSON wali cheezein (type, message / file_path, caption)
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                'INSERT INTO outbound_sends (recipient, payload, claimed_by, lease_until, created_at) VALUES (?, ?, ?, ?, ?)',
+                (recipient, json.dumps(payload), self.owner, now + self.lease_seconds, now)
+            )
+        return cur.lastrowid
+
+    def done(self, send_ids):
+        if not send_ids:
+            return
+        with self._lock:
+            self._conn.executemany('DELETE FROM outbound_sends WHERE id = ?', [(i,) for i in send_ids])
+
+    def claim_expired(self):
+        """Jin sends ka lease khatam (bhejne wala process mar gaya) woh is process ke naam: [(id, recipient, payload)]."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT id, recipient, payload FROM outbound_sends WHERE lease_until < ? ORDER BY id', (now,)
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE outbound_sends SET claimed_by = ?, lease_until = ? WHERE id = ? AND lease_until < ?',
+                    [(self.owner, now + self.lease_seconds, row[0], now) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [(send_id, recipient, json.loads(payload)) for send_id, recipient, payload in rows]
+
+    def renew(self):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE outbound_sends SET lease_until = ? WHERE claimed_by = ?',
+                (time.time() + self.lease_seconds, self.owner)
+            )
+
+    def depth(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM outbound_sends').fetchone()[0]
+
+    def _maintain(self, resend):
+        while True:
+            try:
+                self.renew()
+                for send_id, recipient, payload in self.claim_expired():
+                    logger.info('Resending outbound send %s left by a stopped worker', send_id)
+                    resend(recipient, payload, send_id)
+            except Exception as e:
+                logger.warning('Outbound journal maintenance error: %s', e)
+            time.sleep(max(0.01, self.lease_seconds / 3))
+
+    def start(self, resend):
+        """Lease renewal + mare hue processes ke sends `resend(recipient, payload, send_id)` se dobara."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._maintain, args=(resend,), name='outbound-journal', daemon=True).start()
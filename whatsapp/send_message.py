@@ -1,90 +1,340 @@
+import asyncio
 import os
-from dotenv import load_dotenv
-import pathlib
+import json
+import random
+import threading
 import time
+from dataclasses import dataclass
 import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from whatsapp.media_cache import get_media_cache
+from db.conversation_log import log_message
+from logging_config import get_logger, should_dump
+from metrics import record_error, timed
+from aio import async_io
 
-# Force load .env from project root
-env_path = pathlib.Path(__file__).parent.parent.resolve() / ".env"
-load_dotenv(dotenv_path=env_path)
+logger = get_logger(__name__)
 
-WHATSAPP_CLOUD_TOKEN = os.getenv('WHATSAPP_CLOUD_TOKEN')
-WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
+WHATSAPP_CLOUD_TOKEN = Config.WHATSAPP_CLOUD_TOKEN
+WHATSAPP_PHONE_NUMBER_ID = Config.WHATSAPP_PHONE_NUMBER_ID
+GRAPH_API_BASE = os.getenv('GRAPH_API_BASE', 'https://graph.facebook.com/v19.0')
+GRAPH_CONNECT_TIMEOUT = float(os.getenv('GRAPH_CONNECT_TIMEOUT', '3.05'))
+GRAPH_READ_TIMEOUT = float(os.getenv('GRAPH_READ_TIMEOUT', '15'))
+GRAPH_MAX_RETRIES = int(os.getenv('GRAPH_MAX_RETRIES', '3'))
+GRAPH_POOL_SIZE = int(os.getenv('GRAPH_POOL_SIZE', '20'))
+# Ek retry se pehle zyada se zyada itna intezar; Graph is se lamba (Retry-After / regain access)
+# maange to worker/task ko sula dene ke bajaye retryable nateeja wapas
+GRAPH_MAX_RETRY_DELAY = float(os.getenv('GRAPH_MAX_RETRY_DELAY', '30'))
 
-print("[DEBUG] (send_message.py) WHATSAPP_CLOUD_TOKEN:", WHATSAPP_CLOUD_TOKEN)
-print("[DEBUG] (send_message.py) WHATSAPP_PHONE_NUMBER_ID:", WHATSAPP_PHONE_NUMBER_ID)
+# Graph API ke throttling / temporary error codes jin par retry karna theek hai
+RETRYABLE_GRAPH_CODES = {1, 2, 4, 17, 32, 613, 80007, 130429, 131000, 131016, 131048, 131056}
+# In mein se rate limit wale: request reject hui, message gaya hi nahi, is liye POST /messages
+# bhi dobara bhejna safe. Baqi (5xx, unknown/service errors) mein message shayad pohanch chuka ho.
+THROTTLING_GRAPH_CODES = {4, 17, 32, 613, 80007, 130429, 131048, 131056}
+# Expired / ghalat media ID par aane wale codes: cache invalidate kar ke dobara upload
+INVALID_MEDIA_CODES = {100, 131052, 131053}
 
-if not WHATSAPP_CLOUD_TOKEN or not WHATSAPP_PHONE_NUMBER_ID:
-    raise RuntimeError("[ERROR] WhatsApp Cloud API token or phone number ID is missing! Please check your .env file and environment setup.")
 
+@dataclass
+class SendResult:
+    ok: bool
+    status_code: int = None
+    message_id: str = None
+    media_id: str = None
+    error_code: int = None
+    error_message: str = None
+    retryable: bool = False
+    attempts: int = 0
+    retry_after: float = None  # Graph ne itne seconds baad dobara koshish ko kaha (cap se lamba)
 
+    def __bool__(self):
+        return self.ok
+
+
+class GraphClient:
+    """
+    WhatsApp Cloud (Graph) API ka shared client: ek pooled keep-alive Session,
+    har call par timeout, aur jittered exponential retry. POST /messages idempotent nahi
+    (dobara bhejna = customer ko do message), is liye us par retry sirf tab jab request yaqeenan
+    process nahi hui: connection error, 429 / throttling code, ya Graph ka Retry-After. Media
+    upload idempotent hai (zyada se zyada ek faltu media ID), us par 5xx bhi retry.
+    """
+
+    def __init__(self, token, phone_number_id, base_url=GRAPH_API_BASE, max_retries=GRAPH_MAX_RETRIES,
+                 timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT), pool_size=GRAPH_POOL_SIZE):
+        self.token = token
+        self.phone_number_id = phone_number_id
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        # None: server ne GRAPH_MAX_RETRY_DELAY se lamba intezar manga, abhi retry nahi
+        if retry_after is not None:
+            return retry_after if retry_after <= GRAPH_MAX_RETRY_DELAY else None
+        return min(GRAPH_MAX_RETRY_DELAY, 0.5 * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    def _should_retry(result, retry_after, idempotent):
+        if result.ok or not result.retryable:
+            return False
+        if result.status_code is None:
+            return True  # connection error: request server tak pohanchi hi nahi
+        if result.status_code == 429 or result.error_code in THROTTLING_GRAPH_CODES or retry_after is not None:
+            return True
+        return idempotent
+
+    @staticmethod
+    def _give_up(path, result, retry_after):
+        logger.warning("Graph API %s throttled, retry after %.0fs exceeds %.0fs cap; not retrying now: %s %s",
+                       path, retry_after, GRAPH_MAX_RETRY_DELAY, result.status_code, result.error_message)
+        result.retry_after = retry_after
+        return result
+
+    @staticmethod
+    def _retry_after(response):
+        value = response.headers.get('Retry-After')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+        # Business use case throttling header: {"<id>": [{"estimated_time_to_regain_access": minutes}]}
+        usage = response.headers.get('X-Business-Use-Case-Usage')
+        if usage:
+            try:
+                for entries in json.loads(usage).values():
+                    for entry in entries:
+                        minutes = entry.get('estimated_time_to_regain_access')
+                        if minutes:
+                            return float(minutes) * 60
+            except Exception:
+                return None
+        return None
+
+    @staticmethod
+    def _parse(response, attempts):
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return GraphClient._result(response.status_code, body, response.text, attempts)
+
+    @staticmethod
+    def _result(status_code, body, text, attempts):
+        if status_code == 200:
+            messages = body.get('messages') or [{}]
+            return SendResult(ok=True, status_code=200, message_id=messages[0].get('id'),
+                              media_id=body.get('id'), attempts=attempts)
+        error = body.get('error', {}) if isinstance(body, dict) else {}
+        code = error.get('code')
+        retryable = status_code >= 500 or status_code == 429 or code in RETRYABLE_GRAPH_CODES
+        return SendResult(ok=False, status_code=status_code, error_code=code,
+                          error_message=error.get('message') or text[:300],
+                          retryable=retryable, attempts=attempts)
+
+    def post(self, path, idempotent=False, **kwargs):
+        url = f"{self.base_url}/{self.phone_number_id}/{path}"
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = self.session.post(url, timeout=self.timeout, **kwargs)
+                result = self._parse(response, attempt)
+                if not result.ok and result.retryable:
+                    retry_after = self._retry_after(response)
+            except requests.ReadTimeout as e:
+                # Request shayad pohanch chuki ho; dobara bhejne se customer ko duplicate message mil sakta hai
+                return SendResult(ok=False, error_message=str(e), retryable=True, attempts=attempt)
+            except (requests.ConnectionError, requests.ConnectTimeout) as e:
+                result = SendResult(ok=False, error_message=str(e), retryable=True, attempts=attempt)
+            except requests.RequestException as e:
+                return SendResult(ok=False, error_message=str(e), attempts=attempt)
+            if not self._should_retry(result, retry_after, idempotent) or attempt > self.max_retries:
+                return result
+            delay = self._backoff(attempt - 1, retry_after)
+            if delay is None:
+                return self._give_up(path, result, retry_after)
+            logger.warning("Graph API %s retry %d/%d in %.1fs: %s %s", path, attempt, self.max_retries, delay,
+                           result.status_code, result.error_message)
+            time.sleep(delay)
+
+    def send_message(self, payload):
+        return self.post('messages', json={"messaging_product": "whatsapp", **payload})
+
+    def upload_media(self, filename, content, mime_type):
+        files = {
+            'file': (filename, content, mime_type),
+            'type': (None, mime_type),
+            'messaging_product': (None, 'whatsapp')
+        }
+        return self.post('media', idempotent=True, files=files)
+
+
+class AsyncGraphClient:
+    """
+    ASGI mode ke liye GraphClient ka aiohttp roop: event loop par ek shared keep-alive pool,
+    wahi timeouts, wahi retry policy aur wahi SendResult. Sirf text messages; media upload
+    kam hota hai aur sync client se executor par chalta hai.
+    """
+
+    def __init__(self, token, phone_number_id, base_url=GRAPH_API_BASE, max_retries=GRAPH_MAX_RETRIES,
+                 timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT), pool_size=GRAPH_POOL_SIZE):
+        import aiohttp
+        self.phone_number_id = phone_number_id
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    async def post(self, path, payload):
+        import aiohttp
+        url = f"{self.base_url}/{self.phone_number_id}/{path}"
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                async with self.session.post(url, json=payload, timeout=self.timeout) as response:
+                    text = await response.text()
+                    try:
+                        body = json.loads(text)
+                    except ValueError:
+                        body = {}
+                    result = GraphClient._result(response.status, body, text, attempt)
+                    if not result.ok and result.retryable:
+                        retry_after = GraphClient._retry_after(response)
+            except aiohttp.ConnectionTimeoutError as e:
+                result = SendResult(ok=False, error_message=str(e) or 'connect timeout', retryable=True, attempts=attempt)
+            except asyncio.TimeoutError as e:
+                # Request shayad pohanch chuki ho; dobara bhejne se customer ko duplicate message mil sakta hai
+                return SendResult(ok=False, error_message=str(e) or 'read timeout', retryable=True, attempts=attempt)
+            except aiohttp.ClientConnectionError as e:
+                result = SendResult(ok=False, error_message=str(e) or type(e).__name__, retryable=True, attempts=attempt)
+            except aiohttp.ClientError as e:
+                return SendResult(ok=False, error_message=str(e), attempts=attempt)
+            # Sirf text messages (POST /messages): GraphClient wali non-idempotent policy
+            if not GraphClient._should_retry(result, retry_after, idempotent=False) or attempt > self.max_retries:
+                return result
+            delay = GraphClient._backoff(attempt - 1, retry_after)
+            if delay is None:
+                return GraphClient._give_up(path, result, retry_after)
+            logger.warning("Graph API %s retry %d/%d in %.1fs: %s %s", path, attempt, self.max_retries, delay,
+                           result.status_code, result.error_message)
+            await asyncio.sleep(delay)
+
+    async def send_message(self, payload):
+        return await self.post('messages', {"messaging_product": "whatsapp", **payload})
+
+    async def close(self):
+        await self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+
+
+def get_graph_client():
+    # Session aur connection pool pehle send (ya warmup) par banta hai, import par nahi
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not WHATSAPP_CLOUD_TOKEN or not WHATSAPP_PHONE_NUMBER_ID:
+                raise RuntimeError("[ERROR] WhatsApp Cloud API token or phone number ID is missing! Please check your .env file and environment setup.")
+            _client = GraphClient(WHATSAPP_CLOUD_TOKEN, WHATSAPP_PHONE_NUMBER_ID)
+    return _client
+
+
+def get_async_graph_client():
+    # Sirf event loop thread se (ASGI mode); pehle async send par banta hai
+    global _async_client
+    if _async_client is None:
+        if not WHATSAPP_CLOUD_TOKEN or not WHATSAPP_PHONE_NUMBER_ID:
+            raise RuntimeError("[ERROR] WhatsApp Cloud API token or phone number ID is missing! Please check your .env file and environment setup.")
+        _async_client = AsyncGraphClient(WHATSAPP_CLOUD_TOKEN, WHATSAPP_PHONE_NUMBER_ID)
+    return _async_client
+
+
+async def close_async_graph_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+@timed('graph.send_message')
 def send_whatsapp_message(to, message):
-    print(f"[DEBUG] (send_whatsapp_message) Using Token: {WHATSAPP_CLOUD_TOKEN}")
-    print(f"[DEBUG] (send_whatsapp_message) Using Phone Number ID: {WHATSAPP_PHONE_NUMBER_ID}")
-    # Step 1: Send Actual Message (typing indicator removed)
-    url = f"https://graph.facebook.com/v19.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_CLOUD_TOKEN}",
-        "Content-Type": "application/json"
-    }
     data = {
-        "messaging_product": "whatsapp",
         "to": to,
         "type": "text",
         "text": {"body": message}
     }
-    print(f"[DEBUG] Sending WhatsApp message to: {to} | Message: {message}")
-    print(f"[DEBUG] (send_whatsapp_message) URL: {url}")
-    print(f"[DEBUG] (send_whatsapp_message) Headers: {headers}")
-    print(f"[DEBUG] (send_whatsapp_message) Data: {data}")
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        print(f"[DEBUG] WhatsApp API response: {response.status_code} | {response.text}")
-        if response.status_code == 200:
-            print(f"[CLOUD SEND] To: {to} | Message: {message}")
-        else:
-            print(f"WhatsApp Cloud API error: {response.status_code} {response.text}")
-    except Exception as e:
-        print(f"WhatsApp Cloud API exception: {e}")
+    if should_dump(logger):
+        logger.debug("Sending WhatsApp message to: %s | Message: %s", to, message)
+    result = get_graph_client().send_message(data)
+    if result.ok:
+        logger.info("Sent message %s to %s", result.message_id, to)
+        log_message(to, 'bot', message)
+    else:
+        logger.error("WhatsApp Cloud API error: %s %s %s", result.status_code, result.error_code, result.error_message)
+        record_error('graph.send_message')
+    return result
 
 
-def send_whatsapp_document(to, file_path, caption=None):
-    """
-    WhatsApp Cloud API par document (PDF, etc.) bhejne ka function.
-    Pehle file upload karega, phir media ID se document send karega.
-    """
-    print(f"[DEBUG] (send_whatsapp_document) Uploading file: {file_path}")
-    url_upload = f"https://graph.facebook.com/v19.0/{WHATSAPP_PHONE_NUMBER_ID}/media"
-    headers_upload = {
-        "Authorization": f"Bearer {WHATSAPP_CLOUD_TOKEN}"
+async def send_whatsapp_message_async(to, message):
+    # ASGI mode: async Graph client; sync mode mein wahi send_whatsapp_message
+    if not async_io():
+        return send_whatsapp_message(to, message)
+    data = {
+        "to": to,
+        "type": "text",
+        "text": {"body": message}
     }
+    if should_dump(logger):
+        logger.debug("Sending WhatsApp message to: %s | Message: %s", to, message)
+    with timed('graph.send_message'):
+        result = await get_async_graph_client().send_message(data)
+    if result.ok:
+        logger.info("Sent message %s to %s", result.message_id, to)
+        log_message(to, 'bot', message)
+    else:
+        logger.error("WhatsApp Cloud API error: %s %s %s", result.status_code, result.error_code, result.error_message)
+        record_error('graph.send_message')
+    return result
+
+
+def _upload_document(client, file_path):
     try:
         with open(file_path, 'rb') as f:
-            files = {
-                'file': (os.path.basename(file_path), f, 'application/pdf'),
-                'type': (None, 'application/pdf'),
-                'messaging_product': (None, 'whatsapp')
-            }
-            response = requests.post(url_upload, headers=headers_upload, files=files)
-        print(f"[DEBUG] WhatsApp media upload response: {response.status_code} | {response.text}")
-        if response.status_code != 200:
-            print(f"WhatsApp Cloud API media upload error: {response.status_code} {response.text}")
-            return False
-        media_id = response.json().get('id')
-        if not media_id:
-            print("[ERROR] Media ID not returned from WhatsApp API!")
-            return False
-    except Exception as e:
-        print(f"WhatsApp Cloud API media upload exception: {e}")
-        return False
-    # Step 2: Send document message
-    url_msg = f"https://graph.facebook.com/v19.0/{WHATSAPP_PHONE_NUMBER_ID}/messages"
-    headers_msg = {
-        "Authorization": f"Bearer {WHATSAPP_CLOUD_TOKEN}",
-        "Content-Type": "application/json"
-    }
+            content = f.read()
+    except OSError as e:
+        logger.error("WhatsApp document read error: %s", e)
+        return SendResult(ok=False, error_message=str(e))
+    logger.debug("Uploading file: %s", file_path)
+    upload = client.upload_media(os.path.basename(file_path), content, 'application/pdf')
+    if not upload.ok:
+        logger.error("WhatsApp Cloud API media upload error: %s %s", upload.status_code, upload.error_message)
+        return upload
+    if not upload.media_id:
+        logger.error("Media ID not returned from WhatsApp API!")
+        return SendResult(ok=False, status_code=upload.status_code, error_message='media id missing', attempts=upload.attempts)
+    return upload
+
+
+def _send_document_by_id(client, to, media_id, file_path, caption):
     data = {
-        "messaging_product": "whatsapp",
         "to": to,
         "type": "document",
         "document": {
@@ -94,16 +344,60 @@ def send_whatsapp_document(to, file_path, caption=None):
     }
     if caption:
         data["document"]["caption"] = caption
-    print(f"[DEBUG] Sending WhatsApp document to: {to} | File: {file_path}")
+    logger.debug("Sending WhatsApp document to: %s | File: %s", to, file_path)
+    result = client.send_message(data)
+    result.media_id = media_id
+    return result
+
+
+@timed('graph.send_document')
+def send_whatsapp_document(to, file_path, caption=None):
+    result = _send_whatsapp_document(to, file_path, caption)
+    if not result.ok:
+        record_error('graph.send_document')
+    return result
+
+
+def _send_whatsapp_document(to, file_path, caption=None):
+    """
+    WhatsApp Cloud API par document (PDF, etc.) bhejne ka function.
+    Pehle cached media ID try karta hai; cache miss, expiry ya invalid media ID
+    par hi file dobara upload hoti hai.
+    """
+    client = get_graph_client()
+    cache = get_media_cache()
     try:
-        response = requests.post(url_msg, headers=headers_msg, json=data)
-        print(f"[DEBUG] WhatsApp document send response: {response.status_code} | {response.text}")
-        if response.status_code == 200:
-            print(f"[CLOUD SEND] To: {to} | Document: {file_path}")
-            return True
-        else:
-            print(f"WhatsApp Cloud API document send error: {response.status_code} {response.text}")
-            return False
-    except Exception as e:
-        print(f"WhatsApp Cloud API document send exception: {e}")
-        return False
+        cache_key = cache.key_for(file_path)
+    except OSError as e:
+        logger.error("WhatsApp document read error: %s", e)
+        return SendResult(ok=False, error_message=str(e))
+    media_id = cache.get(cache_key)
+    rejected = None
+    if media_id:
+        result = _send_document_by_id(client, to, media_id, file_path, caption)
+        if result.ok:
+            logger.info("Sent document %s to %s (cached media)", file_path, to)
+            return result
+        if result.error_code not in INVALID_MEDIA_CODES:
+            logger.error("WhatsApp Cloud API document send error: %s %s", result.status_code, result.error_message)
+            return result
+        logger.info("Cached media ID rejected (%s), re-uploading %s", result.error_code, file_path)
+        rejected = media_id
+    # Single-flight: menu ki pehli kai requests ek sath aayein to upload ek hi; baqi threads lock
+    # ke baad wahi naya media ID cache se le lete hain
+    with cache.lock_for(cache_key):
+        media_id = cache.get(cache_key)
+        if media_id is None or media_id == rejected:
+            if media_id is not None:
+                cache.invalidate(cache_key)
+            upload = _upload_document(client, file_path)
+            if not upload.ok:
+                return upload
+            media_id = upload.media_id
+            cache.put(cache_key, media_id)
+    result = _send_document_by_id(client, to, media_id, file_path, caption)
+    if result.ok:
+        logger.info("Sent document %s to %s", file_path, to)
+    else:
+        logger.error("WhatsApp Cloud API document send error: %s %s", result.status_code, result.error_message)
+    return result
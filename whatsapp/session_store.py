@@ -0,0 +1,284 @@
+import abc
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+# Per-customer state (order session, chat history, language) ka store. Handler sirf is
+# interface se baat karta hai, is liye backend badal kar kai gunicorn workers chalaye ja sakte hain:
+#   memory  - process ke andar LRU + TTL (default, ek worker ke liye)
+#   sqlite  - shared file, kai processes ek hi machine par
+#   redis   - kai machines; `redis` package chahiye
+# Store pehli call par banta hai (LazySessionStore), import par koi file/connection nahi.
+
+_MISSING = object()
+
+
+class SessionStore(abc.ABC):
+    """
+    Dict jaisa interface (get / [] / pop / in) plus `update(key, fn)` jo
+    read-modify-write ko atomically chalata hai. fn None lautaye to key delete ho jati hai.
+    """
+
+    blocking = True  # calls disk/network par jati hain (async handler inhe executor par chalata hai)
+
+    @abc.abstractmethod
+    def get(self, key, default=None):
+        ...
+
+    @abc.abstractmethod
+    def set(self, key, value):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key):
+        ...
+
+    @abc.abstractmethod
+    def update(self, key, fn, default=None):
+        ...
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.delete(key)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class MemorySessionStore(SessionStore):
+    blocking = False  # sirf process ke andar dict aur lock
+
+    def __init__(self, ttl=None, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.RLock()
+
+    def _get_locked(self, key, default):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def _set_locked(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get_locked(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._set_locked(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def update(self, key, fn, default=None):
+        with self._lock:
+            value = fn(self._get_locked(key, default))
+            if value is None:
+                self._data.pop(key, None)
+            else:
+                self._set_locked(key, value)
+            return value
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteSessionStore(SessionStore):
+    def __init__(self, path, namespace, ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS session_store ('
+            'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, '
+            'PRIMARY KEY (namespace, key))'
+        )
+        self._last_purge = 0
+
+    def _expires_at(self):
+        return time.time() + self.ttl if self.ttl else None
+
+    def _read(self, key, default):
+        row = self._conn.execute(
+            'SELECT value, expires_at FROM session_store WHERE namespace = ? AND key = ?',
+            (self.namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def _write(self, key, value):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO session_store (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+            (self.namespace, key, json.dumps(value), self._expires_at())
+        )
+
+    def _maybe_purge(self):
+        # Expired rows kabhi kabhar saaf karo, har call par nahi
+        now = time.time()
+        if now - self._last_purge > 300:
+            self._last_purge = now
+            self._conn.execute(
+                'DELETE FROM session_store WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at < ?',
+                (self.namespace, now)
+            )
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._read(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._write(key, value)
+            self._maybe_purge()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM session_store WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def update(self, key, fn, default=None):
+        # BEGIN IMMEDIATE doosre processes ke writes ko bhi rok deta hai, is liye read-modify-write atomic hai
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                value = fn(self._read(key, default))
+                if value is None:
+                    self._conn.execute('DELETE FROM session_store WHERE namespace = ? AND key = ?', (self.namespace, key))
+                else:
+                    self._write(key, value)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            return value
+
+
+class RedisSessionStore(SessionStore):
+    def __init__(self, client, namespace, ttl=None, watch_error=None):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        if watch_error is None:
+            import redis
+            watch_error = redis.WatchError
+        self._watch_error = watch_error  # WATCH ki key beech mein badli: dobara koshish
+
+    def _key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        raw = self.client.get(self._key(key))
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self._key(key), json.dumps(value), ex=self.ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def update(self, key, fn, default=None):
+        name = self._key(key)
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.get(name)
+                    value = fn(default if raw is None else json.loads(raw))
+                    pipe.multi()
+                    if value is None:
+                        pipe.delete(name)
+                    else:
+                        pipe.set(name, json.dumps(value), ex=self.ttl or None)
+                    pipe.execute()
+                    return value
+                except self._watch_error:
+                    continue
+
+
+class LazySessionStore(SessionStore):
+    """
+    create_session_store pehli call par: module import (e.g. handler) par sqlite file ya redis
+    connection nahi banta, startup halka rehta hai.
+    """
+
+    def __init__(self, namespace, ttl=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._store = None
+        self._lock = threading.Lock()
+
+    def _backend(self):
+        store = self._store
+        if store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = create_session_store(self.namespace, ttl=self.ttl)
+                store = self._store
+        return store
+
+    @property
+    def blocking(self):
+        return self._backend().blocking
+
+    def get(self, key, default=None):
+        return self._backend().get(key, default)
+
+    def set(self, key, value):
+        self._backend().set(key, value)
+
+    def delete(self, key):
+        self._backend().delete(key)
+
+    def update(self, key, fn, default=None):
+        return self._backend().update(key, fn, default)
+
+
+_redis_client = None
+
+
+def create_session_store(namespace, ttl=None):
+    global _redis_client
+    ttl = Config.SESSION_TTL if ttl is None else ttl
+    backend = Config.SESSION_BACKEND
+    if backend == 'sqlite':
+        return SqliteSessionStore(Config.SESSION_DB_PATH, namespace, ttl=ttl)
+    if backend == 'redis':
+        import redis
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(Config.REDIS_URL)
+        return RedisSessionStore(_redis_client, namespace, ttl=ttl)
+    return MemorySessionStore(ttl=ttl, max_entries=Config.SESSION_MAX_ENTRIES)
@@ -1,22 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from whatsapp.handler import handle_incoming_message
+from whatsapp.ingest_queue import get_ingest_queue
+from whatsapp.dedup import get_seen_index
+from whatsapp.dispatcher import get_dispatcher, sender_of, split_payload
+from whatsapp.intake import claim_messages, duplicate_response, inline_response, queued_response, release_claims
+from sheets.outbox import start_sheet_outbox
 from config import Config
+from logging_config import get_logger, should_dump, dropped_log_records
+from metrics import REGISTRY, render_metrics
+from whatsapp.outbound import get_outbound_dispatcher
+from db.conversation_log import get_conversation_logger
+from warmup import start_warmup
 import threading
 import time
 import requests
-from dotenv import load_dotenv
-import pathlib
 
-# Force load .env from project root
-env_path = pathlib.Path(__file__).parent.parent.resolve() / ".env"
-print("DEBUG: Loading .env from:", env_path)
-load_dotenv(dotenv_path=env_path)
-import os
-print("DEBUG: (webhook.py) WHATSAPP_CLOUD_TOKEN =", os.getenv("WHATSAPP_CLOUD_TOKEN"))
-print("DEBUG: (webhook.py) WHATSAPP_PHONE_NUMBER_ID =", os.getenv("WHATSAPP_PHONE_NUMBER_ID"))
+logger = get_logger(__name__)
 
 app = Flask(__name__)
 
+# Queues ki gehrai scrape ke waqt parhi jati hai
+REGISTRY.gauge('ingest_queue_depth', lambda: get_dispatcher(handle_incoming_message).get_stats()['queued'],
+               'Incoming messages waiting for a worker')
+REGISTRY.gauge('outbound_queue_depth', lambda: get_outbound_dispatcher().get_stats()['queued'],
+               'Replies waiting in per-customer send queues')
+REGISTRY.gauge('conversation_log_backlog', lambda: get_conversation_logger().get_stats()['backlog'],
+               'Transcript rows not yet written to the database')
+REGISTRY.gauge('log_records_dropped', dropped_log_records, 'Log records dropped because the log queue was full')
+
+@app.before_request
+def _warmup_on_first_request():
+    # Gunicorn wagherah __main__ nahi chalate: pehli request par warmup (baad mein no-op)
+    start_warmup()
+
 @app.route('/webhook', methods=['GET', 'POST'])
 def webhook():
     if request.method == 'GET':
@@ -28,32 +44,63 @@ def webhook():
             return 'Verification token mismatch', 403
     try:
         data = request.get_json(force=True)
-        entry = data.get('entry', [])[0]
-        changes = entry.get('changes', [])[0]
-        value = changes.get('value', {})
-        messages = value.get('messages')
-        if not messages:
-            print('No messages found in webhook payload')
+        if should_dump(logger):
+            logger.debug('Webhook payload: %s', data)
+        # Ek delivery mein kai entries/changes/messages (kai customers) ho sakte hain: har message alag
+        payloads = split_payload(data)
+        if not payloads:
+            logger.debug('No messages found in webhook payload')
             return jsonify({'status': 'no messages'}), 200
-        handle_incoming_message(data)
-        return jsonify({'status': 'ok'}), 200
+        # Redelivered messages (same messages[].id) kisi bhi kaam se pehle drop
+        seen = get_seen_index()
+        outcomes, fresh = claim_messages(seen, payloads)
+        if not fresh:
+            logger.info('Duplicate webhook dropped: %s', [o['id'] for o in outcomes])
+            body, status = duplicate_response(outcomes, seen.get_stats())
+            return jsonify(body), status
+        dispatcher = get_dispatcher(handle_incoming_message)
+        if Config.INGEST_MODE == 'queue':
+            # Saare messages ek transaction mein journal mein, turant 200; workers per customer order mein chalayenge
+            queue = get_ingest_queue(dispatcher)
+            queue.start()
+            try:
+                job_ids = queue.enqueue_many([payload for payload, _ in fresh])
+            except Exception:
+                release_claims(seen, fresh)
+                raise
+            body, status = queued_response(outcomes, fresh, job_ids)
+            return jsonify(body), status
+        # Inline mode: alag customers parallel, ek customer ke messages order mein ek-ek kar ke
+        errors = dispatcher.run_many([(sender_of(payload), payload) for payload, _ in fresh])
+        body, status = inline_response(seen, outcomes, fresh, errors)
+        return jsonify(body), status
     except Exception as e:
-        print('Webhook error:', e)
+        logger.exception('Webhook error: %s', e)
         return jsonify({'status': 'error', 'error': str(e)}), 400
 
 @app.route('/ping', methods=['GET'])
 def ping():
     return "pong", 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus scrape: per-stage latency histograms, LLM calls/tokens, errors, queue depths
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 def keep_alive():
     while True:
         try:
-            print("Pinging self to stay awake...")
+            logger.debug("Pinging self to stay awake...")
             requests.get("https://al-arab-restuarant-whatsapp-agent.onrender.com/ping")
         except Exception as e:
-            print("Keep-alive ping failed:", e)
+            logger.warning("Keep-alive ping failed: %s", e)
         time.sleep(600)
 
 if __name__ == '__main__':
     threading.Thread(target=keep_alive, daemon=True).start()
+    start_sheet_outbox()
+    if Config.INGEST_MODE == 'queue':
+        # Restart ke baad pending jobs foran replay hon, pehle webhook ka intezar na ho
+        get_ingest_queue(get_dispatcher(handle_incoming_message)).start()
+    start_warmup()
     app.run(host="0.0.0.0", port=5000)